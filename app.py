@@ -1,60 +1,106 @@
 import gradio as gr
 import os
-import subprocess
 import logging
 import asyncio 
-from src.agents.nl_sql_agent import NLSQLAgent
+import threading
+from src.agents.agent_pool import AgentPool, AgentPoolTimeoutError, AGENT_POOL_SIZE
+from src.agents.warmup import warmup
+from src.agents.agent_tools.sql_result_store import SQL_RESULT_STORE_DIR, get_result_store
+from src.startup_manager import StartupManager, STARTUP_MODE
 
 logging.basicConfig(level=logging.INFO)
 logging.getLogger("httpx").setLevel(logging.WARNING)
 logging.getLogger("chromadb").setLevel(logging.WARNING)
 
-print("--- Starting Hugging Face Space setup ---")
+# How long a question waits for a background startup build before asking the user to retry
+STARTUP_WAIT_SECONDS = float(os.environ.get("STARTUP_WAIT_SECONDS", "120"))
 
-SETUP_DATABASE_SCRIPT = os.path.join('src', 'setup_database.py')
-RAG_INDEX_SCRIPT = os.path.join('src', 'rag_index.py')
+print("--- Starting Hugging Face Space setup ---")
 
 if not os.environ.get("NEBIUS_API_KEY"):
     print("FATAL ERROR: NEBIUS_API_KEY environment variable not set. This is required for Nebius LLMs and Embeddings.")
 
-try:
-    print(f"Running database setup script: {SETUP_DATABASE_SCRIPT}...")
-    subprocess.run(["python", SETUP_DATABASE_SCRIPT], check=True, capture_output=True)
-    print("Database setup complete.")
+# The database and the knowledge base indexes are only rebuilt when their sources changed
+startup_manager = StartupManager()
+pending_steps = startup_manager.pending_steps()
+if not pending_steps:
+    print("Database and knowledge base are up to date; skipping setup.")
+    startup_manager.run_pending()
+elif STARTUP_MODE == "background":
+    print(f"Building {', '.join(pending_steps)} in the background; the UI will start serving meanwhile.")
+    startup_manager.start_background()
+else:
+    try:
+        print(f"Building {', '.join(pending_steps)} before starting the UI...")
+        startup_manager.run_pending()
+    except Exception as e:
+        print(f"Error during initial setup: {type(e).__name__}: {e}")
+        print("Exiting application due to critical setup failure.")
+        exit(1) 
 
-    print(f"Running RAG indexing script: {RAG_INDEX_SCRIPT}...")
-    subprocess.run(["python", RAG_INDEX_SCRIPT], check=True, capture_output=True)
-    print("RAG indexing complete.")
+print("--- Hugging Face Space setup complete. Initializing Agent ---")
 
-except subprocess.CalledProcessError as e:
-    print(f"Error during initial setup. Script failed with exit code {e.returncode}.")
-    print(f"Stdout:\n{e.stdout.decode()}")
-    print(f"Stderr:\n{e.stderr.decode()}")
-    print("Exiting application due to critical setup failure.")
-    exit(1) 
+# --- Initialize the NL-to-SQL Agent pool ---
+# Up to AGENT_POOL_SIZE questions run concurrently, each with its own session's chat memory
+agent_pool = AgentPool()
+print(f"NLSQLAgent pool initialized (up to {AGENT_POOL_SIZE} concurrent agents).")
 
-print("--- Hugging Face Space setup complete. Initializing Agent ---")
+# Clients and indexes are created lazily; warm them up off the request path once setup has finished
+def _warm_up_when_ready():
+    startup_manager.wait()
+    if startup_manager.ready:
+        warmup()
 
-# --- Initialize the NL-to-SQL Agent ---
-nl_sql_agent_instance = NLSQLAgent() 
-print("NLSQLAgent initialized.")
+threading.Thread(target=_warm_up_when_ready, name="warmup", daemon=True).start()
 
 # --- Define Gradio Interface Functions ---    
-def query_agent_gradio(user_query: str):
+async def query_agent_gradio(user_query: str, request: gr.Request):
+    # Yields (answer text, downloadable full result); the file stays empty unless a large result was summarized
     if not user_query.strip():
-        yield "Please enter a question to get started!"
+        yield "Please enter a question to get started!", None
         return
 
-    try:
-        yield "Thinking... contacting NL-to-SQL agent 🤖"
-        
-        # Run async code inside sync function
-        response = asyncio.run(nl_sql_agent_instance.process_query(user_query))
+    if not startup_manager.ready:
+        yield f"Preparing data ({startup_manager.describe()})... your question will run as soon as it is ready ⏳", None
+        await asyncio.to_thread(startup_manager.wait, STARTUP_WAIT_SECONDS)
+        if not startup_manager.ready:
+            yield f"The assistant is not ready yet ({startup_manager.describe()}). Please try again shortly.", None
+            return
 
-        yield response
+    # Each browser session gets its own conversation history
+    session_id = getattr(request, "session_hash", None) or "default"
+    try:
+        queued = agent_pool.waiting > 0 or agent_pool.in_use >= agent_pool.size
+        if queued:
+            yield f"All agents are busy; your question is queued ({agent_pool.waiting + 1} waiting) ⏳", None
+        else:
+            yield "Thinking... contacting NL-to-SQL agent 🤖", None
+
+        async with agent_pool.checkout(session_id) as agent:
+            if queued:
+                yield "Thinking... contacting NL-to-SQL agent 🤖", None
+            # Progress steps are shown until the answer starts streaming in
+            steps = []
+            answer = ""
+            download = None
+            async for event in agent.astream_query(user_query):
+                if event.kind == "status" and not answer:
+                    steps.append(event.text)
+                    yield "Thinking... 🤖\n" + "\n".join(f"✓ {step}" for step in steps), download
+                elif event.kind == "result":
+                    # The latest summarized result; its full rows are offered for download
+                    download = get_result_store().path(event.text) or download
+                elif event.kind == "token":
+                    answer += event.text
+                    yield answer, download
+                elif event.kind == "answer":
+                    yield event.text, download
+    except AgentPoolTimeoutError as e:
+        logging.warning(f"Question from session {session_id} timed out in the agent queue: {e}")
+        yield "The assistant is busy right now. Please try again in a moment.", None
     except Exception as e:
         logging.error(f"Error processing query in Gradio app: {e}", exc_info=True)
-        yield f"An internal error occurred: {type(e).__name__}: {str(e)}. Please check the Space logs for more details."
+        yield f"An internal error occurred: {type(e).__name__}: {str(e)}. Please check the Space logs for more details.", None
 
 # --- Create Gradio Interface ---
 # --- Define the list of examples ---
@@ -100,6 +146,7 @@ with gr.Blocks(theme=gr.themes.Soft()) as demo:
             show_copy_button=True,
             container=True
         )
+        result_file = gr.File(label="Full query result (CSV)", interactive=False)
 
     gr.Examples(
         examples=example_list,
@@ -110,13 +157,16 @@ with gr.Blocks(theme=gr.themes.Soft()) as demo:
     submit_btn.click(
         fn=query_agent_gradio,
         inputs=user_query,
-        outputs=output_box,
-        show_progress="full"
+        outputs=[output_box, result_file],
+        show_progress="full",
+        # The agent pool bounds and queues the actual work; don't serialize requests before they reach it
+        concurrency_limit=None
     )
 
-    clear_btn.add(components=[user_query, output_box])
+    clear_btn.add(components=[user_query, output_box, result_file])
 
 
 if __name__ == "__main__":
     print("Launching Gradio app...")
-    demo.launch()
\ No newline at end of file
+    # Saved query results live outside Gradio's temp directory
+    demo.launch(allowed_paths=[SQL_RESULT_STORE_DIR])
\ No newline at end of file
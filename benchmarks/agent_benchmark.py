@@ -0,0 +1,498 @@
+"""
+Offline end-to-end latency and throughput benchmark for NLSQLAgent.
+
+Drives the agent with the questions from fine-tuning/nl_sql_finetune_dataset.jsonl and app.py's
+example_list. NebiusLLM and NebiusEmbedding are replaced by deterministic local stand-ins, so no
+network or API key is needed:
+
+- ReplayLLM plays the ReAct protocol (or the direct pipeline's SQL generation) with canned SQL,
+  taken from the dataset and agent_benchmark_replay.json, and injects latency: a delay before
+  the first token plus a delay per streamed token.
+- HashingEmbedding embeds text as hashed bag-of-words vectors, with an optional delay per call.
+
+The schema and KPI indexes are rebuilt with the stand-in embedding in a temporary directory;
+the SQL queries run against the real data/sales_database.db. Each (pipeline mode, concurrency)
+pair runs every question through an AgentPool with that many closed-loop clients.
+
+    python benchmarks/agent_benchmark.py                                # react and direct, concurrency 1/4/8
+    python benchmarks/agent_benchmark.py --modes react --concurrency 1 --limit 20
+    python benchmarks/agent_benchmark.py --output after.json --compare benchmarks/agent_benchmark_baseline.json
+
+Per configuration the JSON report has p50/p95/p99 latency and time to first token, questions
+per second, and LLM calls and tool actions (ReAct iterations) per question.
+"""
+import os
+import io
+import re
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+from contextvars import ContextVar
+from typing import Any, Optional
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.llms import (
+    ChatMessage, ChatResponse, CompletionResponse, CustomLLM, LLMMetadata, MessageRole,
+)
+from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BENCHMARKS_DIR, '..'))
+DATASET_PATH = os.path.join(PROJECT_ROOT, 'fine-tuning', 'nl_sql_finetune_dataset.jsonl')
+APP_PATH = os.path.join(PROJECT_ROOT, 'app.py')
+REPLAY_PATH = os.path.join(BENCHMARKS_DIR, 'agent_benchmark_replay.json')
+DATABASE_PATH = os.path.join(PROJECT_ROOT, 'data', 'sales_database.db')
+
+DEFAULT_SQL = "SELECT COUNT(*) FROM sales" # Replayed for questions without canned SQL
+EMBEDDING_DIMENSIONS = 256
+ERROR_PREFIX = "I encountered an error"
+
+# Stand-in behaviour, set from the command line
+LATENCY = {"llm_first_token": 0.1, "llm_token": 0.002, "embed": 0.01}
+REPLAY_SQL = {}
+
+# Counts the LLM calls and tool actions made for the question being answered
+_question_counters = ContextVar("question_counters", default=None)
+
+
+def _count(name: str):
+    counters = _question_counters.get()
+    if counters is not None:
+        counters[name] += 1
+
+
+class HashingEmbedding(BaseEmbedding):
+    """Deterministic stand-in for NebiusEmbedding: hashed bag-of-words vectors."""
+
+    def __init__(self, api_key: Optional[str] = None, model_name: str = "benchmark-hashing-embedding",
+                 api_base: Optional[str] = None, **kwargs: Any):
+        super().__init__(model_name="benchmark-hashing-embedding")
+
+    @staticmethod
+    def _vector(text: str) -> list:
+        vector = np.zeros(EMBEDDING_DIMENSIONS, dtype=np.float32)
+        for word in re.findall(r"[a-z0-9_]+", text.lower()):
+            bucket = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=4).digest(), "little")
+            vector[bucket % EMBEDDING_DIMENSIONS] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm > 0 else vector).tolist()
+
+    def _get_query_embedding(self, query: str) -> list:
+        time.sleep(LATENCY["embed"])
+        return self._vector(query)
+
+    async def _aget_query_embedding(self, query: str) -> list:
+        await asyncio.sleep(LATENCY["embed"])
+        return self._vector(query)
+
+    def _get_text_embedding(self, text: str) -> list:
+        return self._vector(text)
+
+
+def _question_of(messages) -> str:
+    """The user's question: the last user message that is not a tool observation, minus injected context."""
+    for message in reversed(messages):
+        content = message.content or ""
+        if message.role == MessageRole.USER and not content.startswith("Observation:"):
+            return content.rsplit("\nQuestion: ", 1)[-1].strip()
+    return ""
+
+
+def _canned_sql(question: str) -> str:
+    return REPLAY_SQL.get(question.strip(), DEFAULT_SQL).rstrip().rstrip(";")
+
+
+def _first_row(csv_text: str) -> str:
+    lines = [line for line in csv_text.strip().splitlines() if line and not line.startswith("...")]
+    return lines[1] if len(lines) > 1 else (lines[0] if lines else "no rows")
+
+
+class ReplayLLM(CustomLLM):
+    """
+    Deterministic stand-in for NebiusLLM.
+
+    Follows the ReAct protocol with canned SQL: retrieve the schema unless it was provided, run
+    the question's SQL, then answer from the observation. Prompted like the fine-tuned model
+    (the direct pipeline), it returns the SQL alone. Responses stream word by word.
+    """
+
+    model: str = "benchmark-replay"
+    api_key: Optional[str] = None
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(context_window=32000, num_output=512, is_chat_model=True, model_name=self.model)
+
+    def _script(self, messages) -> str:
+        from src.agents.direct_sql_pipeline import SQL_GENERATION_SYSTEM_PROMPT
+        question = _question_of(messages)
+        sql_query = _canned_sql(question)
+        if messages and messages[0].role == MessageRole.SYSTEM and SQL_GENERATION_SYSTEM_PROMPT in (messages[0].content or ""):
+            return sql_query
+
+        # The last message is the (possibly context-augmented) question or the latest tool observation
+        last = messages[-1].content or ""
+        has_schema = "Retrieved Database Schema Context" in last
+        if last.startswith("Observation:") and not has_schema:
+            return ("Thought: I can answer without using any more tools.\n"
+                    f"Answer: Based on the query results, the answer is {_first_row(last[len('Observation:'):])}.")
+        _count("tool_actions")
+        if has_schema:
+            return ("Thought: I have the schema, so I can write the query.\n"
+                    f"Action: execute_sql_query\nAction Input: {json.dumps({'sql_query': sql_query})}")
+        return ("Thought: I need the schema before writing SQL.\n"
+                f"Action: retrieve_schema_context\nAction Input: {json.dumps({'natural_language_query': question})}")
+
+    def _summary(self, prompt: str) -> str:
+        result = prompt.split("Result (CSV):\n", 1)[-1].rsplit("\n\nAnswer:", 1)[0]
+        return f"According to the data, the answer is {_first_row(result)}."
+
+    @staticmethod
+    def _words(text: str) -> list:
+        words = text.split(" ")
+        return [word if position == 0 else " " + word for position, word in enumerate(words)]
+
+    @llm_chat_callback()
+    def chat(self, messages, **kwargs: Any) -> ChatResponse:
+        _count("llm_calls")
+        text = self._script(messages)
+        time.sleep(LATENCY["llm_first_token"] + LATENCY["llm_token"] * len(self._words(text)))
+        return ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=text))
+
+    @llm_chat_callback()
+    async def achat(self, messages, **kwargs: Any) -> ChatResponse:
+        _count("llm_calls")
+        text = self._script(messages)
+        await asyncio.sleep(LATENCY["llm_first_token"] + LATENCY["llm_token"] * len(self._words(text)))
+        return ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=text))
+
+    @llm_chat_callback()
+    def stream_chat(self, messages, **kwargs: Any):
+        _count("llm_calls")
+        text = self._script(messages)
+
+        def gen():
+            time.sleep(LATENCY["llm_first_token"])
+            content = ""
+            for word in self._words(text):
+                time.sleep(LATENCY["llm_token"])
+                content += word
+                yield ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=content), delta=word)
+        return gen()
+
+    @llm_chat_callback()
+    async def astream_chat(self, messages, **kwargs: Any):
+        _count("llm_calls")
+        text = self._script(messages)
+
+        async def gen():
+            await asyncio.sleep(LATENCY["llm_first_token"])
+            content = ""
+            for word in self._words(text):
+                await asyncio.sleep(LATENCY["llm_token"])
+                content += word
+                yield ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=content), delta=word)
+        return gen()
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        _count("llm_calls")
+        text = self._summary(prompt)
+        time.sleep(LATENCY["llm_first_token"] + LATENCY["llm_token"] * len(self._words(text)))
+        return CompletionResponse(text=text)
+
+    @llm_completion_callback()
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        _count("llm_calls")
+        text = self._summary(prompt)
+        await asyncio.sleep(LATENCY["llm_first_token"] + LATENCY["llm_token"] * len(self._words(text)))
+        return CompletionResponse(text=text)
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        _count("llm_calls")
+        text = self._summary(prompt)
+
+        def gen():
+            time.sleep(LATENCY["llm_first_token"])
+            content = ""
+            for word in self._words(text):
+                time.sleep(LATENCY["llm_token"])
+                content += word
+                yield CompletionResponse(text=content, delta=word)
+        return gen()
+
+    @llm_completion_callback()
+    async def astream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        _count("llm_calls")
+        text = self._summary(prompt)
+
+        async def gen():
+            await asyncio.sleep(LATENCY["llm_first_token"])
+            content = ""
+            for word in self._words(text):
+                await asyncio.sleep(LATENCY["llm_token"])
+                content += word
+                yield CompletionResponse(text=content, delta=word)
+        return gen()
+
+
+def load_questions() -> tuple:
+    """
+    Returns (questions, canned SQL by question) from the fine-tuning dataset and app.py's example_list.
+
+    app.py is parsed, not imported, since importing it starts the app.
+    """
+    import ast
+    questions, replay = [], {}
+    with open(DATASET_PATH, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            messages = json.loads(line)["messages"]
+            question = next(m["content"] for m in messages if m["role"] == "user")
+            replay[question] = next(m["content"] for m in messages if m["role"] == "assistant")
+            questions.append(question)
+
+    with open(APP_PATH, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and any(getattr(target, "id", None) == "example_list" for target in node.targets):
+            questions.extend(example[0] for example in ast.literal_eval(node.value))
+
+    with open(REPLAY_PATH, encoding="utf-8") as f:
+        replay.update(json.load(f))
+    return questions, replay
+
+
+def build_indexes(index_dir: str):
+    """Builds the schema and KPI NumPy indexes with the stand-in embedding and points the retrievers at them."""
+    from src import rag_index
+    from src.agents.agent_tools import schema_retriever_tool
+    from src.agents.agent_tools.schema_retriever_tool import SchemaRetrieverEngine
+
+    rag_index.NUMPY_INDEX_SCHEMA_PATH = os.path.join(index_dir, 'numpy_index_schema')
+    rag_index.NUMPY_INDEX_KPI_PATH = os.path.join(index_dir, 'numpy_index_kpi')
+    with contextlib.redirect_stdout(sys.stderr):
+        rag_index.init_embed_model()
+        rag_index.build_schema_kb()
+        rag_index.build_kpi_kb()
+    schema_retriever_tool._schema_engine = SchemaRetrieverEngine(
+        backend="numpy", numpy_path=rag_index.NUMPY_INDEX_SCHEMA_PATH)
+    schema_retriever_tool._kpi_engine = SchemaRetrieverEngine(
+        backend="numpy", numpy_path=rag_index.NUMPY_INDEX_KPI_PATH, collection_name="kpi_kb", similarity_top_k=1)
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    rank = max(1, int(np.ceil(fraction * len(ordered))))
+    return ordered[rank - 1]
+
+
+def _distribution(values: list) -> dict:
+    return {
+        "p50": round(percentile(values, 0.50), 2),
+        "p95": round(percentile(values, 0.95), 2),
+        "p99": round(percentile(values, 0.99), 2),
+        "mean": round(float(np.mean(values)), 2),
+        "max": round(max(values), 2),
+    }
+
+
+async def run_configuration(mode: str, concurrency: int, questions: list, answer_format: str) -> dict:
+    """Answers every question with `concurrency` closed-loop clients sharing an AgentPool of that size."""
+    from src.agents.agent_pool import AgentPool
+    from src.agents.nl_sql_agent import NLSQLAgent
+
+    pool = AgentPool(agent_factory=lambda: NLSQLAgent(pipeline_mode=mode, answer_format=answer_format),
+                     size=concurrency, queue_timeout=600)
+
+    async def ask(session_id: str, question: str) -> dict:
+        counters = {"llm_calls": 0, "tool_actions": 0}
+        token = _question_counters.set(counters)
+        started = time.perf_counter()
+        first_token = None
+        answer = ""
+        try:
+            async with pool.checkout(session_id) as agent:
+                async for event in agent.astream_query(question):
+                    if event.kind == "token" and first_token is None:
+                        first_token = time.perf_counter() - started
+                    elif event.kind == "answer":
+                        answer = event.text
+        finally:
+            _question_counters.reset(token)
+            pool.reset_session(session_id)
+        total = time.perf_counter() - started
+        return {
+            "latency_ms": total * 1000,
+            "first_token_ms": (first_token if first_token is not None else total) * 1000,
+            "error": answer.startswith(ERROR_PREFIX),
+            **counters,
+        }
+
+    # Agents are created (and their imports paid for) before measuring
+    await asyncio.gather(*(ask(f"warmup-{n}", questions[n % len(questions)]) for n in range(concurrency)))
+
+    warmup_stats = pool.agent_stats()
+    pending = asyncio.Queue()
+    for position, question in enumerate(questions):
+        pending.put_nowait((position, question))
+    samples = []
+
+    async def client():
+        while not pending.empty():
+            position, question = pending.get_nowait()
+            samples.append(await ask(f"question-{position}", question))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    wall_seconds = time.perf_counter() - started
+
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "questions": len(samples),
+        "errors": sum(1 for sample in samples if sample["error"]),
+        "wall_seconds": round(wall_seconds, 3),
+        "questions_per_second": round(len(samples) / wall_seconds, 3),
+        "latency_ms": _distribution([sample["latency_ms"] for sample in samples]),
+        "first_token_ms": _distribution([sample["first_token_ms"] for sample in samples]),
+        "llm_calls_per_question": _distribution([sample["llm_calls"] for sample in samples]),
+        "react_iterations_per_question": _distribution([sample["tool_actions"] for sample in samples]),
+        "agent_stats": _counter_delta(warmup_stats, pool.agent_stats()),
+    }
+
+
+def _counter_delta(before: dict, after: dict) -> dict:
+    """Agent counters accumulated after `before` was taken (averages are left out)."""
+    return {name: round(value - before.get(name, 0), 3) for name, value in after.items() if not name.startswith("avg_")}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(report: dict, baseline: dict) -> str:
+    """Changes in p50 latency, p50 time to first token and throughput against a previous report."""
+    previous = {(result["mode"], result["concurrency"]): result for result in baseline["results"]}
+    lines = [f"Compared with {baseline['meta'].get('commit') or 'baseline'}:"]
+    for result in report["results"]:
+        before = previous.get((result["mode"], result["concurrency"]))
+        if before is None:
+            continue
+        changes = []
+        for label, now, then in (
+            ("p50 latency", result["latency_ms"]["p50"], before["latency_ms"]["p50"]),
+            ("p50 first token", result["first_token_ms"]["p50"], before["first_token_ms"]["p50"]),
+            ("questions/s", result["questions_per_second"], before["questions_per_second"]),
+        ):
+            change = f"{(now - then) / then * 100:+.1f}%" if then else "n/a"
+            changes.append(f"{label} {then:g} -> {now:g} ({change})")
+        lines.append(f"  {result['mode']:<7} x{result['concurrency']:<3} " + "; ".join(changes))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline latency/throughput benchmark for NLSQLAgent.")
+    parser.add_argument("--modes", default="react,direct", help="Comma-separated pipeline modes.")
+    parser.add_argument("--concurrency", default="1,4,8", help="Comma-separated concurrency levels.")
+    parser.add_argument("--answer-format", default="template", choices=("template", "llm"), help="Direct pipeline answer format.")
+    parser.add_argument("--limit", type=int, default=None, help="Use only the first N questions.")
+    parser.add_argument("--repeat", type=int, default=1, help="Ask every question this many times.")
+    parser.add_argument("--llm-first-token-ms", type=float, default=100.0, help="Injected delay before an LLM's first token.")
+    parser.add_argument("--llm-token-ms", type=float, default=2.0, help="Injected delay per streamed token (word).")
+    parser.add_argument("--embed-ms", type=float, default=10.0, help="Injected delay per query embedding.")
+    parser.add_argument("--with-caches", action="store_true", help="Keep the SQL result and semantic answer caches enabled.")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout).")
+    parser.add_argument("--compare", help="A previous JSON report to compare against.")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(DATABASE_PATH):
+        print(f"Database not found at {DATABASE_PATH}; run `python src/setup_database.py` first.", file=sys.stderr)
+        return 1
+
+    LATENCY.update(llm_first_token=args.llm_first_token_ms / 1000, llm_token=args.llm_token_ms / 1000,
+                   embed=args.embed_ms / 1000)
+    questions, replay = load_questions()
+    REPLAY_SQL.update(replay)
+    questions = questions[:args.limit] * args.repeat
+
+    work_dir = tempfile.mkdtemp(prefix="agent_benchmark_")
+    # Module-level settings are read at import, so they are set before anything from src is imported
+    os.environ.update({
+        "NEBIUS_API_KEY": os.environ.get("NEBIUS_API_KEY") or "offline-benchmark",
+        "VECTOR_STORE_BACKEND": "numpy",
+        "EMBEDDING_CACHE_PATH": os.path.join(work_dir, "embedding_cache.sqlite3"),
+        "AGENT_TRACING_ENABLED": "0",
+    })
+    if not args.with_caches:
+        os.environ.update({"SQL_CACHE_ENABLED": "0", "SEMANTIC_CACHE_ENABLED": "0"})
+    sys.path.insert(0, PROJECT_ROOT)
+
+    import llama_index.embeddings.nebius as nebius_embeddings
+    import llama_index.llms.nebius as nebius_llms
+    nebius_embeddings.NebiusEmbedding = HashingEmbedding
+    nebius_llms.NebiusLLM = ReplayLLM
+
+    build_indexes(work_dir)
+    import src.agents.nl_sql_agent  # noqa: F401  (adds DEBUG logging to stdout; moved to stderr below)
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.WARNING)
+    for handler in root_logger.handlers:
+        if isinstance(handler, logging.StreamHandler) and handler.stream is sys.stdout:
+            handler.setStream(sys.stderr)
+
+    results = []
+    for mode in args.modes.split(","):
+        for concurrency in (int(level) for level in args.concurrency.split(",")):
+            # The ReAct agent prints every step; keep stdout for the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = asyncio.run(run_configuration(mode, concurrency, questions, args.answer_format))
+            results.append(result)
+            print(f"{mode:<7} x{concurrency:<3} p50 {result['latency_ms']['p50']:8.1f} ms  "
+                  f"p95 {result['latency_ms']['p95']:8.1f} ms  p99 {result['latency_ms']['p99']:8.1f} ms  "
+                  f"first token p50 {result['first_token_ms']['p50']:8.1f} ms  "
+                  f"{result['questions_per_second']:6.2f} q/s  "
+                  f"{result['llm_calls_per_question']['mean']:.2f} LLM calls/q  errors {result['errors']}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "questions": len(questions),
+            "answer_format": args.answer_format,
+            "caches": args.with_caches,
+            "latency_ms": {name: seconds * 1000 for name, seconds in LATENCY.items()},
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print(compare(report, json.load(f)), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Import-time profile and regression budget for the app's modules.
+
+Each module is imported in a fresh interpreter with `python -X importtime`, and the cumulative
+time of its top-level import is compared with the budget in import_time_budget.json. The heaviest
+imports under each module are listed, like a sorted `-X importtime` log.
+
+    python benchmarks/import_time.py                 # profile and check against the budget
+    python benchmarks/import_time.py --write-profile # also refresh import_time_profile.txt
+
+Exits with status 1 if any module is over budget.
+"""
+import os
+import sys
+import json
+import argparse
+import platform
+import subprocess
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BENCHMARKS_DIR, '..'))
+BUDGET_PATH = os.path.join(BENCHMARKS_DIR, 'import_time_budget.json')
+PROFILE_PATH = os.path.join(BENCHMARKS_DIR, 'import_time_profile.txt')
+
+
+def profile_import(module: str, timeout: float) -> tuple:
+    """
+    Imports `module` in a fresh interpreter.
+
+    Returns:
+        tuple: (cumulative us of the module, {name: cumulative us} for everything it imported).
+    """
+    env = dict(os.environ, PYTHONPATH=PROJECT_ROOT)
+    # Importing must not need credentials; a placeholder catches code that reads the key at import time
+    env.setdefault("NEBIUS_API_KEY", "import-time-profile")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, timeout=timeout,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+    # Lines are "import time: self [us] | cumulative | imported package", printed when an import
+    # completes and indented by nesting depth, so a top-level import follows all of its children.
+    # Interpreter startup (site, .pth files) forms earlier top-level blocks and is left out.
+    block = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        if depth > 0:
+            block[name] = max(block.get(name, 0), int(cumulative_us))
+        elif name == module:
+            return int(cumulative_us), block
+        else:
+            block = {}
+    raise RuntimeError(f"no import time recorded for {module}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile module import times and check them against a budget.")
+    parser.add_argument("--top", type=int, default=10, help="Heaviest imports to list per module.")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds before an import counts as stalled.")
+    parser.add_argument("--write-profile", action="store_true", help=f"Write the report to {os.path.relpath(PROFILE_PATH, PROJECT_ROOT)}.")
+    args = parser.parse_args(argv)
+
+    with open(BUDGET_PATH, "r", encoding="utf-8") as f:
+        budgets = json.load(f)["budgets_ms"]
+
+    lines = [
+        f"# Import-time profile (python -X importtime, cumulative ms), Python {platform.python_version()} on {platform.system()}",
+        f"# Budgets: {os.path.relpath(BUDGET_PATH, PROJECT_ROOT)}",
+    ]
+    over_budget = []
+    for module, budget_ms in budgets.items():
+        try:
+            total_us, imported = profile_import(module, args.timeout)
+        except subprocess.TimeoutExpired:
+            lines.append(f"\n{module}: STALLED (no result after {args.timeout:.0f}s), budget {budget_ms} ms")
+            over_budget.append(module)
+            continue
+        total_ms = total_us / 1000
+        status = "ok" if total_ms <= budget_ms else "OVER BUDGET"
+        if total_ms > budget_ms:
+            over_budget.append(module)
+        lines.append(f"\n{module}: {total_ms:.0f} ms (budget {budget_ms} ms) {status}")
+        heaviest = sorted(((cumulative, name) for name, cumulative in imported.items()), reverse=True)
+        for cumulative, name in heaviest[:args.top]:
+            lines.append(f"    {cumulative / 1000:8.1f} ms  {name}")
+
+    report = "\n".join(lines) + "\n"
+    print(report, end="")
+    if args.write_profile:
+        with open(PROFILE_PATH, "w", encoding="utf-8") as f:
+            f.write(report)
+    if over_budget:
+        print(f"\nOver budget: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,374 @@
+"""
+SQL executor micro-benchmark and query-plan regression suite.
+
+Builds sales databases at several sizes with src/setup_database.py (same generator, seed and
+indexes as the real database), then runs the reference SQL from
+fine-tuning/nl_sql_finetune_dataset.jsonl through `execute_sql_query`. No LLM or embedding model
+is involved, and the result cache is disabled so every run reaches SQLite. Query budgets are
+lifted unless --with-budgets is given.
+
+    python benchmarks/sql_benchmark.py                                   # 100k and 1M sales rows
+    python benchmarks/sql_benchmark.py --rows 100000,1000000,10000000 --output after.json
+    python benchmarks/sql_benchmark.py --compare before.json
+    python benchmarks/sql_benchmark.py --update-baseline                 # accept the current plans
+    python benchmarks/sql_benchmark.py --engine auto --compare sqlite.json  # DuckDB for large scans
+
+Per query the JSON report has the median wall time over --repeat runs, rows per second, the
+serialized result size in bytes, and the process's peak RSS after the query (with the growth the
+query caused), and the engine that ran it (see --engine). Each query's EXPLAIN QUERY PLAN is compared with sql_plan_baseline.json: a new full
+scan of a large table is a regression (exit status 1); other plan changes are listed as warnings.
+
+Databases are cached in .cache/sql_benchmark/ by size, seed and end date; pass --rebuild to
+regenerate them.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import resource
+import sqlite3
+import statistics
+import subprocess
+import contextlib
+from datetime import date
+from typing import Optional
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BENCHMARKS_DIR, '..'))
+DATASET_PATH = os.path.join(PROJECT_ROOT, 'fine-tuning', 'nl_sql_finetune_dataset.jsonl')
+BASELINE_PATH = os.path.join(BENCHMARKS_DIR, 'sql_plan_baseline.json')
+DATABASE_DIR = os.path.join(PROJECT_ROOT, '.cache', 'sql_benchmark')
+
+DEFAULT_ROWS = "100000,1000000"
+COMPARE_MIN_MS = 1.0 # Faster queries are left out of the per-query comparison
+# Statement endings the agent's SQL can arrive with besides the dataset's plain ";", each added
+# as a variant of the first reference query
+TRAILING_VARIANTS = (" -- total sales", ";  -- total sales\n", "; /* total sales */")
+
+
+def load_reference_sql() -> list:
+    """
+    Returns the assistant SQL of every dataset example, in order and without duplicates, followed by
+    TRAILING_VARIANTS of the first one.
+
+    The SQL is kept exactly as the model emits it, trailing semicolon included, since that is what
+    the ReAct agent passes to execute_sql_query.
+    """
+    queries = []
+    with open(DATASET_PATH, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            messages = json.loads(line)["messages"]
+            sql_query = next(m["content"] for m in messages if m["role"] == "assistant")
+            if sql_query not in queries:
+                queries.append(sql_query)
+    if queries:
+        statement = queries[0].rstrip().rstrip(";")
+        queries.extend(statement + ending for ending in TRAILING_VARIANTS)
+    return queries
+
+
+def scale_label(rows: int) -> str:
+    if rows >= 1_000_000 and rows % 1_000_000 == 0:
+        return f"{rows // 1_000_000}M"
+    if rows >= 1_000 and rows % 1_000 == 0:
+        return f"{rows // 1_000}k"
+    return str(rows)
+
+
+def build_database(rows: int, seed: int, end_date: date, workers: Optional[int], rebuild: bool) -> str:
+    """Creates (or reuses) a sales database with `rows` sales rows and returns its path."""
+    from src import setup_database
+
+    path = os.path.join(DATABASE_DIR, f"sales_{scale_label(rows)}_seed{seed}_{end_date.isoformat()}.db")
+    if os.path.exists(path) and not rebuild:
+        return path
+    os.makedirs(DATABASE_DIR, exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)
+
+    started = time.perf_counter()
+    conn = sqlite3.connect(path)
+    try:
+        # setup_database reports progress on stdout; keep stdout for the report
+        with contextlib.redirect_stdout(sys.stderr):
+            setup_database.create_tables(conn)
+            setup_database.insert_dummy_data(conn, scale_factor=rows / setup_database.BASE_SALES_RECORDS,
+                                             seed=seed, workers=workers, end_date=end_date)
+            setup_database.create_indexes(conn)
+            setup_database.rebuild_sales_rollup(conn)
+    except BaseException:
+        conn.close()
+        os.remove(path)
+        raise
+    conn.close()
+    print(f"Built {path} in {time.perf_counter() - started:.1f}s.", file=sys.stderr)
+    return path
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def snapshot_plan(conn: sqlite3.Connection, sql_query: str) -> dict:
+    """The SQL the executor would run (after rollup routing), its plan and the large tables it fully scans."""
+    from src.agents.agent_tools.query_plan_inspector import explain_query_plan, find_full_scans
+    from src.agents.agent_tools.rollup_query_rewriter import (
+        SQL_ROLLUP_ROUTING_ENABLED, rollup_available, rewrite_for_rollup,
+    )
+
+    executed_sql = sql_query
+    if SQL_ROLLUP_ROUTING_ENABLED and rollup_available(conn):
+        executed_sql = rewrite_for_rollup(sql_query) or sql_query
+    try:
+        plan = explain_query_plan(conn, executed_sql)
+    except sqlite3.Error as e:
+        return {"executed_sql": executed_sql, "plan": [], "full_scans": [], "error": str(e)}
+    return {"executed_sql": executed_sql, "plan": plan, "full_scans": find_full_scans(plan, executed_sql)}
+
+
+def _prepare_duckdb(database_path: str):
+    """Opens the DuckDB engine on `database_path`, waiting for its snapshot so no timed run builds it."""
+    from src.agents.agent_tools.sql_engine import get_duckdb_engine
+    engine = get_duckdb_engine(database_path)
+    if engine is None:
+        raise SystemExit("--engine auto/duckdb needs the duckdb package (pip install duckdb)")
+    started = time.perf_counter()
+    while not engine.prepare():
+        engine._building.join()
+    print(f"DuckDB ready for {os.path.basename(database_path)} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+
+def run_scale(database_path: str, queries: list, repeat: int, engine: str = "sqlite") -> list:
+    """Runs every query `repeat` times through execute_sql_query against `database_path`."""
+    from src.agents.agent_progress import capture_progress
+    from src.agents.agent_tools import sql_connection_pool
+    from src.agents.agent_tools.sql_connection_pool import SQLiteConnectionPool
+    from src.agents.agent_tools.sql_executor_tool import execute_sql_query
+    from src.agents.agent_tools.sql_result_serializer import iter_batches
+    from src.agents.direct_sql_pipeline import is_execution_error
+
+    if engine != "sqlite":
+        _prepare_duckdb(database_path)
+    previous_pool = sql_connection_pool._pool
+    pool = sql_connection_pool._pool = SQLiteConnectionPool(database_path=database_path, max_size=1)
+    results = []
+    try:
+        for sql_query in queries:
+            # Growth of the high-water mark is attributed to the query; it includes the counting pass below
+            rss_before = _peak_rss_mb()
+            with pool.connection() as conn:
+                result = {"sql": sql_query, **snapshot_plan(conn, sql_query)}
+                # Row count of the full result (the executor's output may be a summary); also warms the cache
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(result["executed_sql"])
+                    result["rows"] = sum(len(batch) for batch in iter_batches(cursor))
+                except sqlite3.Error:
+                    result["rows"] = 0
+                finally:
+                    cursor.close()
+
+            timings = []
+            output = ""
+            events = []
+            for _ in range(repeat):
+                events.clear()
+                started = time.perf_counter()
+                with capture_progress(events.append):
+                    output = execute_sql_query(sql_query)
+                timings.append(time.perf_counter() - started)
+            wall_seconds = statistics.median(timings)
+            peak_rss = _peak_rss_mb()
+            result.update({
+                "wall_ms": round(wall_seconds * 1000, 3),
+                "min_ms": round(min(timings) * 1000, 3),
+                "rows_per_second": round(result["rows"] / wall_seconds) if wall_seconds > 0 else None,
+                "bytes": len(output.encode("utf-8")),
+                "peak_rss_mb": round(peak_rss, 1),
+                "rss_growth_mb": round(peak_rss - rss_before, 1),
+                "failed": is_execution_error(output),
+                "engine": "duckdb" if any(event.text.startswith("Running on DuckDB") for event in events) else "sqlite",
+            })
+            results.append(result)
+    finally:
+        pool.close_all()
+        sql_connection_pool._pool = previous_pool
+    return results
+
+
+def check_plans(scales: list, baseline: dict) -> tuple:
+    """
+    Compares each query's plan with the baseline of the same scale.
+
+    Returns:
+        tuple: (regressions, warnings) as lists of messages. A regression is a large table that
+               the baseline plan did not scan in full but the current one does.
+    """
+    regressions, warnings = [], []
+    for scale in scales:
+        expected = baseline.get("scales", {}).get(scale["label"])
+        if expected is None:
+            warnings.append(f"{scale['label']}: no baseline plans; run with --update-baseline to record them.")
+            continue
+        for query in scale["queries"]:
+            before = expected.get(query["sql"])
+            if before is None:
+                warnings.append(f"{scale['label']}: new query without a baseline plan: {query['sql']}")
+                continue
+            new_scans = sorted(set(query["full_scans"]) - set(before["full_scans"]))
+            if new_scans:
+                regressions.append(f"{scale['label']}: new full scan of {', '.join(new_scans)} in {query['sql']}\n"
+                                   f"    before: {' | '.join(before['plan'])}\n    now:    {' | '.join(query['plan'])}")
+            elif query["plan"] != before["plan"]:
+                warnings.append(f"{scale['label']}: plan changed for {query['sql']}\n"
+                                f"    before: {' | '.join(before['plan'])}\n    now:    {' | '.join(query['plan'])}")
+    return regressions, warnings
+
+
+def baseline_from(scales: list, baseline: dict) -> dict:
+    """The baseline with the plans of the scales that were just run replaced."""
+    recorded = dict(baseline.get("scales", {}))
+    for scale in scales:
+        recorded[scale["label"]] = {
+            query["sql"]: {"plan": query["plan"], "full_scans": query["full_scans"]} for query in scale["queries"]
+        }
+    return {"sqlite": sqlite3.sqlite_version, "scales": recorded}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(report: dict, previous: dict) -> str:
+    """Changes in total and per-query wall time against a previous report, slowest regressions first."""
+    before_scales = {scale["label"]: scale for scale in previous["scales"]}
+    lines = [f"Compared with {previous['meta'].get('commit') or 'previous report'}:"]
+    for scale in report["scales"]:
+        before = before_scales.get(scale["label"])
+        if before is None:
+            continue
+        then, now = before["total_wall_ms"], scale["total_wall_ms"]
+        change = f"{(now - then) / then * 100:+.1f}%" if then else "n/a"
+        lines.append(f"  {scale['label']:<5} total {then:.1f} -> {now:.1f} ms ({change})")
+        before_queries = {query["sql"]: query for query in before["queries"]}
+        changes = []
+        for query in scale["queries"]:
+            old = before_queries.get(query["sql"])
+            # Sub-millisecond queries are dominated by timer noise
+            if old is not None and old["wall_ms"] >= COMPARE_MIN_MS:
+                changes.append(((query["wall_ms"] - old["wall_ms"]) / old["wall_ms"], old["wall_ms"], query))
+        for ratio, old_ms, query in sorted(changes, key=lambda item: -item[0])[:5]:
+            lines.append(f"        {old_ms:9.2f} -> {query['wall_ms']:9.2f} ms ({ratio * 100:+.1f}%)  {query['sql'][:90]}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SQL executor micro-benchmark and query-plan regression suite.")
+    parser.add_argument("--rows", default=DEFAULT_ROWS, help="Comma-separated numbers of sales rows, one database each.")
+    parser.add_argument("--seed", type=int, default=42, help="Data generator seed.")
+    parser.add_argument("--end-date", type=date.fromisoformat, default=None,
+                        help="Most recent sale date as YYYY-MM-DD (default: today).")
+    parser.add_argument("--workers", type=int, default=None, help="Data generator processes (default: CPU count).")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per query; the median is reported.")
+    parser.add_argument("--limit", type=int, default=None, help="Use only the first N queries.")
+    parser.add_argument("--with-budgets", action="store_true",
+                        help="Keep the executor's time/VM-step/row budgets (default: lifted, so every query runs to completion).")
+    parser.add_argument("--engine", choices=("sqlite", "auto", "duckdb"), default="sqlite",
+                        help="SQL_ENGINE for the run: SQLite only (default), DuckDB for large scans, or DuckDB throughout.")
+    parser.add_argument("--rebuild", action="store_true", help="Regenerate cached databases.")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Stored query plans to check against.")
+    parser.add_argument("--update-baseline", action="store_true", help="Record the current plans as the baseline.")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout).")
+    parser.add_argument("--compare", help="A previous JSON report to compare wall times against.")
+    args = parser.parse_args(argv)
+
+    # Module-level settings are read at import, so they are set before anything from src is imported
+    os.environ.update({"SQL_CACHE_ENABLED": "0", "AGENT_TRACING_ENABLED": "0", "SQL_ENGINE": args.engine})
+    if not args.with_budgets:
+        os.environ.update({"SQL_QUERY_TIMEOUT_SECONDS": "0", "SQL_QUERY_MAX_VM_STEPS": "0", "SQL_QUERY_MAX_ROWS": "0"})
+    sys.path.insert(0, PROJECT_ROOT)
+    # Full-scan warnings from the executor would repeat every query; the report lists them instead
+    logging.basicConfig(level=logging.ERROR)
+
+    end_date = args.end_date or date.today()
+    queries = load_reference_sql()[:args.limit]
+    scales = []
+    for rows in (int(value) for value in args.rows.split(",")):
+        database_path = build_database(rows, args.seed, end_date, args.workers, args.rebuild)
+        results = run_scale(database_path, queries, args.repeat, args.engine)
+        total_ms = sum(result["wall_ms"] for result in results)
+        scales.append({
+            "label": scale_label(rows),
+            "sales_rows": rows,
+            "database_mb": round(os.path.getsize(database_path) / (1024 * 1024), 1),
+            "total_wall_ms": round(total_ms, 3),
+            "full_scan_queries": sum(1 for result in results if result["full_scans"]),
+            "failed_queries": sum(1 for result in results if result["failed"]),
+            "duckdb_queries": sum(1 for result in results if result["engine"] == "duckdb"),
+            "queries": results,
+        })
+        slowest = max(results, key=lambda result: result["wall_ms"])
+        print(f"{scale_label(rows):<5} {len(results)} queries  total {total_ms:9.1f} ms  "
+              f"slowest {slowest['wall_ms']:8.1f} ms  full scans {scales[-1]['full_scan_queries']}  "
+              f"peak RSS {max(result['peak_rss_mb'] for result in results):.0f} MB  "
+              f"failed {scales[-1]['failed_queries']}  on DuckDB {scales[-1]['duckdb_queries']}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "end_date": end_date.isoformat(),
+            "repeat": args.repeat,
+            "engine": args.engine,
+            "budgets": args.with_budgets,
+        },
+        "scales": scales,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print(compare(report, json.load(f)), file=sys.stderr)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline_from(scales, baseline), f, indent=2)
+            f.write("\n")
+        print(f"Recorded the plans of {', '.join(scale['label'] for scale in scales)} in {args.baseline}.", file=sys.stderr)
+        return 0
+
+    regressions, warnings = check_plans(scales, baseline)
+    for message in warnings:
+        print(f"WARNING {message}", file=sys.stderr)
+    for message in regressions:
+        print(f"REGRESSION {message}", file=sys.stderr)
+    if regressions:
+        print(f"{len(regressions)} query plan regression(s).", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
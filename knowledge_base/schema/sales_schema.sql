@@ -29,4 +29,23 @@ CREATE TABLE sales (
     FOREIGN KEY (product_id) REFERENCES products(product_id),
     FOREIGN KEY (customer_id) REFERENCES customers(customer_id),
     FOREIGN KEY (region_id) REFERENCES regions(region_id)
-);
\ No newline at end of file
+);
+
+CREATE INDEX idx_sales_sale_date_region ON sales (sale_date, region_id, customer_id, amount);
+CREATE INDEX idx_sales_sale_date_product ON sales (sale_date, product_id, quantity, amount);
+CREATE INDEX idx_sales_product ON sales (product_id, quantity, amount);
+CREATE INDEX idx_sales_customer ON sales (customer_id, sale_date, amount);
+CREATE INDEX idx_sales_region ON sales (region_id, customer_id, amount);
+CREATE INDEX idx_customers_region ON customers (region_id);
+
+-- Internal daily x product x region rollup of sales, maintained by setup_database.py.
+-- Aggregate queries over sales are transparently answered from it; it is not part of the RAG schema context.
+CREATE TABLE sales_daily_rollup (
+    sale_date TEXT NOT NULL, -- Stored as YYYY-MM-DD
+    product_id INTEGER NOT NULL,
+    region_id INTEGER NOT NULL,
+    total_quantity INTEGER NOT NULL,
+    total_amount REAL NOT NULL,
+    sale_count INTEGER NOT NULL,
+    PRIMARY KEY (sale_date, product_id, region_id)
+) WITHOUT ROWID;
\ No newline at end of file
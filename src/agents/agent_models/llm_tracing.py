@@ -0,0 +1,92 @@
+import threading
+from typing import Any, Dict, List, Optional
+
+from llama_index.core.callbacks import CallbackManager, CBEventType, EventPayload
+from llama_index.core.callbacks.base_handler import BaseCallbackHandler
+
+from ..tracing import start_span
+
+CHARS_PER_TOKEN = 4 # Used to estimate token counts when the provider does not report usage
+
+
+def _text_of(response) -> str:
+    message = getattr(response, "message", None)
+    if message is not None:
+        return message.content or ""
+    return getattr(response, "text", None) or ""
+
+
+def _reported_usage(response):
+    """Returns (prompt_tokens, completion_tokens) as reported by the API, or None."""
+    counts = getattr(response, "additional_kwargs", None) or {}
+    if "prompt_tokens" in counts:
+        return counts["prompt_tokens"], counts.get("completion_tokens", 0)
+    usage = getattr(getattr(response, "raw", None), "usage", None)
+    if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+        return usage.prompt_tokens, usage.completion_tokens or 0
+    return None
+
+
+class LLMTracingHandler(BaseCallbackHandler):
+    """
+    Records every chat/completion call of an LLM as an "llm" span.
+
+    Attributes include the model, the number of messages, prompt and completion sizes, and token
+    counts: reported usage where the API returns it, otherwise an estimate (tokens_estimated=True).
+    Streaming calls end when the stream is exhausted.
+    """
+
+    def __init__(self, model_name: str):
+        super().__init__(event_starts_to_ignore=[], event_ends_to_ignore=[])
+        self.model_name = model_name
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    def on_event_start(self, event_type: CBEventType, payload: Optional[Dict[str, Any]] = None,
+                       event_id: str = "", parent_id: str = "", **kwargs: Any) -> str:
+        if event_type != CBEventType.LLM:
+            return event_id
+        payload = payload or {}
+        messages = payload.get(EventPayload.MESSAGES)
+        if messages is not None:
+            prompt_chars = sum(len(message.content or "") for message in messages)
+            attributes = {"messages": len(messages)}
+        else:
+            prompt_chars = len(payload.get(EventPayload.PROMPT) or "")
+            attributes = {}
+        span = start_span("llm", model=self.model_name, prompt_chars=prompt_chars, **attributes)
+        with self._lock:
+            self._spans[event_id] = span
+        return event_id
+
+    def on_event_end(self, event_type: CBEventType, payload: Optional[Dict[str, Any]] = None,
+                     event_id: str = "", **kwargs: Any) -> None:
+        if event_type != CBEventType.LLM:
+            return
+        with self._lock:
+            span = self._spans.pop(event_id, None)
+        if span is None:
+            return
+        payload = payload or {}
+        exception = payload.get(EventPayload.EXCEPTION)
+        if exception is not None:
+            span.end(error=exception)
+            return
+        response = payload.get(EventPayload.RESPONSE) or payload.get(EventPayload.COMPLETION)
+        completion_chars = len(_text_of(response))
+        usage = _reported_usage(response)
+        if usage is None:
+            usage = (span.attributes["prompt_chars"] // CHARS_PER_TOKEN, completion_chars // CHARS_PER_TOKEN)
+            span.set(tokens_estimated=True)
+        span.set(completion_chars=completion_chars, prompt_tokens=usage[0], completion_tokens=usage[1])
+        span.end()
+
+    def start_trace(self, trace_id: Optional[str] = None) -> None:
+        pass
+
+    def end_trace(self, trace_id: Optional[str] = None, trace_map: Optional[Dict[str, List[str]]] = None) -> None:
+        pass
+
+
+def tracing_callback_manager(model_name: str) -> CallbackManager:
+    return CallbackManager([LLMTracingHandler(model_name)])
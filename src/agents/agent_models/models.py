@@ -1,14 +1,23 @@
 import os
-from llama_index.llms.nebius import NebiusLLM
-from openai import OpenAI
 from dotenv import load_dotenv
 load_dotenv() 
 
 base_agent_model_id = "Qwen/Qwen3-235B-A22B"
 finetuned_model_id = "meta-llama/Meta-Llama-3.1-8B-Instruct-LoRa:nl-to-sql-finetuned-jbkN"
 
+def _llm_options(model_id: str) -> dict:
+    from ..tracing import AGENT_TRACING_ENABLED
+    if not AGENT_TRACING_ENABLED:
+        return {}
+    # Every chat/completion call is recorded as an "llm" span (see tracing.py)
+    from .llm_tracing import tracing_callback_manager
+    return {"callback_manager": tracing_callback_manager(model_id)}
+
+# The LLM integration is imported on first use; it pulls in the OpenAI client stack, which slows down every import
 def get_base_agent_model():
-    return NebiusLLM(api_key=os.environ["NEBIUS_API_KEY"], model=base_agent_model_id)
+    from llama_index.llms.nebius import NebiusLLM
+    return NebiusLLM(api_key=os.environ["NEBIUS_API_KEY"], model=base_agent_model_id, **_llm_options(base_agent_model_id))
 
 def get_finetuned_model():
-    return NebiusLLM(api_key=os.environ["NEBIUS_API_KEY"], model=finetuned_model_id)
\ No newline at end of file
+    from llama_index.llms.nebius import NebiusLLM
+    return NebiusLLM(api_key=os.environ["NEBIUS_API_KEY"], model=finetuned_model_id, **_llm_options(finetuned_model_id))
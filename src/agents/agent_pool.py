@@ -0,0 +1,168 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+AGENT_POOL_SIZE = int(os.environ.get("AGENT_POOL_SIZE", "4")) # Questions processed concurrently
+AGENT_POOL_QUEUE_TIMEOUT = float(os.environ.get("AGENT_POOL_QUEUE_TIMEOUT", "120")) # Seconds a question may wait for an agent
+AGENT_SESSION_IDLE_SECONDS = float(os.environ.get("AGENT_SESSION_IDLE_SECONDS", "3600")) # Forget idle conversations after this
+AGENT_MAX_SESSIONS = int(os.environ.get("AGENT_MAX_SESSIONS", "1000"))
+
+
+class AgentPoolTimeoutError(Exception):
+    """Raised when no agent became free within the queue timeout."""
+
+
+class _Session:
+    def __init__(self):
+        self.memory = None
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+
+class AgentPool:
+    """
+    A bounded pool of NLSQLAgent instances shared by all user sessions.
+
+    Agents are created on demand up to `size`; further questions queue (FIFO) until an agent is
+    returned. Each session keeps its own chat memory, which is attached to whichever agent serves
+    its question, so conversations neither interleave nor leak into each other. Questions from
+    the same session run one at a time. Must be used from a single event loop.
+    """
+
+    def __init__(self, agent_factory=None, size: int = AGENT_POOL_SIZE, queue_timeout: float = AGENT_POOL_QUEUE_TIMEOUT,
+                 session_idle_seconds: float = AGENT_SESSION_IDLE_SECONDS, max_sessions: int = AGENT_MAX_SESSIONS):
+        if agent_factory is None:
+            from .nl_sql_agent import NLSQLAgent
+            agent_factory = NLSQLAgent
+        self.agent_factory = agent_factory
+        self.size = max(1, size)
+        self.queue_timeout = queue_timeout
+        self.session_idle_seconds = session_idle_seconds
+        self.max_sessions = max_sessions
+
+        self._idle = asyncio.Queue()
+        self._agents = []
+        self._sessions = OrderedDict()
+        self._created = 0
+        self._in_use = 0
+        self._waiting = 0
+
+        self.queries = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+
+    @property
+    def waiting(self) -> int:
+        """Questions currently queued for an agent."""
+        return self._waiting
+
+    @property
+    def in_use(self) -> int:
+        """Agents currently answering a question."""
+        return self._in_use
+
+    async def _acquire(self):
+        # Queued questions go first; a newcomer only takes an idle agent when nobody is waiting
+        if self._waiting == 0:
+            if not self._idle.empty():
+                return self._idle.get_nowait()
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    agent = self.agent_factory()
+                except Exception:
+                    self._created -= 1
+                    raise
+                self._agents.append(agent)
+                return agent
+        self._waiting += 1
+        try:
+            return await asyncio.wait_for(self._idle.get(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise AgentPoolTimeoutError(
+                f"No agent became available within {self.queue_timeout:g}s ({self.size} busy)."
+            ) from None
+        finally:
+            self._waiting -= 1
+
+    def _session(self, session_id: str) -> _Session:
+        now = time.monotonic()
+        session = self._sessions.pop(session_id, None) or _Session()
+        session.last_used = now
+        self._sessions[session_id] = session
+        # Sessions are kept in least recently used order; drop idle ones and any over the cap
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            expired = now - oldest.last_used > self.session_idle_seconds
+            if oldest_id == session_id or not (expired or len(self._sessions) > self.max_sessions):
+                break
+            if oldest.lock.locked():
+                break
+            del self._sessions[oldest_id]
+        return session
+
+    @asynccontextmanager
+    async def checkout(self, session_id: str):
+        """Checks out an agent bound to `session_id`'s chat memory and returns it to the pool afterwards."""
+        session = self._session(session_id)
+        async with session.lock:
+            started = time.perf_counter()
+            agent = await self._acquire()
+            waited = time.perf_counter() - started
+            self.queries += 1
+            self.total_wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            if waited > 0.5:
+                logging.info(f"Session {session_id} waited {waited:.1f}s for an agent.")
+            self._in_use += 1
+            try:
+                if session.memory is None:
+                    session.memory = agent.new_memory()
+                agent.use_memory(session.memory)
+                yield agent
+            finally:
+                self._in_use -= 1
+                session.last_used = time.monotonic()
+                self._idle.put_nowait(agent)
+
+    async def process_query(self, session_id: str, user_query: str) -> str:
+        """Answers `user_query` in the conversation identified by `session_id`."""
+        async with self.checkout(session_id) as agent:
+            return await agent.process_query(user_query)
+
+    def reset_session(self, session_id: str):
+        """Forgets a session's conversation history."""
+        self._sessions.pop(session_id, None)
+
+    def agent_stats(self) -> dict:
+        """Sums the counters reported by each agent's `stats()` (e.g. ReAct iterations saved by prefetching)."""
+        totals = {}
+        for agent in self._agents:
+            for name, value in getattr(agent, "stats", dict)().items():
+                if not name.startswith("avg_"):
+                    totals[name] = totals.get(name, 0) + value
+        if totals.get("answers"):
+            totals["avg_first_token_ms"] = totals["first_token_seconds"] / totals["answers"] * 1000
+            totals["avg_answer_ms"] = totals["answer_seconds"] / totals["answers"] * 1000
+        return totals
+
+    def stats(self) -> dict:
+        from .agent_tools.tool_executor import get_tool_executor
+        return {
+            "size": self.size,
+            "created": self._created,
+            "in_use": self._in_use,
+            "waiting": self._waiting,
+            "sessions": len(self._sessions),
+            "queries": self.queries,
+            "avg_wait_ms": (self.total_wait_seconds / self.queries * 1000) if self.queries else 0.0,
+            "max_wait_ms": self.max_wait_seconds * 1000,
+            "timeouts": self.timeouts,
+            "agents": self.agent_stats(),
+            "tool_executor": get_tool_executor().stats(),
+        }
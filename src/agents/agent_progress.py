@@ -0,0 +1,40 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class AgentEvent:
+    """
+    One update while a question is being answered.
+
+    kind is "status" (a step finished, e.g. schema retrieved or rows returned), "token" (the next
+    piece of the answer text), "result" (the id of a query result saved for download; see
+    SQLResultStore) or "answer" (the complete answer; always the last event).
+    """
+
+    def __init__(self, kind: str, text: str):
+        self.kind = kind
+        self.text = text
+
+    def __repr__(self):
+        return f"AgentEvent({self.kind!r}, {self.text!r})"
+
+
+# Receives the events reported while a question is answered; tools run in worker threads, so the
+# sink must be thread-safe. Unset outside NLSQLAgent.astream_query, which makes reporting a no-op.
+_progress_sink = ContextVar("progress_sink", default=None)
+
+
+@contextmanager
+def capture_progress(sink):
+    """Routes events reported in this context (including worker threads of the tool executor and asyncio.to_thread) to `sink`."""
+    token = _progress_sink.set(sink)
+    try:
+        yield
+    finally:
+        _progress_sink.reset(token)
+
+
+def report_progress(text: str, kind: str = "status"):
+    sink = _progress_sink.get()
+    if sink is not None:
+        sink(AgentEvent(kind, text))
@@ -0,0 +1,197 @@
+import re
+import sqlite3
+import threading
+from typing import Optional
+
+from .sql_result_cache import strip_sql_comments
+
+# SQLite date/time functions; calls whose arguments are all constants are evaluated by SQLite itself
+SQLITE_DATE_FUNCTIONS = ("DATE", "DATETIME", "TIME", "STRFTIME", "JULIANDAY", "UNIXEPOCH")
+# STRFTIME specifiers that DuckDB's strftime formats the same way
+DUCKDB_STRFTIME_SPECIFIERS = set("YmdHMSjwW%")
+
+# Settings that make DuckDB evaluate like SQLite: 5/2 = 2, and NULLs sort first in ascending order
+DUCKDB_SESSION_SETTINGS = (
+    "SET integer_division = true",
+    "SET default_null_order = 'nulls_first_on_asc_last_on_desc'",
+)
+
+_TOKEN_PATTERN = re.compile(
+    r"('(?:[^']|'')*')"                               # string literal
+    r"|(\"(?:[^\"]|\"\")*\")"                          # quoted identifier
+    r"|(`|\[)"                                         # MySQL/SQL Server identifier quoting
+    r"|\b(" + "|".join(SQLITE_DATE_FUNCTIONS) + r")\s*\("  # date function call
+    r"|\b(LIKE|GLOB|REGEXP|MATCH)\b"
+    r"|\bAS\s+(REAL|INTEGER|INT)\b",
+    re.IGNORECASE,
+)
+
+_local = threading.local()
+
+
+class UnsupportedQuery(Exception):
+    """The query uses SQLite behaviour the DuckDB translation does not cover; run it on SQLite."""
+
+
+def normalize_statement(sql_query: str) -> str:
+    """
+    `sql_query` without comments and trailing semicolons, ready to be embedded in another query
+    or extended with more clauses. SQLite accepts "SELECT ...; -- note"; a subquery or an
+    appended ORDER BY does not.
+    """
+    return re.sub(r"[\s;]+$", "", strip_sql_comments(sql_query)).lstrip()
+
+
+def _sqlite_constant(expression: str):
+    """Evaluates a constant expression (e.g. DATE('now', '-1 month')) with SQLite's own semantics."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = sqlite3.connect(":memory:")
+    try:
+        return conn.execute(f"SELECT {expression}").fetchone()[0]
+    except sqlite3.Error as e:
+        raise UnsupportedQuery(f"could not evaluate {expression}: {e}")
+
+
+def _literal(value) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return repr(value)
+
+
+def _split_call(sql: str, start: int) -> tuple:
+    """From just after a call's opening parenthesis, returns (top-level argument strings, index after ')')."""
+    depth, args, current, i = 0, [], start, start
+    while i < len(sql):
+        char = sql[i]
+        if char in "'\"":
+            end = i + 1
+            while True:
+                end = sql.find(char, end)
+                if end == -1:
+                    raise UnsupportedQuery("unterminated literal")
+                if sql[end + 1:end + 2] == char:
+                    end += 2
+                    continue
+                break
+            i = end + 1
+            continue
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            if depth == 0:
+                args = [arg.strip() for arg in args + [sql[current:i]]]
+                return ([] if args == [""] else args), i + 1
+            depth -= 1
+        elif char == "," and depth == 0:
+            args.append(sql[current:i])
+            current = i + 1
+        i += 1
+    raise UnsupportedQuery("unbalanced parentheses")
+
+
+def _is_constant(argument: str) -> bool:
+    return bool(re.fullmatch(r"'(?:[^']|'')*'|[-+]?\d+(?:\.\d+)?|NULL", argument, re.IGNORECASE))
+
+
+def _translate_date_call(function: str, args: list) -> str:
+    if all(_is_constant(arg) for arg in args):
+        return _literal(_sqlite_constant(f"{function}({', '.join(args)})"))
+    if function == "STRFTIME" and len(args) == 2 and _is_constant(args[0]):
+        specifiers = set(re.findall(r"%(.)", args[0]))
+        if specifiers <= DUCKDB_STRFTIME_SPECIFIERS:
+            return f"strftime(CAST({args[1]} AS TIMESTAMP), {args[0]})"
+    if function == "DATE" and len(args) == 1:
+        return f"CAST(CAST({args[0]} AS DATE) AS VARCHAR)"
+    raise UnsupportedQuery(f"{function}() with these arguments has no DuckDB equivalent")
+
+
+def _top_level(sql: str) -> str:
+    """`sql` with literals, quoted identifiers and everything inside parentheses removed."""
+    sql = re.sub(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"", "''", sql)
+    parts, depth = [], 0
+    for char in sql:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif depth == 0:
+            parts.append(char)
+    return "".join(parts)
+
+
+def _order_groups_like_sqlite(sql_query: str) -> str:
+    """
+    Sorts an unordered GROUP BY result, as SQLite's sort-based grouping returns it.
+
+    Without ORDER BY neither engine guarantees an order, but SQLite's grouped output comes out
+    sorted, and the same question should not get differently ordered answers per engine. ORDER BY
+    ALL sorts by the selected columns left to right, which matches whenever the group keys come
+    first. Queries with window functions are left alone: SQLite returns them in window order.
+    """
+    sql_query = normalize_statement(sql_query)
+    top_level = _top_level(sql_query).upper()
+    if (re.search(r"\bGROUP\s+BY\b", top_level)
+            and not re.search(r"\b(?:ORDER\s+BY|LIMIT|UNION|INTERSECT|EXCEPT|OVER)\b", top_level)):
+        return f"{sql_query} ORDER BY ALL"
+    return sql_query
+
+
+def _translate(sql_query: str) -> str:
+    parts, position = [], 0
+    while True:
+        match = _TOKEN_PATTERN.search(sql_query, position)
+        if match is None:
+            parts.append(sql_query[position:])
+            return "".join(parts)
+        parts.append(sql_query[position:match.start()])
+        literal, identifier, foreign_quote, function, operator, cast_type = match.groups()
+        if literal or identifier:
+            parts.append(match.group(0))
+            position = match.end()
+        elif foreign_quote:
+            raise UnsupportedQuery("identifier quoting with backticks or brackets")
+        elif function:
+            args, position = _split_call(sql_query, match.end())
+            args = [_translate(arg) for arg in args]
+            parts.append(_translate_date_call(function.upper(), args))
+        elif operator:
+            if operator.upper() != "LIKE":
+                raise UnsupportedQuery(f"{operator.upper()} operator")
+            parts.append("ILIKE")
+            position = match.end()
+        else:
+            parts.append("AS DOUBLE" if cast_type.upper() == "REAL" else "AS BIGINT")
+            position = match.end()
+
+
+def translate_sqlite_to_duckdb(sql_query: str) -> str:
+    """
+    Rewrites a SQLite SELECT so DuckDB returns the same result.
+
+    - DATE/DATETIME/STRFTIME/... calls on constants, like DATE('now', '-1 month'), are evaluated
+      by SQLite and inlined as literals, so 'now' (UTC) and month arithmetic follow SQLite.
+    - STRFTIME(format, column) and DATE(column) become DuckDB's strftime and casts; dates stay
+      'YYYY-MM-DD' text, as SQLite stores them.
+    - LIKE becomes ILIKE (SQLite's LIKE ignores ASCII case); CAST AS REAL/INTEGER become
+      DOUBLE/BIGINT (SQLite's 64-bit types).
+    - An unordered GROUP BY result is sorted the way SQLite returns it.
+
+    Integer division and NULL ordering are handled by DUCKDB_SESSION_SETTINGS. Comments and
+    trailing semicolons are dropped first (see `normalize_statement`).
+
+    Raises:
+        UnsupportedQuery: For constructs without an equivalent (GLOB, REGEXP, date modifiers
+                          applied to columns, `[identifier]` quoting, ...).
+    """
+    return _order_groups_like_sqlite(_translate(normalize_statement(sql_query)))
+
+
+def try_translate(sql_query: str) -> Optional[str]:
+    """`translate_sqlite_to_duckdb`, or None if the query has to run on SQLite."""
+    try:
+        return translate_sqlite_to_duckdb(sql_query)
+    except UnsupportedQuery:
+        return None
@@ -0,0 +1,253 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from pydantic import PrivateAttr
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
+
+EMBEDDING_CACHE_PATH = os.environ.get(
+    "EMBEDDING_CACHE_PATH", os.path.join(PROJECT_ROOT, '.cache', 'embedding_cache.sqlite3')
+)
+EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_MEMORY_ENTRIES", "4096"))
+EMBEDDING_CACHE_DISK_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_DISK_ENTRIES", "200000"))
+
+
+def embedding_cache_key(model_name: str, kind: str, text: str) -> str:
+    """Cache key for one embedding: the model, whether it is a query or text embedding, and a text hash."""
+    return hashlib.sha256(f"{model_name}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingDiskCache:
+    """
+    A size-bounded SQLite store of embeddings, kept as compact float32 blobs.
+
+    When the store grows past `max_entries`, the least recently used tenth is deleted.
+    The database runs in WAL mode so the app and an indexing run can share it.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_DISK_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model_name TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys: List[str]) -> dict:
+        if not keys:
+            return {}
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(time.time(), key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, model_name: str, items: dict):
+        if not items:
+            return
+        now = time.time()
+        rows = [(key, model_name, len(vector), array("f", vector).tobytes(), now) for key, vector in items.items()]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+            self._count += len(rows)
+            if self._count > self.max_entries:
+                self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                excess = self._count - self.max_entries
+                if excess > 0:
+                    evict = excess + self.max_entries // 10
+                    self._conn.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY last_access LIMIT ?)", (evict,)
+                    )
+                    self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            self._conn.commit()
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Wraps an embedding model with a two-tier cache: an in-memory LRU in front of an on-disk store.
+
+    Only texts missing from both tiers are sent to the wrapped model, so repeated questions and
+    unchanged knowledge base content never pay for a remote embedding call twice.
+    """
+
+    _inner: BaseEmbedding = PrivateAttr()
+    _memory: OrderedDict = PrivateAttr()
+    _memory_entries: int = PrivateAttr()
+    _disk: Optional[EmbeddingDiskCache] = PrivateAttr()
+    _lock: Any = PrivateAttr()
+    _stats: dict = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, disk_cache: Optional[EmbeddingDiskCache] = None,
+                 memory_entries: int = EMBEDDING_CACHE_MEMORY_ENTRIES, **kwargs: Any):
+        super().__init__(model_name=inner.model_name, embed_batch_size=inner.embed_batch_size, **kwargs)
+        self._inner = inner
+        self._memory = OrderedDict()
+        self._memory_entries = memory_entries
+        self._disk = disk_cache
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def inner(self) -> BaseEmbedding:
+        return self._inner
+
+    def cache_stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, memory_entries=len(self._memory))
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._memory_entries:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, kind: str, texts: List[str]):
+        """Returns (keys, vectors found so far with None for misses)."""
+        keys = [embedding_cache_key(self.model_name, kind, text) for text in texts]
+        vectors = [None] * len(texts)
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    vectors[i] = vector
+                    self._stats["memory_hits"] += 1
+        missing_keys = [key for key, vector in zip(keys, vectors) if vector is None]
+        if missing_keys and self._disk is not None:
+            try:
+                from_disk = self._disk.get_many(list(dict.fromkeys(missing_keys)))
+            except sqlite3.Error as e:
+                logging.warning(f"Embedding disk cache read failed: {e}")
+                from_disk = {}
+            with self._lock:
+                for i, key in enumerate(keys):
+                    if vectors[i] is None and key in from_disk:
+                        vectors[i] = from_disk[key]
+                        self._remember(key, from_disk[key])
+                        self._stats["disk_hits"] += 1
+        return keys, vectors
+
+    def _store(self, keys: List[str], vectors: List[List[float]], computed: List[int]):
+        new_items = {keys[i]: vectors[i] for i in computed}
+        with self._lock:
+            self._stats["misses"] += len(computed)
+            for key, vector in new_items.items():
+                self._remember(key, vector)
+        if self._disk is not None:
+            try:
+                self._disk.put_many(self.model_name, new_items)
+            except sqlite3.Error as e:
+                logging.warning(f"Embedding disk cache write failed: {e}")
+
+    @staticmethod
+    def _missing(keys: List[str], vectors: list) -> dict:
+        """Maps each distinct missing key to the first position it appears at."""
+        missing = {}
+        for i, (key, vector) in enumerate(zip(keys, vectors)):
+            if vector is None and key not in missing:
+                missing[key] = i
+        return missing
+
+    def _fill(self, keys: List[str], vectors: list, missing: dict, computed: List[List[float]]):
+        by_key = dict(zip(missing, computed))
+        for i, key in enumerate(keys):
+            if vectors[i] is None:
+                vectors[i] = by_key[key]
+        self._store(keys, vectors, list(missing.values()))
+
+    def _embed_cached(self, kind: str, texts: List[str], compute) -> List[List[float]]:
+        keys, vectors = self._lookup(kind, texts)
+        missing = self._missing(keys, vectors)
+        if missing:
+            self._fill(keys, vectors, missing, compute([texts[i] for i in missing.values()]))
+        return vectors
+
+    async def _aembed_cached(self, kind: str, texts: List[str], acompute) -> List[List[float]]:
+        keys, vectors = self._lookup(kind, texts)
+        missing = self._missing(keys, vectors)
+        if missing:
+            self._fill(keys, vectors, missing, await acompute([texts[i] for i in missing.values()]))
+        return vectors
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed_cached("query", [query], lambda texts: [self._inner.get_query_embedding(texts[0])])[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        async def compute(texts):
+            return [await self._inner.aget_query_embedding(texts[0])]
+        return (await self._aembed_cached("query", [query], compute))[0]
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embed_cached("text", [text], lambda texts: [self._inner.get_text_embedding(texts[0])])[0]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        async def compute(texts):
+            return [await self._inner.aget_text_embedding(texts[0])]
+        return (await self._aembed_cached("text", [text], compute))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._embed_cached("text", texts, self._inner.get_text_embedding_batch)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return await self._aembed_cached("text", texts, self._inner.aget_text_embedding_batch)
+
+
+_disk_cache = None
+_disk_cache_lock = threading.Lock()
+
+def get_embedding_disk_cache() -> Optional[EmbeddingDiskCache]:
+    """Returns the process-wide on-disk embedding store, or None if it cannot be opened."""
+    global _disk_cache
+    if _disk_cache is None:
+        with _disk_cache_lock:
+            if _disk_cache is None:
+                try:
+                    _disk_cache = EmbeddingDiskCache()
+                except (sqlite3.Error, OSError) as e:
+                    logging.warning(f"Embedding disk cache unavailable at {EMBEDDING_CACHE_PATH}: {e}")
+                    return None
+    return _disk_cache
+
+def with_embedding_cache(embed_model: BaseEmbedding) -> CachedEmbedding:
+    """Wraps `embed_model` with the in-memory LRU and the shared on-disk embedding store."""
+    return CachedEmbedding(embed_model, disk_cache=get_embedding_disk_cache())
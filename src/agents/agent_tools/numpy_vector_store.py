@@ -0,0 +1,103 @@
+import os
+import json
+import logging
+import numpy as np
+
+# Which vector store rag_index.py builds and the retrievers load: "chroma" or "numpy"
+VECTOR_STORE_BACKEND = os.environ.get("VECTOR_STORE_BACKEND", "chroma").lower()
+
+EMBEDDINGS_FILE = "embeddings.npy"
+METADATA_FILE = "metadata.json"
+
+
+class NumpyVectorStore:
+    """
+    An exact in-process vector index for small knowledge bases.
+
+    Embeddings are L2-normalized and stored as one contiguous float32 matrix (memory-mapped on
+    load), so a top-k query is a single matrix-vector product plus a partial sort. Node ids,
+    texts and metadata live in a JSON side file, row-aligned with the matrix.
+    """
+
+    def __init__(self, embeddings: np.ndarray, ids: list, texts: list, metadatas: list):
+        if not (embeddings.shape[0] == len(ids) == len(texts) == len(metadatas)):
+            raise ValueError("Embeddings, ids, texts and metadatas must have the same length.")
+        self.embeddings = embeddings
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    @classmethod
+    def from_embeddings(cls, ids: list, texts: list, embeddings: list, metadatas: list) -> "NumpyVectorStore":
+        matrix = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        return cls(np.ascontiguousarray(cls._normalize(matrix), dtype=np.float32), list(ids), list(texts), list(metadatas))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def persist(self, directory: str):
+        """Writes the matrix and the side file; each file is replaced atomically, metadata last."""
+        os.makedirs(directory, exist_ok=True)
+        embeddings_path = os.path.join(directory, EMBEDDINGS_FILE)
+        metadata_path = os.path.join(directory, METADATA_FILE)
+        with open(embeddings_path + ".tmp", "wb") as f:
+            np.save(f, self.embeddings)
+        os.replace(embeddings_path + ".tmp", embeddings_path)
+        with open(metadata_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"ids": self.ids, "texts": self.texts, "metadatas": self.metadatas}, f)
+        os.replace(metadata_path + ".tmp", metadata_path)
+        logging.info(f"Persisted {len(self)} vectors to {directory}")
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "NumpyVectorStore":
+        with open(os.path.join(directory, METADATA_FILE), "r", encoding="utf-8") as f:
+            side = json.load(f)
+        embeddings = np.load(os.path.join(directory, EMBEDDINGS_FILE), mmap_mode="r" if mmap else None)
+        return cls(embeddings, side["ids"], side["texts"], side["metadatas"])
+
+    def query(self, query_embedding: list, top_k: int = 2) -> list:
+        """Returns [(row index, cosine similarity)] for the `top_k` nearest vectors, best first."""
+        if len(self) == 0:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        scores = self.embeddings @ query
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+
+class NumpyVectorRetriever:
+    """Retriever over a NumpyVectorStore, returning LlamaIndex nodes like the Chroma-backed one."""
+
+    def __init__(self, store: NumpyVectorStore, embed_model, similarity_top_k: int = 2):
+        self.store = store
+        self.embed_model = embed_model
+        self.similarity_top_k = similarity_top_k
+
+    def _to_nodes(self, matches: list) -> list:
+        from llama_index.core.schema import NodeWithScore, TextNode
+        return [
+            NodeWithScore(
+                node=TextNode(text=self.store.texts[i], id_=self.store.ids[i], metadata=self.store.metadatas[i]),
+                score=score,
+            )
+            for i, score in matches
+        ]
+
+    def retrieve(self, query: str) -> list:
+        query_embedding = self.embed_model.get_query_embedding(query)
+        return self._to_nodes(self.store.query(query_embedding, self.similarity_top_k))
+
+    async def aretrieve(self, query: str) -> list:
+        query_embedding = await self.embed_model.aget_query_embedding(query)
+        return self._to_nodes(self.store.query(query_embedding, self.similarity_top_k))
@@ -0,0 +1,81 @@
+import re
+import logging
+import sqlite3
+
+from ..settings import env_flag
+
+SQL_PLAN_INSPECTION_ENABLED = env_flag("SQL_PLAN_INSPECTION", True)
+# Fact tables large enough that a full scan is worth a warning
+LARGE_TABLES = ("sales",)
+
+_SQL_KEYWORDS = {
+    "where", "join", "inner", "left", "right", "full", "cross", "outer", "natural", "on", "using",
+    "group", "order", "limit", "having", "union", "except", "intersect", "window",
+}
+
+
+def table_aliases(sql_query: str, table_name: str) -> set:
+    """Returns the names `table_name` goes by in the query (the table name plus any aliases)."""
+    names = {table_name.lower()}
+    pattern = re.compile(
+        rf"\b(?:from|join)\s+[\"`\[]?{re.escape(table_name)}[\"`\]]?(?:\s+(?:as\s+)?([A-Za-z_]\w*))?",
+        re.IGNORECASE,
+    )
+    for match in pattern.finditer(sql_query):
+        alias = match.group(1)
+        if alias and alias.lower() not in _SQL_KEYWORDS:
+            names.add(alias.lower())
+    return names
+
+
+def explain_query_plan(conn: sqlite3.Connection, sql_query: str) -> list:
+    """Runs EXPLAIN QUERY PLAN and returns the plan's detail lines in order."""
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql_query}").fetchall()
+    # Rows are (id, parent, notused, detail)
+    return [row[3] for row in rows]
+
+
+def find_full_scans(plan_details: list, sql_query: str, tables=LARGE_TABLES) -> list:
+    """
+    Returns the large tables the plan reads with a full table scan.
+
+    A `SCAN <table>` step is a full scan (with an extra row lookup per entry when it walks a
+    non-covering index), and so is a skip-scan (`SEARCH ... (ANY(col) ...)`), which visits every
+    entry of an index. `SCAN ... USING COVERING INDEX` reads only the narrower index and ordinary
+    `SEARCH` steps seek by key, so neither is reported.
+    """
+    scanned = []
+    for table in tables:
+        names = table_aliases(sql_query, table)
+        for detail in plan_details:
+            match = re.match(r"(SCAN|SEARCH) (?:TABLE )?([\w\"]+)(?: AS (\w+))?(.*)$", detail)
+            if not match:
+                continue
+            scanned_name = (match.group(3) or match.group(2)).strip('"').lower()
+            if scanned_name not in names:
+                continue
+            rest = match.group(4)
+            if (match.group(1) == "SCAN" and "COVERING INDEX" not in rest) or "(ANY(" in rest:
+                scanned.append(table)
+                break
+    return scanned
+
+
+def inspect_query_plan(conn: sqlite3.Connection, sql_query: str) -> list:
+    """
+    Explains `sql_query` and logs a warning for each full scan of a large table.
+
+    Returns:
+        list: The plan detail lines (empty if the query could not be explained).
+    """
+    try:
+        plan_details = explain_query_plan(conn, sql_query)
+    except sqlite3.Error:
+        # The query itself will fail and report the error when it is executed
+        return []
+    for table in find_full_scans(plan_details, sql_query):
+        logging.warning(
+            f"Generated SQL performs a full scan of '{table}': {sql_query!r}. "
+            f"Plan: {' | '.join(plan_details)}"
+        )
+    return plan_details
@@ -0,0 +1,255 @@
+import re
+import sqlite3
+
+from ..settings import env_flag
+
+SQL_ROLLUP_ROUTING_ENABLED = env_flag("SQL_ROLLUP_ROUTING", True)
+
+# Must match the rollup built by src/setup_database.py
+ROLLUP_TABLE = "sales_daily_rollup"
+# Columns the rollup groups by; they keep their names in the rollup table
+ROLLUP_KEY_COLUMNS = {"sale_date", "product_id", "region_id"}
+# Sales columns that only survive inside aggregates
+ROLLUP_MEASURES = {"amount": "total_amount", "quantity": "total_quantity"}
+# Columns of sales that no other table in the schema has, so they are unambiguous unqualified
+SALES_ONLY_COLUMNS = {"sale_id", "customer_id", "amount", "quantity"}
+NOT_NULL_SALES_COLUMNS = {"sale_id", "product_id", "customer_id", "region_id", "sale_date", "quantity", "amount"}
+
+_AGGREGATES = {"sum", "total", "avg", "count", "min", "max", "group_concat"}
+_REJECTED_KEYWORDS = {"over", "union", "intersect", "except", "with", "window", ROLLUP_TABLE}
+_OUTER_JOIN_KEYWORDS = {"left", "right", "full"}
+_ALIAS_STOPWORDS = {
+    "where", "join", "inner", "left", "right", "full", "cross", "outer", "natural", "on", "using",
+    "group", "order", "limit", "having", "as",
+}
+
+_TOKEN_PATTERN = re.compile(r"""
+    (?P<ws>\s+|--[^\n]*|/\*.*?\*/)
+   |(?P<string>'(?:[^']|'')*')
+   |(?P<qident>"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])
+   |(?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+)
+   |(?P<ident>[A-Za-z_][A-Za-z_0-9$]*)
+   |(?P<op>\|\||<=|>=|<>|!=|==|<<|>>|[-+*/%(),.;<>=&|~])
+""", re.VERBOSE | re.DOTALL)
+
+
+class _NotEligible(Exception):
+    pass
+
+
+def _tokenize(sql_query: str) -> list:
+    tokens = []
+    position = 0
+    while position < len(sql_query):
+        match = _TOKEN_PATTERN.match(sql_query, position)
+        if not match:
+            raise _NotEligible(f"cannot tokenize at {position}")
+        tokens.append([match.lastgroup, match.group()])
+        position = match.end()
+    return tokens
+
+
+def rollup_available(conn: sqlite3.Connection) -> bool:
+    """Checks whether the database has the sales rollup table."""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (ROLLUP_TABLE,)
+    ).fetchone()
+    return row is not None
+
+
+def rewrite_for_rollup(sql_query: str):
+    """
+    Rewrites an aggregate query over `sales` to read from the daily rollup instead.
+
+    The rollup keeps every (sale_date, product_id, region_id) group of sales together: as long as
+    the query touches sales only through those columns and through SUM/TOTAL/AVG/COUNT of the
+    measures, every sales row in a group is treated the same way, so the rewritten query returns
+    the same rows. Sums of REAL amounts are added up from pre-summed daily totals, in a different
+    order, so they can differ from the original in the last digits. MIN, MAX and DISTINCT
+    aggregates are unaffected by collapsing duplicate rows and are kept as is. Anything else
+    (other sales columns, outer joins, window functions, subqueries, row-level results) leaves
+    the query on the fact table.
+
+    Output column names are preserved by aliasing rewritten select items with their original text.
+
+    Args:
+        sql_query (str): A SELECT query.
+
+    Returns:
+        str or None: The rewritten query, or None if the query is not eligible.
+    """
+    try:
+        return _rewrite(sql_query)
+    except _NotEligible:
+        return None
+
+
+def _rewrite(sql_query: str) -> str:
+    tokens = _tokenize(sql_query.strip().rstrip(";"))
+    sig = [i for i, (kind, _) in enumerate(tokens) if kind != "ws"]
+    words = [tokens[i][1].lower() if tokens[i][0] == "ident" else tokens[i][1] for i in sig]
+
+    if words.count("select") != 1 or words[0] != "select":
+        raise _NotEligible("only single SELECT statements are routed")
+    if _REJECTED_KEYWORDS & set(words):
+        raise _NotEligible("unsupported construct")
+    if any(word in _OUTER_JOIN_KEYWORDS and n + 1 < len(words) and words[n + 1] in ("join", "outer")
+           for n, word in enumerate(words)):
+        # On the nullable side of an outer join, COUNT(*) counts an unmatched row as 1 but the
+        # rewritten SUM(sale_count) as 0
+        raise _NotEligible("outer joins are not routed")
+
+    # Locate the single reference to the sales table and its alias
+    sales_refs = [
+        n for n, word in enumerate(words)
+        if word == "sales" and tokens[sig[n]][0] == "ident"
+        and not (n + 1 < len(words) and words[n + 1] == ".")
+        and not (n > 0 and words[n - 1] == ".")
+    ]
+    if len(sales_refs) != 1 or words[sales_refs[0] - 1] not in ("from", "join"):
+        raise _NotEligible("sales must be referenced exactly once in FROM/JOIN")
+    table_pos = sales_refs[0]
+    alias = None
+    if table_pos + 1 < len(words):
+        following = words[table_pos + 1]
+        if following == "as":
+            alias = words[table_pos + 2]
+        elif tokens[sig[table_pos + 1]][0] == "ident" and following not in _ALIAS_STOPWORDS:
+            alias = following
+    qualifier = alias or "sales"
+
+    def sales_column(start: int, end: int):
+        """Returns the sales column named by words[start:end], if it is a single column reference."""
+        span = words[start:end]
+        if len(span) == 1 and tokens[sig[start]][0] == "ident":
+            return span[0] if span[0] in SALES_ONLY_COLUMNS else None
+        if len(span) == 3 and span[1] == "." and span[0] == qualifier and tokens[sig[start + 2]][0] == "ident":
+            return span[2]
+        return None
+
+    replacements = {}  # sig position of first token -> (sig position of last token, replacement text)
+    has_aggregate = False
+    n = 0
+    while n < len(words):
+        word = words[n]
+        if word in _AGGREGATES and n + 1 < len(words) and words[n + 1] == "(":
+            close = _matching_paren(words, n + 1)
+            inner_start, inner_end = n + 2, close
+            inner = words[inner_start:inner_end]
+            has_aggregate = True
+            if word in ("min", "max") or (inner and inner[0] == "distinct"):
+                # Duplicate-insensitive: keep, but its arguments still must be rollup columns
+                _check_plain_references(words, tokens, sig, inner_start, inner_end, qualifier)
+                n = close + 1
+                continue
+            column = sales_column(inner_start, inner_end)
+            if word == "count" and (inner in (["*"], ["1"]) or column in NOT_NULL_SALES_COLUMNS):
+                text = f"COALESCE(SUM({qualifier}.sale_count), 0)"
+            elif word in ("sum", "total") and column in ROLLUP_MEASURES:
+                text = f"{word.upper()}({qualifier}.{ROLLUP_MEASURES[column]})"
+            elif word == "avg" and column in ROLLUP_MEASURES:
+                text = f"(SUM({qualifier}.{ROLLUP_MEASURES[column]}) * 1.0 / SUM({qualifier}.sale_count))"
+            else:
+                raise _NotEligible(f"aggregate {word}() cannot be answered from the rollup")
+            replacements[n] = (close, text)
+            n = close + 1
+            continue
+        n += 1
+
+    if not has_aggregate and "group" not in words:
+        raise _NotEligible("row-level queries are not routed")
+
+    # Every remaining reference to sales must be to a rollup key column
+    covered = set()
+    for start, (end, _) in replacements.items():
+        covered.update(range(start, end + 1))
+    remaining = [n for n in range(len(words)) if n not in covered]
+    _check_plain_references(words, tokens, sig, 0, len(words), qualifier, skip=covered)
+    for n in remaining:
+        if words[n] == "*" and n > 0 and words[n - 1] in ("select", ",", ".", "distinct"):
+            raise _NotEligible("SELECT * is not routed")
+
+    # Build the rewritten query
+    replacement_starts = {sig[start]: (sig[end], text) for start, (end, text) in replacements.items()}
+    output = []
+    select_aliases = _select_item_aliases(words, tokens, sig, replacements)
+    i = 0
+    while i < len(tokens):
+        if i == sig[table_pos]:
+            output.append(ROLLUP_TABLE if alias else f"{ROLLUP_TABLE} AS sales")
+            i += 1
+        elif i in replacement_starts:
+            end_token, text = replacement_starts[i]
+            output.append(text)
+            i = end_token + 1
+        else:
+            output.append(tokens[i][1])
+            i += 1
+        if i - 1 in select_aliases:
+            output.append(select_aliases[i - 1])
+    return "".join(output)
+
+
+def _matching_paren(words: list, open_pos: int) -> int:
+    depth = 0
+    for n in range(open_pos, len(words)):
+        if words[n] == "(":
+            depth += 1
+        elif words[n] == ")":
+            depth -= 1
+            if depth == 0:
+                return n
+    raise _NotEligible("unbalanced parentheses")
+
+
+def _check_plain_references(words, tokens, sig, start, end, qualifier, skip=()):
+    """Rejects references to sales columns that the rollup does not keep."""
+    for n in range(start, end):
+        if n in skip or tokens[sig[n]][0] != "ident":
+            continue
+        if n > 0 and words[n - 1] == ".":
+            if words[n - 2] == qualifier and words[n] not in ROLLUP_KEY_COLUMNS:
+                raise _NotEligible(f"sales column {words[n]} is not in the rollup")
+            continue
+        if words[n] in SALES_ONLY_COLUMNS and not (n + 1 < len(words) and words[n + 1] == "("):
+            raise _NotEligible(f"sales column {words[n]} is not in the rollup")
+
+
+def _select_item_aliases(words, tokens, sig, replacements) -> dict:
+    """
+    Returns {token index: ' AS "<original text>"'} for rewritten select items without an alias,
+    so the result keeps the column names SQLite would have produced for the original query.
+    """
+    aliases = {}
+    n = 1
+    if n < len(words) and words[n] in ("distinct", "all"):
+        n += 1
+    item_start = n
+    depth = 0
+    while n <= len(words):
+        at_end = n == len(words) or (depth == 0 and words[n] in (",", "from"))
+        if at_end:
+            item_end = n - 1
+            rewritten = any(item_start <= start <= item_end for start in replacements)
+            if rewritten and item_end >= item_start and not _has_alias(words, tokens, sig, item_start, item_end):
+                original = "".join(tok[1] for tok in tokens[sig[item_start]:sig[item_end] + 1])
+                aliases[sig[item_end]] = ' AS "' + original.replace('"', '""') + '"'
+            if n == len(words) or words[n] == "from":
+                break
+            item_start = n + 1
+        elif words[n] == "(":
+            depth += 1
+        elif words[n] == ")":
+            depth -= 1
+        n += 1
+    return aliases
+
+
+def _has_alias(words, tokens, sig, item_start, item_end) -> bool:
+    if item_end - item_start < 1 or tokens[sig[item_end]][0] not in ("ident", "qident"):
+        return False
+    previous = words[item_end - 1]
+    if previous == "as":
+        return True
+    return previous != "." and tokens[sig[item_end - 1]][0] in ("ident", "qident", "string", "number") \
+        or previous == ")"
@@ -1,10 +1,12 @@
 import os
+import time
+import asyncio
 import logging
-import chromadb
-from llama_index.core.tools import FunctionTool
-from llama_index.embeddings.nebius import NebiusEmbedding
-from llama_index.vector_stores.chroma import ChromaVectorStore
-from llama_index.core import VectorStoreIndex, Settings 
+import threading
+from .numpy_vector_store import VECTOR_STORE_BACKEND, NumpyVectorStore, NumpyVectorRetriever
+from .tool_executor import ToolExecutorBusyError, get_tool_executor
+from ..agent_progress import report_progress
+from ..tracing import span
 
 logging.basicConfig(level=logging.INFO)
 
@@ -14,64 +16,265 @@ current_file_dir = os.path.dirname(os.path.abspath(__file__))
 # This path is relative to the *tool file*, so three levels up to the root.
 CHROMA_DB_PATH = os.path.join(current_file_dir, '..', '..', '..', 'chroma_db_schema')
 logging.info(f"ChromaDB Schema Path set to: {CHROMA_DB_PATH}")
+# Used instead of ChromaDB when VECTOR_STORE_BACKEND=numpy
+NUMPY_INDEX_PATH = os.path.join(current_file_dir, '..', '..', '..', 'numpy_index_schema')
+# KPI definitions, built by rag_index.py alongside the schema knowledge base
+KPI_CHROMA_DB_PATH = os.path.join(current_file_dir, '..', '..', '..', 'chroma_db_kpi')
+KPI_NUMPY_INDEX_PATH = os.path.join(current_file_dir, '..', '..', '..', 'numpy_index_kpi')
 
-# Initialize NebiusEmbedding
+# NebiusEmbedding configuration
 embed_model_name = "BAAI/bge-en-icl" 
 embed_api_base = "https://api.studio.nebius.com/v1/" 
 
+# Created on first use (see get_embed_model), so importing this module needs neither the network nor the Nebius client
 embeddings = None
-try:
-    embeddings = NebiusEmbedding(
-        api_key=os.environ.get("NEBIUS_API_KEY"),
-        model_name=embed_model_name,
-        api_base=embed_api_base
-    )
-    Settings.embed_model = embeddings
-    # Test the embedding model
-    _ = embeddings.get_text_embedding("test validation string") 
-    logging.info("NebiusEmbedding initialized successfully for schema retriever.")
-except Exception as e:
-    logging.error(f"Error initializing NebiusEmbedding in schema_retriever_tool: {e}")
-    embeddings = None
-
-# Set the global embedding model for LlamaIndex if not already set (good practice)
-if embeddings:
-    Settings.embed_model = embeddings
+_embeddings_lock = threading.Lock()
 
-# Main retrieval function
-def retrieve_schema_context(natural_language_query: str) -> str:
-    if embeddings is None: 
-        return "Error: Embedding model not initialized for schema retrieval. Cannot perform RAG. Please check your Nebius API key and model configuration."
-        
-    try:
-        db = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-        chroma_collection = db.get_or_create_collection(name="schema_kb") 
-        logging.info(f"ChromaDB collection 'schema_kb' opened successfully for retrieval.")
+def get_embed_model(validate: bool = False):
+    """
+    Returns the shared (cached) NebiusEmbedding, creating it on first use.
+
+    Args:
+        validate (bool): Also embed a short probe string to verify the key and endpoint.
+
+    Returns:
+        The embedding model, or None if it could not be initialized.
+    """
+    global embeddings
+    if embeddings is None:
+        with _embeddings_lock:
+            if embeddings is None:
+                try:
+                    from llama_index.core import Settings
+                    from llama_index.embeddings.nebius import NebiusEmbedding
+                    from .embedding_cache import with_embedding_cache
+                    # Cached wrapper: repeated questions skip the remote embedding call
+                    model = with_embedding_cache(NebiusEmbedding(
+                        api_key=os.environ.get("NEBIUS_API_KEY"),
+                        model_name=embed_model_name,
+                        api_base=embed_api_base
+                    ))
+                    # Set the global embedding model for LlamaIndex (good practice)
+                    Settings.embed_model = model
+                    embeddings = model
+                    logging.info("NebiusEmbedding initialized successfully for schema retriever.")
+                except Exception as e:
+                    logging.error(f"Error initializing NebiusEmbedding in schema_retriever_tool: {e}")
+                    return None
+    if validate:
+        embeddings.get_text_embedding("test validation string")
+    return embeddings
+
+# Reload configuration: how often (at most) to check the index directory for changes
+SCHEMA_INDEX_RELOAD_CHECK_SECONDS = float(os.environ.get("SCHEMA_INDEX_RELOAD_CHECK_SECONDS", "5"))
+
+
+def _directory_fingerprint(path: str) -> tuple:
+    """Fingerprints a directory tree by file names, sizes and modification times."""
+    entries = []
+    for root, _, files in os.walk(path):
+        for name in files:
+            file_path = os.path.join(root, name)
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            entries.append((os.path.relpath(file_path, path), stat.st_size, stat.st_mtime_ns))
+    return tuple(sorted(entries))
 
-        vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
 
+class SchemaRetrieverEngine:
+    """
+    A long-lived retriever over a persisted Chroma collection or NumPy vector index.
+
+    The client, vector store, index and retriever are built once on first use and shared by all
+    callers, so a lookup costs only the query embedding and the vector search. The index
+    directory is re-fingerprinted at most every `reload_check_seconds`; if it changed (e.g. after
+    `rag_index.py` re-ran), the retriever is rebuilt.
+    """
+
+    def __init__(self, chroma_path: str = CHROMA_DB_PATH, collection_name: str = "schema_kb",
+                 similarity_top_k: int = 2, reload_check_seconds: float = SCHEMA_INDEX_RELOAD_CHECK_SECONDS,
+                 backend: str = VECTOR_STORE_BACKEND, numpy_path: str = NUMPY_INDEX_PATH):
+        self.backend = backend
+        self.chroma_path = chroma_path
+        self.numpy_path = numpy_path
+        self.index_path = numpy_path if backend == "numpy" else chroma_path
+        self.collection_name = collection_name
+        self.similarity_top_k = similarity_top_k
+        self.reload_check_seconds = reload_check_seconds
+
+        self._retriever = None
+        self._fingerprint = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.total_seconds = 0.0
+        self.last_seconds = 0.0
+        self.reloads = 0
+
+    def _build(self):
+        embed_model = get_embed_model()
+        if self.backend == "numpy":
+            store = NumpyVectorStore.load(self.numpy_path)
+            logging.info(f"NumPy vector index '{self.collection_name}' loaded for retrieval ({len(store)} items).")
+            return NumpyVectorRetriever(store, embed_model, similarity_top_k=self.similarity_top_k)
+
+        import chromadb
+        from llama_index.core import VectorStoreIndex
+        from llama_index.vector_stores.chroma import ChromaVectorStore
+        db = chromadb.PersistentClient(path=self.chroma_path)
+        chroma_collection = db.get_or_create_collection(name=self.collection_name)
+        vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
         index = VectorStoreIndex.from_vector_store(
             vector_store, 
-            embed_model=embeddings # Explicitly pass the initialized embeddings
+            embed_model=embed_model # Explicitly pass the initialized embeddings
         )
-        query_engine = index.as_retriever(similarity_top_k=2) 
-        retrieved_nodes = query_engine.retrieve(natural_language_query)
+        logging.info(f"ChromaDB collection '{self.collection_name}' loaded for retrieval ({chroma_collection.count()} items).")
+        return index.as_retriever(similarity_top_k=self.similarity_top_k)
+
+    def _loaded_retriever(self):
+        """The retriever if it is loaded and its index directory was checked recently, else None."""
+        if self._retriever is not None and time.monotonic() - self._last_check < self.reload_check_seconds:
+            return self._retriever
+        return None
+
+    def _get_retriever(self):
+        retriever = self._loaded_retriever()
+        if retriever is not None:
+            return retriever
+        now = time.monotonic()
+        with self._lock:
+            if self._retriever is not None and now - self._last_check < self.reload_check_seconds:
+                return self._retriever
+            fingerprint = _directory_fingerprint(self.index_path)
+            if self._retriever is None or fingerprint != self._fingerprint:
+                if self._retriever is not None:
+                    logging.info(f"Index directory {self.index_path} changed; reloading '{self.collection_name}'.")
+                    self.reloads += 1
+                self._retriever = self._build()
+                self._fingerprint = fingerprint
+            self._last_check = time.monotonic()
+            return self._retriever
 
-        schema_snippets = [node.get_content() for node in retrieved_nodes]
-        if not schema_snippets:
-            return "No relevant schema context found for your query. Please rephrase or simplify."
+    def _record_timing(self, started: float):
+        elapsed = time.perf_counter() - started
+        self.calls += 1
+        self.total_seconds += elapsed
+        self.last_seconds = elapsed
+        logging.info(f"Retrieval from '{self.collection_name}' took {elapsed * 1000:.1f} ms.")
 
-        return "Retrieved Database Schema Context (relevant to query):\n" + "\n---\n".join(schema_snippets)
+    def retrieve(self, query: str) -> list:
+        """Returns the nodes most similar to `query`."""
+        with span("vector_retrieve", collection=self.collection_name) as step:
+            retriever = self._get_retriever()
+            started = time.perf_counter()
+            try:
+                nodes = retriever.retrieve(query)
+            finally:
+                self._record_timing(started)
+            step.set(results=len(nodes))
+            return nodes
 
-    except Exception as e:
-        logging.exception("Error in retrieve_schema_context:") 
-        return f"Error retrieving schema from RAG: {str(e)}. Ensure ChromaDB is built at {CHROMA_DB_PATH} and embedding model is compatible."
+    async def aretrieve(self, query: str) -> list:
+        """Async variant of `retrieve`."""
+        with span("vector_retrieve", collection=self.collection_name) as step:
+            retriever = self._loaded_retriever()
+            if retriever is None:
+                # Loading or re-checking the index reads files and may open ChromaDB; keep that off the event loop
+                retriever = await asyncio.to_thread(self._get_retriever)
+            started = time.perf_counter()
+            try:
+                nodes = await retriever.aretrieve(query)
+            finally:
+                self._record_timing(started)
+            step.set(results=len(nodes))
+            return nodes
+
+    def warmup(self):
+        """Loads the index now instead of on the first question."""
+        self._get_retriever()
+
+    def stats(self) -> dict:
+        return {
+            "collection": self.collection_name,
+            "calls": self.calls,
+            "reloads": self.reloads,
+            "last_ms": self.last_seconds * 1000,
+            "avg_ms": (self.total_seconds / self.calls * 1000) if self.calls else 0.0,
+        }
+
+
+_schema_engine = None
+_schema_engine_lock = threading.Lock()
+
+def get_schema_retriever_engine() -> SchemaRetrieverEngine:
+    """Returns the process-wide schema retriever, creating it on first use."""
+    global _schema_engine
+    if _schema_engine is None:
+        with _schema_engine_lock:
+            if _schema_engine is None:
+                _schema_engine = SchemaRetrieverEngine()
+    return _schema_engine
+
+
+_kpi_engine = None
+_kpi_engine_lock = threading.Lock()
+
+def get_kpi_retriever_engine() -> SchemaRetrieverEngine:
+    """Returns the process-wide KPI definition retriever, creating it on first use."""
+    global _kpi_engine
+    if _kpi_engine is None:
+        with _kpi_engine_lock:
+            if _kpi_engine is None:
+                _kpi_engine = SchemaRetrieverEngine(chroma_path=KPI_CHROMA_DB_PATH, collection_name="kpi_kb",
+                                                    similarity_top_k=1, numpy_path=KPI_NUMPY_INDEX_PATH)
+    return _kpi_engine
+
+
+def format_schema_context(retrieved_nodes: list) -> str:
+    schema_snippets = [node.get_content() for node in retrieved_nodes]
+    if not schema_snippets:
+        return "No relevant schema context found for your query. Please rephrase or simplify."
+
+    return "Retrieved Database Schema Context (relevant to query):\n" + "\n---\n".join(schema_snippets)
+
+
+# Main retrieval function
+def retrieve_schema_context(natural_language_query: str) -> str:
+    with span("retrieve_schema_context", query_chars=len(natural_language_query)) as step:
+        if get_embed_model() is None: 
+            step.fail("embedding model not initialized")
+            return "Error: Embedding model not initialized for schema retrieval. Cannot perform RAG. Please check your Nebius API key and model configuration."
+            
+        try:
+            retrieved_nodes = get_schema_retriever_engine().retrieve(natural_language_query)
+            report_progress(f"Retrieved schema context ({len(retrieved_nodes)} section{'s' if len(retrieved_nodes) != 1 else ''}).")
+            context = format_schema_context(retrieved_nodes)
+            step.set(sections=len(retrieved_nodes), bytes=len(context))
+            return context
+
+        except Exception as e:
+            step.fail(e)
+            logging.exception("Error in retrieve_schema_context:") 
+            return f"Error retrieving schema from RAG: {str(e)}. Ensure the {VECTOR_STORE_BACKEND} index is built at {get_schema_retriever_engine().index_path} and embedding model is compatible."
+
+
+async def aretrieve_schema_context(natural_language_query: str) -> str:
+    """Async variant of `retrieve_schema_context`; runs it on the tool executor, in a worker thread that keeps the caller's context."""
+    try:
+        return await get_tool_executor().run(retrieve_schema_context, natural_language_query)
+    except ToolExecutorBusyError as e:
+        return f"Error retrieving schema from RAG: {e} Try again shortly."
 
 
 # Exportable tool
-def get_schema_retriever_tool() -> FunctionTool:
+def get_schema_retriever_tool():
+    from llama_index.core.tools import FunctionTool
     return FunctionTool.from_defaults(
         fn=retrieve_schema_context,
+        async_fn=aretrieve_schema_context,
         name="retrieve_schema_context",
         description=(
             "Retrieves relevant database schema information (tables, columns, relationships, descriptions) "
@@ -0,0 +1,197 @@
+import os
+import sqlite3
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DATABASE_PATH = os.path.join(current_dir, '..', '..', '..', 'data', 'sales_database.db')
+
+SQLITE_POOL_SIZE = int(os.environ.get("SQLITE_POOL_SIZE", "8"))
+SQLITE_POOL_TIMEOUT = float(os.environ.get("SQLITE_POOL_TIMEOUT", "30"))
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))  # bytes
+SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", "-65536"))  # negative = KiB, i.e. 64 MiB
+SQLITE_TEMP_STORE = os.environ.get("SQLITE_TEMP_STORE", "MEMORY")
+SQLITE_HEALTH_CHECK_INTERVAL = float(os.environ.get("SQLITE_HEALTH_CHECK_INTERVAL", "30"))
+
+
+class PoolExhaustedError(Exception):
+    """Raised when no pooled connection became available within the timeout."""
+
+
+class SQLiteConnectionPool:
+    """
+    A bounded pool of read-only, pre-tuned SQLite connections.
+
+    A connection is used by exactly one thread at a time, and at most `max_size` connections are
+    open at once. Connections stay open between queries, so their page caches stay warm; threads
+    that need a connection while the pool is exhausted wait until another thread returns one.
+    """
+
+    def __init__(self, database_path: str = DATABASE_PATH, max_size: int = SQLITE_POOL_SIZE,
+                 timeout: float = SQLITE_POOL_TIMEOUT, mmap_size: int = SQLITE_MMAP_SIZE,
+                 cache_size: int = SQLITE_CACHE_SIZE, temp_store: str = SQLITE_TEMP_STORE,
+                 health_check_interval: float = SQLITE_HEALTH_CHECK_INTERVAL):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.database_path = os.path.abspath(database_path)
+        self.max_size = max_size
+        self.timeout = timeout
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.temp_store = temp_store
+        self.health_check_interval = health_check_interval
+
+        self._local = threading.local()
+        self._idle = []  # LIFO stack, so the most recently used (warmest) connection is reused first
+        self._last_used = {}
+        self._open_count = 0
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def _open_connection(self) -> sqlite3.Connection:
+        uri = f"file:{self.database_path}?mode=ro"
+        # check_same_thread=False lets an idle connection be handed over to another thread;
+        # a connection is still only ever used by the single thread that currently holds it.
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = {int(self.cache_size)}")
+        conn.execute(f"PRAGMA temp_store = {self.temp_store}")
+        conn.execute("PRAGMA query_only = ON")
+        logging.info(f"Opened pooled read-only SQLite connection to {self.database_path}")
+        return conn
+
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error as e:
+            logging.warning(f"Pooled SQLite connection failed health check: {e}")
+            return False
+
+    def _checkout(self) -> sqlite3.Connection:
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise PoolExhaustedError("Connection pool has been closed.")
+                if self._idle:
+                    return self._idle.pop()
+                if self._open_count < self.max_size:
+                    self._open_count += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolExhaustedError(
+                        f"No SQLite connection available after {self.timeout}s (pool size {self.max_size})."
+                    )
+                self._condition.wait(remaining)
+        try:
+            return self._open_connection()
+        except Exception:
+            with self._condition:
+                self._open_count -= 1
+                self._condition.notify()
+            raise
+
+    def _discard(self, conn: sqlite3.Connection):
+        self._last_used.pop(conn, None)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._condition:
+            self._open_count -= 1
+            self._condition.notify()
+
+    def _checkin(self, conn: sqlite3.Connection):
+        with self._condition:
+            if self._closed:
+                self._open_count -= 1
+                conn.close()
+            else:
+                self._idle.append(conn)
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Checks out a connection for the calling thread and returns it to the pool afterwards.
+
+        Nested use from the same thread reuses the connection it already holds. Connections that
+        have been idle longer than the health check interval are verified before being handed out.
+        """
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            yield held
+            return
+
+        conn = self._checkout()
+        last_used = self._last_used.get(conn)
+        if last_used is not None and time.monotonic() - last_used > self.health_check_interval:
+            if not self._is_healthy(conn):
+                self._discard(conn)
+                conn = self._checkout()
+
+        self._local.conn = conn
+        healthy = True
+        try:
+            yield conn
+        except sqlite3.DatabaseError:
+            # Ordinary query errors leave the connection usable; only drop it if it is now broken
+            # (e.g. the database file was replaced underneath it).
+            healthy = self._is_healthy(conn)
+            raise
+        finally:
+            self._local.conn = None
+            if healthy:
+                self._last_used[conn] = time.monotonic()
+                self._checkin(conn)
+            else:
+                self._discard(conn)
+
+    def health_check(self) -> dict:
+        """Checks every idle connection, dropping broken ones, and reports pool statistics."""
+        with self._condition:
+            idle = list(self._idle)
+            self._idle.clear()
+        healthy = []
+        for conn in idle:
+            if self._is_healthy(conn):
+                healthy.append(conn)
+            else:
+                self._discard(conn)
+        with self._condition:
+            self._idle.extend(healthy)
+            return {
+                "database_path": self.database_path,
+                "max_size": self.max_size,
+                "open_connections": self._open_count,
+                "idle_connections": len(self._idle),
+                "database_exists": os.path.exists(self.database_path),
+            }
+
+    def close_all(self):
+        """Closes idle connections and marks the pool closed; held connections close on release."""
+        with self._condition:
+            self._closed = True
+            for conn in self._idle:
+                conn.close()
+                self._last_used.pop(conn, None)
+                self._open_count -= 1
+            self._idle.clear()
+            self._condition.notify_all()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_connection_pool() -> SQLiteConnectionPool:
+    """Returns the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SQLiteConnectionPool()
+    return _pool
@@ -0,0 +1,391 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Optional
+from .duckdb_compat import DUCKDB_SESSION_SETTINGS, UnsupportedQuery, translate_sqlite_to_duckdb
+from .sql_result_cache import database_fingerprint
+from .query_plan_inspector import explain_query_plan, table_aliases
+
+# "sqlite": always SQLite; "auto": DuckDB for queries estimated to scan at least DUCKDB_MIN_SCAN_ROWS
+# rows, when the duckdb package is installed; "duckdb": DuckDB for every query it can run
+SQL_ENGINE = os.environ.get("SQL_ENGINE", "auto").lower()
+DUCKDB_MIN_SCAN_ROWS = int(os.environ.get("DUCKDB_MIN_SCAN_ROWS", "250000"))
+# "snapshot": a columnar copy of the database in DUCKDB_SNAPSHOT_DIR, rebuilt when the database
+# changes; "attach": read the SQLite file directly through DuckDB's sqlite extension
+DUCKDB_SOURCE = os.environ.get("DUCKDB_SOURCE", "snapshot").lower()
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+DUCKDB_SNAPSHOT_DIR = os.environ.get("DUCKDB_SNAPSHOT_DIR", os.path.join(PROJECT_ROOT, '.cache', 'duckdb'))
+DUCKDB_THREADS = int(os.environ.get("DUCKDB_THREADS", "0"))  # 0 = one per core
+DUCKDB_SNAPSHOT_BATCH_ROWS = int(os.environ.get("DUCKDB_SNAPSHOT_BATCH_ROWS", "200000"))
+
+# SQLite declared types -> DuckDB column types for the snapshot (anything else is stored as text)
+_SNAPSHOT_TYPES = {"INTEGER": "BIGINT", "INT": "BIGINT", "REAL": "DOUBLE", "NUMERIC": "DOUBLE", "TEXT": "VARCHAR"}
+_SNAPSHOT_INFO_TABLE = "_snapshot_info"
+# Rows per lookup assumed for an index equality without ANALYZE statistics (SQLite's own default),
+# and the fraction of the remaining rows a range condition (e.g. sale_date > ?) is assumed to keep
+DEFAULT_ROWS_PER_LOOKUP = 10
+RANGE_FRACTION = 0.25
+
+_PLAN_STEP_PATTERN = re.compile(
+    r"^(SCAN|SEARCH) (?:TABLE )?([\w\"]+)(?: AS (\w+))?"
+    r"(?: USING (?:(INTEGER PRIMARY KEY)|(?:COVERING |AUTOMATIC |PARTIAL )*INDEX ?(\w*)))?(?: \((.*)\))?"
+)
+
+
+def duckdb_installed() -> bool:
+    try:
+        import duckdb  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def table_statistics(conn: sqlite3.Connection) -> tuple:
+    """
+    Row counts per table, and the ANALYZE statistics of every index (lower-cased names).
+
+    Returns:
+        tuple: ({table: rows}, {index: [rows, rows per value of the first column, of the first two, ...]}).
+               Tables without statistics are counted with MAX(rowid).
+    """
+    counts, index_stats = {}, {}
+    try:
+        for table, index, stat in conn.execute("SELECT tbl, idx, stat FROM sqlite_stat1"):
+            numbers = [int(number) for number in stat.split() if number.isdigit()]
+            counts[table.lower()] = max(counts.get(table.lower(), 0), numbers[0])
+            if index:
+                index_stats[index.lower()] = numbers
+    except sqlite3.Error:
+        pass
+    tables = [name for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+    for table in tables:
+        if table.lower() not in counts:
+            try:
+                counts[table.lower()] = conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0] or 0
+            except sqlite3.Error:
+                counts[table.lower()] = 0
+    return counts, index_stats
+
+
+def _rows_per_loop(table_rows: int, primary_key: str, index: str, condition: str, index_stats: dict) -> float:
+    """Rows one execution of a SEARCH step reads, from its index and the columns it constrains."""
+    terms = [term.strip() for term in condition.split(" AND ")] if condition else []
+    # Leading equalities narrow the lookup; ANY(column) is a skip-scan over all of that column's values
+    equalities = 0
+    while equalities < len(terms) and terms[equalities].endswith("=?"):
+        equalities += 1
+    ranges = any("<" in term or ">" in term for term in terms[equalities:])
+    if primary_key:
+        rows = 1 if equalities else table_rows
+    elif equalities:
+        stats = index_stats.get((index or "").lower())
+        rows = stats[equalities] if stats and equalities < len(stats) else min(table_rows, DEFAULT_ROWS_PER_LOOKUP)
+    else:
+        rows = table_rows
+    return rows * RANGE_FRACTION if ranges else rows
+
+
+def estimate_scan_rows(plan_details: list, sql_query: str, table_stats: tuple) -> int:
+    """
+    Estimates how many rows a query reads, from its EXPLAIN QUERY PLAN and `table_statistics`.
+
+    Plan steps are read as nested loops: a SCAN reads its whole table and starts a new loop nest;
+    a SEARCH reads, per row of the loops around it, the rows its index lookup matches (from
+    sqlite_stat1) and multiplies the rows flowing into the next step. A join that looks up every
+    sale per product therefore counts the whole sales table. Plan steps name tables by their alias,
+    which is resolved from the query's FROM/JOIN clauses.
+    """
+    row_counts, index_stats = table_stats
+    aliases = {}
+    for table in row_counts:
+        for name in table_aliases(sql_query, table):
+            aliases[name] = table
+    estimate, outer_rows = 0.0, 1.0
+    for detail in plan_details:
+        match = _PLAN_STEP_PATTERN.match(detail)
+        if not match:
+            if not detail.startswith("USE TEMP B-TREE"):
+                # Subqueries, co-routines and compound parts start their own loops
+                outer_rows = 1.0
+            continue
+        step, table, alias, primary_key, index, condition = match.groups()
+        table_rows = row_counts.get(aliases.get((alias or table).strip('"').lower(), table.strip('"').lower()), 0)
+        if step == "SCAN":
+            outer_rows = float(table_rows)
+            estimate += table_rows
+        else:
+            outer_rows *= _rows_per_loop(table_rows, primary_key, index, condition, index_stats)
+            estimate += outer_rows
+    return int(estimate)
+
+
+def build_duckdb_snapshot(database_path: str, snapshot_path: str, batch_rows: int = DUCKDB_SNAPSHOT_BATCH_ROWS):
+    """
+    Copies every table of the SQLite database into a DuckDB file, column types mapped to DuckDB's.
+
+    The copy is written next to `snapshot_path` and renamed into place when complete, and it
+    records the database fingerprint it was taken from.
+    """
+    import duckdb
+    import pandas as pd
+
+    fingerprint = repr(database_fingerprint(database_path))
+    os.makedirs(os.path.dirname(os.path.abspath(snapshot_path)), exist_ok=True)
+    temp_path = snapshot_path + ".tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    started = time.perf_counter()
+    source = sqlite3.connect(f"file:{os.path.abspath(database_path)}?mode=ro", uri=True)
+    target = duckdb.connect(temp_path)
+    try:
+        tables = [name for (name,) in source.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+        for table in tables:
+            columns = [(row[1], _SNAPSHOT_TYPES.get((row[2] or "").upper(), "VARCHAR"))
+                       for row in source.execute(f'PRAGMA table_info("{table}")')]
+            target.execute(f'CREATE TABLE "{table}" ('
+                           + ", ".join(f'"{name}" {column_type}' for name, column_type in columns) + ")")
+            cursor = source.execute(f'SELECT {", ".join(chr(34) + name + chr(34) for name, _ in columns)} FROM "{table}"')
+            while True:
+                batch = cursor.fetchmany(batch_rows)
+                if not batch:
+                    break
+                frame = pd.DataFrame.from_records(batch, columns=[name for name, _ in columns])
+                target.register("snapshot_batch", frame)
+                target.execute(f'INSERT INTO "{table}" SELECT * FROM snapshot_batch')
+                target.unregister("snapshot_batch")
+        target.execute(f"CREATE TABLE {_SNAPSHOT_INFO_TABLE} (fingerprint VARCHAR)")
+        target.execute(f"INSERT INTO {_SNAPSHOT_INFO_TABLE} VALUES (?)", [fingerprint])
+    finally:
+        target.close()
+        source.close()
+    os.replace(temp_path, snapshot_path)
+    logging.info(f"Built DuckDB snapshot {snapshot_path} ({len(tables)} tables) in {time.perf_counter() - started:.1f}s")
+
+
+class DuckDBEngine:
+    """
+    Runs analytical queries on an embedded DuckDB over the sales database.
+
+    DuckDB reads either a columnar snapshot of the SQLite file or, with DUCKDB_SOURCE=attach, the
+    file itself. Queries are translated from SQLite's dialect first (see duckdb_compat). A stale
+    or missing snapshot is rebuilt in a background thread; until it is ready, `cursor()` yields
+    None and the caller stays on SQLite.
+
+    When the database changes, the next `cursor()` opens a new connection. The replaced one is
+    closed as soon as the last cursor taken from it closes.
+    """
+
+    def __init__(self, database_path: str, source: str = DUCKDB_SOURCE, threads: int = DUCKDB_THREADS,
+                 snapshot_dir: str = None):
+        if source not in ("snapshot", "attach"):
+            raise ValueError(f"Unknown DuckDB source {source!r}; expected 'snapshot' or 'attach'.")
+        self.database_path = os.path.abspath(database_path)
+        # Named after the database and its path, so databases with the same file name do not share snapshots
+        path_hash = hashlib.sha256(self.database_path.encode("utf-8")).hexdigest()[:12]
+        self.snapshot_prefix = os.path.join(
+            snapshot_dir or DUCKDB_SNAPSHOT_DIR, f"{os.path.splitext(os.path.basename(self.database_path))[0]}-{path_hash}-"
+        )
+        self.source = source
+        self.threads = threads
+        self._connection = None
+        self._fingerprint = None
+        self._leases = {}  # id(connection) -> open cursors
+        self._building = None
+        self._lock = threading.Lock()
+
+        self.queries = 0
+        self.fallbacks = 0
+        self.snapshot_builds = 0
+
+    def _config(self) -> dict:
+        return {"threads": self.threads} if self.threads > 0 else {}
+
+    def _open_attached(self):
+        import duckdb
+        connection = duckdb.connect(config=self._config())
+        connection.execute("INSTALL sqlite")
+        connection.execute("LOAD sqlite")
+        connection.execute(f"ATTACH '{self.database_path}' AS sales_db (TYPE sqlite, READ_ONLY)")
+        connection.execute("USE sales_db")
+        return connection
+
+    def snapshot_path(self, fingerprint: str) -> str:
+        """
+        The snapshot file for one state of the database. Every rebuild gets a new file: DuckDB shares
+        one database instance per path within a process, so a connection opened on a path that an
+        older, still open connection uses would read the old contents.
+        """
+        return f"{self.snapshot_prefix}{hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()[:12]}.duckdb"
+
+    def _open_snapshot(self, fingerprint: str):
+        """Opens the snapshot if it matches `fingerprint`; otherwise starts rebuilding it and returns None."""
+        import duckdb
+        snapshot_path = self.snapshot_path(fingerprint)
+        if os.path.exists(snapshot_path):
+            try:
+                connection = duckdb.connect(snapshot_path, read_only=True, config=self._config())
+                recorded = connection.execute(f"SELECT fingerprint FROM {_SNAPSHOT_INFO_TABLE}").fetchone()
+                if recorded and recorded[0] == fingerprint:
+                    return connection
+                connection.close()
+            except duckdb.Error as e:
+                logging.warning(f"Ignoring unreadable DuckDB snapshot {snapshot_path}: {e}")
+        if self._building is None or not self._building.is_alive():
+            self._building = threading.Thread(target=self._rebuild_snapshot, name="duckdb-snapshot", daemon=True)
+            self._building.start()
+        return None
+
+    def _rebuild_snapshot(self):
+        try:
+            snapshot_path = self.snapshot_path(repr(database_fingerprint(self.database_path)))
+            build_duckdb_snapshot(self.database_path, snapshot_path)
+            self.snapshot_builds += 1
+        except Exception as e:
+            logging.error(f"Building the DuckDB snapshot of {self.database_path} failed: {e}")
+            return
+        # Older snapshots of this database; connections still reading one keep it until they close
+        directory = os.path.dirname(self.snapshot_prefix)
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if path.startswith(self.snapshot_prefix) and name.endswith(".duckdb") and path != snapshot_path:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logging.warning(f"Could not remove the old DuckDB snapshot {path}: {e}")
+
+    def _current_connection(self, lease: bool = False):
+        """
+        The connection over the current database file, reopened when the file has changed.
+
+        With `lease`, the connection counts as in use until it is passed to `_release`, so that it
+        is not closed under a running query when it is replaced.
+        """
+        fingerprint = repr(database_fingerprint(self.database_path))
+        with self._lock:
+            if self._connection is None or self._fingerprint != fingerprint:
+                connection = None
+                if self.source == "attach":
+                    try:
+                        connection = self._open_attached()
+                    except Exception as e:
+                        logging.warning(f"Attaching {self.database_path} to DuckDB failed ({e}); using a snapshot instead.")
+                        self.source = "snapshot"
+                if connection is None:
+                    connection = self._open_snapshot(fingerprint)
+                replaced = self._connection
+                self._connection = connection
+                self._fingerprint = fingerprint if connection is not None else None
+                # A replaced connection still in use is closed by the last _release
+                if replaced is not None and id(replaced) not in self._leases:
+                    replaced.close()
+            if lease and self._connection is not None:
+                self._leases[id(self._connection)] = self._leases.get(id(self._connection), 0) + 1
+            return self._connection
+
+    def _release(self, connection):
+        with self._lock:
+            remaining = self._leases.pop(id(connection)) - 1
+            if remaining:
+                self._leases[id(connection)] = remaining
+            elif connection is not self._connection:
+                connection.close()
+
+    def prepare(self) -> bool:
+        """Opens DuckDB over the current database, starting a snapshot build if needed; True when ready."""
+        return self._current_connection() is not None
+
+    @contextmanager
+    def cursor(self):
+        """Yields a DuckDB cursor with the SQLite-compatibility settings applied, or None if not ready."""
+        connection = self._current_connection(lease=True)
+        if connection is None:
+            yield None
+            return
+        try:
+            cursor = connection.cursor()
+            try:
+                for setting in DUCKDB_SESSION_SETTINGS:
+                    cursor.execute(setting)
+                yield cursor
+            finally:
+                cursor.close()
+        finally:
+            self._release(connection)
+
+    def stats(self) -> dict:
+        return {
+            "source": self.source,
+            "ready": self._connection is not None,
+            "connections_in_use": len(self._leases),
+            "queries": self.queries,
+            "fallbacks": self.fallbacks,
+            "snapshot_builds": self.snapshot_builds,
+        }
+
+
+def choose_engine(conn: sqlite3.Connection, sql_query: str, plan_details: list = None) -> tuple:
+    """
+    Picks the engine for `sql_query`, which is about to run on the SQLite connection `conn`.
+
+    `plan_details` is the query's EXPLAIN QUERY PLAN, if the caller already has it.
+
+    Returns:
+        tuple: ("sqlite" or "duckdb", DuckDB SQL or None, estimated rows scanned).
+    """
+    if SQL_ENGINE == "sqlite" or not duckdb_installed():
+        return "sqlite", None, None
+    if plan_details is None:
+        try:
+            plan_details = explain_query_plan(conn, sql_query)
+        except sqlite3.Error:
+            # Invalid SQL; SQLite reports the error when the query runs
+            return "sqlite", None, None
+    estimate = estimate_scan_rows(plan_details, sql_query, _table_statistics(conn))
+    if SQL_ENGINE == "auto" and estimate < DUCKDB_MIN_SCAN_ROWS:
+        return "sqlite", None, estimate
+    try:
+        return "duckdb", translate_sqlite_to_duckdb(sql_query), estimate
+    except UnsupportedQuery as e:
+        logging.info(f"Running on SQLite; no DuckDB translation ({e}): {sql_query}")
+        return "sqlite", None, estimate
+    except Exception as e:
+        logging.warning(f"Running on SQLite; translating to DuckDB failed ({e!r}): {sql_query}")
+        return "sqlite", None, estimate
+
+
+_statistics_cache = {}  # database path -> (fingerprint, table_statistics)
+_statistics_lock = threading.Lock()
+
+def _table_statistics(conn: sqlite3.Connection) -> tuple:
+    database_path = conn.execute("PRAGMA database_list").fetchone()[2]
+    fingerprint = database_fingerprint(database_path)
+    with _statistics_lock:
+        cached = _statistics_cache.get(database_path)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+    statistics = table_statistics(conn)
+    with _statistics_lock:
+        _statistics_cache[database_path] = (fingerprint, statistics)
+    return statistics
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+def get_duckdb_engine(database_path: str) -> Optional[DuckDBEngine]:
+    """Returns the DuckDB engine for a database file (None if duckdb is not installed), creating it on first use."""
+    if not duckdb_installed():
+        return None
+    database_path = os.path.abspath(database_path)
+    with _engines_lock:
+        engine = _engines.get(database_path)
+        if engine is None:
+            engine = _engines[database_path] = DuckDBEngine(database_path)
+    return engine
@@ -1,11 +1,83 @@
 import sqlite3
-import pandas as pd
-import io
-import os
-from llama_index.core.tools import FunctionTool
+import asyncio
+import logging
+import contextvars
+from contextlib import contextmanager
+from .sql_connection_pool import PoolExhaustedError, get_connection_pool
+from .sql_result_cache import SQL_CACHE_ENABLED, get_result_cache, is_deterministic_sql
+from .sql_result_store import get_result_store
+from .sql_result_summary import build_observation, result_id_of
+from .query_plan_inspector import SQL_PLAN_INSPECTION_ENABLED, inspect_query_plan
+from .sql_query_budget import QueryBudgetExceeded, cancel_scope, enforce_query_budget, format_budget_exceeded
+from .rollup_query_rewriter import SQL_ROLLUP_ROUTING_ENABLED, rollup_available, rewrite_for_rollup
+from .sql_engine import choose_engine, get_duckdb_engine
+from .duckdb_compat import normalize_statement
+from .tool_executor import ToolExecutorBusyError, get_tool_executor
+from ..agent_progress import report_progress
+from ..tracing import span
+
+# Collects the queries that executed successfully in the current context (see capture_executed_queries)
+_executed_queries = contextvars.ContextVar("executed_queries", default=None)
+
+
+@contextmanager
+def capture_executed_queries():
+    """
+    Records every query `execute_sql_query` runs successfully inside the block.
+
+    Yields a list that fills up as queries succeed. The sink travels with the context, so it also
+    sees tool calls the agent makes from worker threads (the tool executor copies the context).
+    """
+    queries = []
+    token = _executed_queries.set(queries)
+    try:
+        yield queries
+    finally:
+        _executed_queries.reset(token)
+
+
+def _record_executed(sql_query: str):
+    queries = _executed_queries.get()
+    if queries is not None:
+        queries.append(sql_query)
+
+
+def _run_on_duckdb(conn: sqlite3.Connection, sql_query: str, duckdb_sql: str, estimated_rows: int):
+    """
+    Runs `duckdb_sql`, the DuckDB translation of `sql_query`, and returns its Observation.
+
+    Returns None when DuckDB is not ready (its snapshot is still being built), when SQLite cannot
+    describe the query's columns, or when DuckDB fails on the query; the caller then runs the query
+    on SQLite. Budget overruns are raised as usual.
+    """
+    import duckdb
+    engine = get_duckdb_engine(get_connection_pool().database_path)
+    with engine.cursor() as cursor:
+        if cursor is None:
+            return None
+        # Column names as SQLite reports them (DuckDB would name expressions after its translation)
+        try:
+            probe = conn.execute(f"SELECT * FROM ({normalize_statement(sql_query)}) LIMIT 0")
+            columns = [description[0] for description in probe.description]
+        except sqlite3.Error as e:
+            engine.fallbacks += 1
+            logging.warning(f"Could not read the columns of {sql_query!r} ({e}); running it on SQLite instead.")
+            return None
+        report_progress(f"Running on DuckDB (estimated {estimated_rows:,} rows scanned).")
+        try:
+            with enforce_query_budget(cursor) as budget:
+                cursor.execute(duckdb_sql)
+                if len(cursor.description) != len(columns):
+                    columns = None
+                observation = build_observation(cursor, store=get_result_store(), on_rows=budget.count_rows,
+                                                columns=columns)
+        except duckdb.Error as e:
+            engine.fallbacks += 1
+            logging.warning(f"DuckDB could not run {duckdb_sql!r} ({e}); running it on SQLite instead.")
+            return None
+    engine.queries += 1
+    return observation
 
-current_dir = os.path.dirname(os.path.abspath(__file__))
-DATABASE_PATH = os.path.join(current_dir, '..', '..', '..', 'data', 'sales_database.db')
 
 def execute_sql_query(sql_query: str) -> str:
     """
@@ -20,38 +92,133 @@ def execute_sql_query(sql_query: str) -> str:
 
     Returns:
         str: A CSV string representation of the query results, or an error message.
+             Large results are returned as a summary (row count, per-column statistics and
+             the first rows) instead, and the full result is saved for download. Queries that exceed
+             their time, VM-step or row budget return a "Query Budget Exceeded" observation.
     """
-    # Safety check: Only allow SELECT queries
-    if not sql_query.strip().upper().startswith("SELECT"):
-        return "Error: Only SELECT queries are allowed for security reasons."
+    with span("execute_sql_query", sql=sql_query) as step:
+        # Safety check: Only allow SELECT queries
+        if not sql_query.strip().upper().startswith("SELECT"):
+            step.fail("rejected: not a SELECT query")
+            return "Error: Only SELECT queries are allowed for security reasons."
 
-    conn = None 
-    try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        df = pd.read_sql_query(sql_query, conn)
-        
-        if df.empty:
-            return "Query executed successfully, but no results were found."
-        
-        # Convert DataFrame to a CSV string for LLM consumption
-        output = io.StringIO()
-        df.to_csv(output, index=False)
-        return output.getvalue()
-
-    except pd.io.sql.DatabaseError as e:
-        return f"Database Query Error: {e}"
-    except Exception as e:
-        return f"An unexpected error occurred during SQL execution: {e}"
-    finally:
-        if conn:
-            conn.close()
+        report_progress(f"Running SQL: {sql_query}")
+        # Queries that read the clock or random numbers may give a different result on every run
+        cache = get_result_cache() if SQL_CACHE_ENABLED and is_deterministic_sql(sql_query) else None
+        if cache is not None:
+            cached_result = cache.get(sql_query)
+            result_id = result_id_of(cached_result) if cached_result is not None else None
+            if result_id is not None and get_result_store().path(result_id) is None:
+                # The full result it offers for download was pruned from the store; run the query again
+                cache.discard(sql_query)
+                cached_result = None
+            step.set(cache_hit=cached_result is not None)
+            if cached_result is not None:
+                step.set(bytes=len(cached_result))
+                report_progress("Result served from the query cache.")
+                if result_id is not None:
+                    report_progress(result_id, kind="result")
+                _record_executed(sql_query)
+                return cached_result
+
+        try:
+            # Pooled read-only connection: no per-call connect/close, and the page cache stays warm
+            with get_connection_pool().connection() as conn:
+                executed_sql = sql_query
+                if SQL_ROLLUP_ROUTING_ENABLED and rollup_available(conn):
+                    # Eligible aggregations are answered from the daily rollup instead of scanning sales
+                    rewritten_sql = rewrite_for_rollup(sql_query)
+                    if rewritten_sql is not None:
+                        logging.info(f"Routing query to {rewritten_sql!r}")
+                        executed_sql = rewritten_sql
+                        step.set(rewritten_sql=rewritten_sql)
+                plan_details = None
+                if SQL_PLAN_INSPECTION_ENABLED:
+                    # Warns about full scans of the sales table before the query runs
+                    plan_details = inspect_query_plan(conn, executed_sql)
+                # Queries that scan many rows go to the DuckDB engine, when it is installed and enabled
+                engine, duckdb_sql, estimated_rows = choose_engine(conn, executed_sql, plan_details)
+                step.set(estimated_rows=estimated_rows)
+                observation = None
+                if engine == "duckdb":
+                    observation = _run_on_duckdb(conn, executed_sql, duckdb_sql, estimated_rows)
+                    if observation is None:
+                        engine = "sqlite"
+                if observation is None:
+                    cursor = conn.cursor()
+                    try:
+                        # Time, VM-step and row budgets stop runaway queries (e.g. a join without ON)
+                        with enforce_query_budget(conn) as budget:
+                            cursor.execute(executed_sql)
+                            # Small results come back in full; large ones as a summary whose size does not
+                            # grow with the row count, with the full rows saved for download
+                            observation = build_observation(cursor, store=get_result_store(), on_rows=budget.count_rows)
+                    finally:
+                        cursor.close()
+                step.set(engine=engine)
+
+            if observation.total_rows == 0:
+                result = "Query executed successfully, but no results were found."
+            else:
+                result = observation.text
+            step.set(rows=observation.total_rows, bytes=len(result), summarized=observation.summarized)
+            report_progress(f"Query returned {observation.total_rows} row{'s' if observation.total_rows != 1 else ''}.")
+            if observation.result_id is not None:
+                step.set(result_id=observation.result_id)
+                report_progress(observation.result_id, kind="result")
+
+            # Only successful results are cached; errors are always re-evaluated
+            if cache is not None:
+                cache.put(sql_query, result)
+            _record_executed(sql_query)
+            return result
+
+        except QueryBudgetExceeded as e:
+            step.fail(e)
+            step.set(budget_exceeded=e.reason)
+            logging.warning(f"Stopped query after {e.elapsed_seconds:.2f}s ({e.reason}): {sql_query}")
+            report_progress(f"Query stopped: {e.reason.replace('_', ' ')} budget exceeded." if e.reason != "cancelled"
+                            else "Query cancelled.")
+            return format_budget_exceeded(e)
+        except PoolExhaustedError as e:
+            step.fail(e)
+            report_progress("Query failed: no database connection available.")
+            return f"Database Connection Error: {e}"
+        except sqlite3.Error as e:
+            step.fail(e)
+            report_progress(f"Query failed: {e}")
+            return f"Database Query Error: Execution failed on sql '{sql_query}': {e}"
+        except Exception as e:
+            step.fail(e)
+            report_progress(f"Query failed: {e}")
+            return f"An unexpected error occurred during SQL execution: {e}"
+
+async def aexecute_sql_query(sql_query: str) -> str:
+    """
+    Async variant of `execute_sql_query`; runs it on the tool executor, in a worker thread that keeps
+    the caller's context, so a slow query does not block the event loop.
+
+    Cancelling the awaiting task (e.g. when the user abandons the request) interrupts the query
+    instead of leaving it running in the thread.
+    """
+    with cancel_scope() as scope:
+        try:
+            return await get_tool_executor().run(execute_sql_query, sql_query)
+        except ToolExecutorBusyError as e:
+            report_progress("Query failed: the server is busy.")
+            return f"Database Connection Error: {e} Try again shortly."
+        except asyncio.CancelledError:
+            scope.cancel()
+            raise
 
-def get_sql_executor_tool() -> FunctionTool:
+def get_sql_executor_tool():
     """
     Returns a LlamaIndex FunctionTool for executing SQL SELECT queries.
     """
+    from llama_index.core.tools import FunctionTool
     return FunctionTool.from_defaults(
         fn=execute_sql_query,
+        async_fn=aexecute_sql_query,
         name="execute_sql_query",
         description=(
             "Executes a SQL SELECT query against the sales database and returns the results. "
@@ -0,0 +1,204 @@
+import os
+import time
+import sqlite3
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Per-query execution budget; 0 disables a limit
+SQL_QUERY_TIMEOUT_SECONDS = float(os.environ.get("SQL_QUERY_TIMEOUT_SECONDS", "10"))
+SQL_QUERY_MAX_VM_STEPS = int(os.environ.get("SQL_QUERY_MAX_VM_STEPS", "500000000"))  # roughly 9 steps per row scanned
+SQL_QUERY_MAX_ROWS = int(os.environ.get("SQL_QUERY_MAX_ROWS", "100000"))  # rows in the result, counted past the output limits
+SQL_PROGRESS_HANDLER_INTERVAL = int(os.environ.get("SQL_PROGRESS_HANDLER_INTERVAL", "1000"))  # VM steps between checks
+
+BUDGET_EXCEEDED_PREFIX = "Query Budget Exceeded"
+
+# The cancel scope of the current request (see cancel_scope)
+_cancel_scope = contextvars.ContextVar("query_cancel_scope", default=None)
+
+
+class QueryBudget:
+    """Limits on a single query: wall-clock seconds, SQLite VM steps and result rows (0 = unlimited)."""
+
+    def __init__(self, timeout_seconds: float = SQL_QUERY_TIMEOUT_SECONDS, max_vm_steps: int = SQL_QUERY_MAX_VM_STEPS,
+                 max_rows: int = SQL_QUERY_MAX_ROWS, check_interval: int = SQL_PROGRESS_HANDLER_INTERVAL):
+        if check_interval < 1:
+            raise ValueError("check_interval must be at least 1")
+        self.timeout_seconds = timeout_seconds
+        self.max_vm_steps = max_vm_steps
+        self.max_rows = max_rows
+        self.check_interval = check_interval
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Raised when a query is stopped before completing.
+
+    `reason` is "timeout", "vm_steps", "row_limit" or "cancelled"; `limit` is the limit that was
+    hit (seconds, steps or rows; None for cancellations).
+    """
+
+    def __init__(self, reason: str, limit=None, elapsed_seconds: float = 0.0, vm_steps: int = 0, rows: int = 0):
+        self.reason = reason
+        self.limit = limit
+        self.elapsed_seconds = elapsed_seconds
+        self.vm_steps = vm_steps
+        self.rows = rows
+        super().__init__(f"query stopped ({reason}) after {elapsed_seconds:.2f}s")
+
+
+class QueryCancelScope:
+    """
+    Lets queries started inside the scope be cancelled from another thread or task.
+
+    `cancel()` interrupts the queries currently running in the scope and makes later ones fail
+    immediately. Connections are only interrupted while they are registered, i.e. while a query
+    of this scope is running on them, so a cancellation never reaches a connection that has gone
+    back to the pool.
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self._connections = set()  # sqlite3 or DuckDB connections; both have interrupt()
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            for conn in self._connections:
+                conn.interrupt()
+
+    def _register(self, conn):
+        with self._lock:
+            self._connections.add(conn)
+
+    def _unregister(self, conn):
+        with self._lock:
+            self._connections.discard(conn)
+
+
+@contextmanager
+def cancel_scope():
+    """
+    Opens a QueryCancelScope for the block and yields it.
+
+    The scope travels with the context, so it covers queries run inside the block from worker
+    threads of the tool executor (or asyncio.to_thread).
+    """
+    scope = QueryCancelScope()
+    token = _cancel_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _cancel_scope.reset(token)
+
+
+class BudgetGuard:
+    """Tracks one query's time, VM steps and rows against its budget; see enforce_query_budget."""
+
+    def __init__(self, budget: QueryBudget, scope: QueryCancelScope = None):
+        self.budget = budget
+        self.scope = scope
+        self.started = time.perf_counter()
+        self.deadline = self.started + budget.timeout_seconds if budget.timeout_seconds > 0 else None
+        self.vm_steps = 0
+        self.rows = 0
+        self.reason = None
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return time.perf_counter() - self.started
+
+    def on_progress(self) -> int:
+        """SQLite progress handler: a non-zero return value interrupts the running statement."""
+        self.vm_steps += self.budget.check_interval
+        if self.scope is not None and self.scope.cancelled:
+            self.reason = "cancelled"
+        elif self.deadline is not None and time.perf_counter() > self.deadline:
+            self.reason = "timeout"
+        elif 0 < self.budget.max_vm_steps < self.vm_steps:
+            self.reason = "vm_steps"
+        return 1 if self.reason else 0
+
+    def on_timeout(self, conn):
+        """Deadline timer for connections without a progress handler (DuckDB): interrupts the query."""
+        if self.reason is None:
+            self.reason = "timeout"
+        conn.interrupt()
+
+    def count_rows(self, rows: int):
+        """Adds fetched rows; raises QueryBudgetExceeded once the result is over the row limit."""
+        self.rows += rows
+        if 0 < self.budget.max_rows < self.rows:
+            self.reason = "row_limit"
+            raise self.exceeded()
+
+    def exceeded(self) -> QueryBudgetExceeded:
+        limit = {
+            "timeout": self.budget.timeout_seconds,
+            "vm_steps": self.budget.max_vm_steps,
+            "row_limit": self.budget.max_rows,
+        }.get(self.reason)
+        return QueryBudgetExceeded(self.reason, limit=limit, elapsed_seconds=self.elapsed_seconds,
+                                   vm_steps=self.vm_steps, rows=self.rows)
+
+
+@contextmanager
+def enforce_query_budget(conn, budget: QueryBudget = None):
+    """
+    Runs the block under `budget` (the configured defaults if None) and yields its BudgetGuard.
+
+    On a sqlite3 connection, a progress handler stops the statement when the time or VM-step
+    budget runs out or the current cancel scope is cancelled. Other connections (DuckDB) have no
+    progress handler: a timer interrupts them at the deadline, cancellation interrupts them
+    directly, and VM steps are not counted. The interruption surfaces as QueryBudgetExceeded.
+    Row limits are enforced by passing `guard.count_rows` to the code that fetches the result.
+    """
+    budget = budget or QueryBudget()
+    scope = _cancel_scope.get()
+    guard = BudgetGuard(budget, scope)
+    if scope is not None:
+        if scope.cancelled:
+            guard.reason = "cancelled"
+            raise guard.exceeded()
+        scope._register(conn)
+    timer = None
+    if isinstance(conn, sqlite3.Connection):
+        conn.set_progress_handler(guard.on_progress, budget.check_interval)
+    elif guard.deadline is not None:
+        timer = threading.Timer(budget.timeout_seconds, guard.on_timeout, args=(conn,))
+        timer.daemon = True
+        timer.start()
+    try:
+        yield guard
+    except QueryBudgetExceeded:
+        raise
+    except Exception as e:
+        if guard.reason is None and scope is not None and scope.cancelled:
+            # Interrupted by cancel() before the progress handler noticed
+            guard.reason = "cancelled"
+        if guard.reason is None:
+            raise
+        raise guard.exceeded() from e
+    finally:
+        if timer is not None:
+            timer.cancel()
+        elif isinstance(conn, sqlite3.Connection):
+            conn.set_progress_handler(None, 0)
+        if scope is not None:
+            scope._unregister(conn)
+
+
+def format_budget_exceeded(error: QueryBudgetExceeded) -> str:
+    """The observation returned to the agent for a stopped query: a fixed prefix, the numbers, and what to do next."""
+    if error.reason == "cancelled":
+        return f"{BUDGET_EXCEEDED_PREFIX}: reason=cancelled; the request was abandoned and the query was stopped."
+    detail = {
+        "timeout": f"the query ran longer than the {error.limit:g}s time limit",
+        "vm_steps": f"the query needed more than {error.limit:,} execution steps",
+        "row_limit": f"the result has more than {error.limit:,} rows",
+    }[error.reason]
+    return (f"{BUDGET_EXCEEDED_PREFIX}: reason={error.reason}; limit={error.limit}; "
+            f"elapsed_seconds={error.elapsed_seconds:.2f}; vm_steps={error.vm_steps}; rows_read={error.rows}. "
+            f"The query was stopped because {detail}. Do not retry it unchanged: check that every JOIN has an "
+            f"ON condition, and add filters, aggregation (GROUP BY) or a LIMIT.")
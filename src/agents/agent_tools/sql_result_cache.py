@@ -0,0 +1,193 @@
+import os
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+from .sql_connection_pool import DATABASE_PATH
+from ..settings import env_flag
+
+SQL_CACHE_MAX_BYTES = int(os.environ.get("SQL_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+SQL_CACHE_TTL_SECONDS = float(os.environ.get("SQL_CACHE_TTL_SECONDS", "3600"))
+SQL_CACHE_ENABLED = env_flag("SQL_CACHE_ENABLED", True)
+
+# Splits SQL into quoted literals/identifiers (kept verbatim) and everything else
+_SQL_LITERAL_PATTERN = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\])")
+# A quoted literal/identifier (group 1, kept) or a comment (removed)
+_SQL_COMMENT_PATTERN = re.compile(_SQL_LITERAL_PATTERN.pattern + r"|--[^\n]*|/\*.*?(?:\*/|\Z)", re.DOTALL)
+# Values that change between runs of the same query: the current time and random numbers
+_NONDETERMINISTIC_PATTERN = re.compile(
+    r"\b(?:current_date|current_time|current_timestamp)\b|\b(?:random|randomblob)\(|\bunixepoch\(\)", re.IGNORECASE
+)
+
+
+def strip_sql_comments(sql_query: str) -> str:
+    """Replaces `-- ...` and `/* ... */` comments outside quoted literals with a space."""
+    return _SQL_COMMENT_PATTERN.sub(lambda match: match.group(1) or " ", sql_query)
+
+
+def normalize_sql(sql_query: str) -> str:
+    """
+    Normalizes SQL text for use as a cache key.
+
+    Comments are removed, whitespace runs are collapsed, keywords and identifiers are lower-cased
+    and trailing semicolons are dropped. Quoted string literals and identifiers are left untouched, so
+    `WHERE region_name = 'North'` and `WHERE region_name = 'north'` stay distinct.
+    """
+    parts = _SQL_LITERAL_PATTERN.split(strip_sql_comments(sql_query).strip())
+    normalized = []
+    for i, part in enumerate(parts):
+        if i % 2 == 1:
+            normalized.append(part)
+        else:
+            normalized.append(re.sub(r"\s+", " ", part).lower())
+    text = "".join(normalized).strip()
+    while text.endswith(";"):
+        text = text[:-1].rstrip()
+    # Drop spaces around punctuation so "count( * )" and "count(*)" share a key
+    parts = _SQL_LITERAL_PATTERN.split(text)
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r"\s*([(),=<>+\-*/])\s*", r"\1", parts[i])
+        # Keep "1 - -1" apart from "1--1", in which "--" would start a comment
+        parts[i] = re.sub(r"-(?=-)", "- ", parts[i]).replace("/*", "/ *")
+    return "".join(parts)
+
+
+def is_deterministic_sql(sql_query: str) -> bool:
+    """
+    False if `sql_query` reads the clock or random numbers (e.g. `DATE('now')`, `CURRENT_DATE`,
+    `RANDOM()`), so that running it again may give a different result on unchanged data.
+    """
+    parts = _SQL_LITERAL_PATTERN.split(normalize_sql(sql_query))
+    if any(part.lower() == "'now'" for part in parts[1::2]):
+        return False
+    return not any(_NONDETERMINISTIC_PATTERN.search(part) for part in parts[::2])
+
+
+def database_fingerprint(database_path: str = DATABASE_PATH) -> tuple:
+    """
+    Returns a cheap fingerprint of the database's on-disk state.
+
+    Any committed write changes the size or modification time of the database file (or of its
+    write-ahead log), so comparing fingerprints detects data changes made by other processes.
+    """
+    fingerprint = []
+    for path in (database_path, database_path + "-wal"):
+        try:
+            stat = os.stat(path)
+            fingerprint.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+        except FileNotFoundError:
+            fingerprint.append(None)
+    return tuple(fingerprint)
+
+
+class SQLResultCache:
+    """
+    A byte-budgeted LRU cache of serialized query results with TTL expiry.
+
+    Entries are tied to the database fingerprint they were computed against; when the
+    fingerprint changes, the whole cache is dropped before the next lookup.
+    """
+
+    def __init__(self, max_bytes: int = SQL_CACHE_MAX_BYTES, ttl_seconds: float = SQL_CACHE_TTL_SECONDS,
+                 database_path: str = DATABASE_PATH):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.database_path = database_path
+
+        self._entries = OrderedDict()  # key -> (value, size_bytes, stored_at)
+        self._current_bytes = 0
+        self._fingerprint = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_fingerprint(self):
+        fingerprint = database_fingerprint(self.database_path)
+        if fingerprint != self._fingerprint:
+            if self._entries:
+                logging.info("Database changed on disk; invalidating SQL result cache.")
+                self.invalidations += 1
+            self._entries.clear()
+            self._current_bytes = 0
+            self._fingerprint = fingerprint
+
+    def get(self, sql_query: str):
+        """Returns the cached result for `sql_query`, or None on a miss."""
+        key = normalize_sql(sql_query)
+        with self._lock:
+            self._check_fingerprint()
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[2] > self.ttl_seconds:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, sql_query: str, result: str):
+        """Stores a serialized result, evicting least recently used entries to stay within budget."""
+        size = len(result.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        key = normalize_sql(sql_query)
+        with self._lock:
+            self._check_fingerprint()
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (result, size, time.monotonic())
+            self._current_bytes += size
+            while self._current_bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def discard(self, sql_query: str):
+        """Drops the entry for `sql_query`, if any."""
+        key = normalize_sql(sql_query)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._current_bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_result_cache() -> SQLResultCache:
+    """Returns the process-wide SQL result cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SQLResultCache()
+    return _cache
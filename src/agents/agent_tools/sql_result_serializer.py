@@ -0,0 +1,78 @@
+import csv
+import io
+import os
+
+SQL_RESULT_FETCH_SIZE = int(os.environ.get("SQL_RESULT_FETCH_SIZE", "1000"))  # rows per fetchmany call
+
+
+class SerializedResult:
+    """The CSV text of a query result plus what was needed to produce it."""
+
+    def __init__(self, text: str, columns: list, rows_written: int, total_rows: int, truncated: bool):
+        self.text = text
+        self.columns = columns
+        self.rows_written = rows_written
+        self.total_rows = total_rows
+        self.truncated = truncated
+
+    @property
+    def num_bytes(self) -> int:
+        return len(self.text.encode("utf-8"))
+
+
+def iter_batches(cursor, fetch_size: int = SQL_RESULT_FETCH_SIZE):
+    """Yields the rows of an executed cursor in `fetchmany` batches of up to `fetch_size` rows."""
+    while True:
+        batch = cursor.fetchmany(fetch_size)
+        if not batch:
+            return
+        yield batch
+
+
+def serialize_rows_to_csv(columns: list, rows: list, max_rows: int, max_bytes: int) -> SerializedResult:
+    """
+    Writes `columns` and `rows` as CSV text, stopping at `max_rows` rows or `max_bytes` bytes.
+
+    At least one row is written whatever its size. When a limit cuts the output short, a
+    truncation marker with the total row count is appended so the reader knows it is partial.
+
+    Returns:
+        SerializedResult: The CSV text and row accounting. `text` is empty if there are no rows.
+    """
+    row_buffer = io.StringIO()
+    writer = csv.writer(row_buffer, lineterminator="\n")
+
+    def format_row(row) -> str:
+        row_buffer.seek(0)
+        row_buffer.truncate()
+        writer.writerow(row)
+        return row_buffer.getvalue()
+
+    header = format_row(columns)
+    chunks = [header]
+    written_bytes = len(header.encode("utf-8"))
+    rows_written = 0
+    truncated = False
+
+    total_rows = len(rows)
+    for row in rows:
+        if rows_written >= max_rows:
+            truncated = True
+            break
+        line = format_row(row)
+        line_bytes = len(line.encode("utf-8"))
+        if written_bytes + line_bytes > max_bytes and rows_written > 0:
+            truncated = True
+            break
+        chunks.append(line)
+        written_bytes += line_bytes
+        rows_written += 1
+
+    if total_rows == 0:
+        return SerializedResult("", columns, 0, 0, False)
+
+    text = "".join(chunks)
+    if truncated:
+        text += (f"... [truncated: showing {rows_written} of {total_rows} rows. "
+                 f"Use aggregation, filters or LIMIT to narrow the result.]\n")
+    return SerializedResult(text, columns, rows_written, total_rows, truncated)
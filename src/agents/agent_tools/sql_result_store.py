@@ -0,0 +1,101 @@
+import os
+import re
+import csv
+import uuid
+import logging
+import threading
+from typing import Optional
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
+
+# Where full results of summarized queries are kept for download
+SQL_RESULT_STORE_DIR = os.environ.get("SQL_RESULT_STORE_DIR", os.path.join(PROJECT_ROOT, '.cache', 'sql_results'))
+SQL_RESULT_STORE_MAX_FILES = int(os.environ.get("SQL_RESULT_STORE_MAX_FILES", "200"))  # oldest are deleted first
+
+_RESULT_ID_PATTERN = re.compile(r"^[0-9a-f]{12}$")
+
+
+class ResultWriter:
+    """Streams one result into the store as CSV; `commit()` publishes it under `result_id`."""
+
+    def __init__(self, store, columns: list):
+        self.store = store
+        self.result_id = uuid.uuid4().hex[:12]
+        self._temp_path = os.path.join(store.directory, f".{self.result_id}.csv.tmp")
+        self._file = open(self._temp_path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write_rows(self, rows):
+        self._writer.writerows(rows)
+
+    def commit(self) -> str:
+        self._file.close()
+        os.replace(self._temp_path, self.store.path_for(self.result_id))
+        self.store.prune()
+        return self.result_id
+
+    def discard(self):
+        self._file.close()
+        try:
+            os.remove(self._temp_path)
+        except OSError:
+            pass
+
+
+class SQLResultStore:
+    """
+    Full query results saved as CSV files, addressed by a short result id.
+
+    Large results are summarized for the model; the complete rows go here so the UI can offer
+    them for download. Only the newest `max_files` results are kept.
+    """
+
+    def __init__(self, directory: str = SQL_RESULT_STORE_DIR, max_files: int = SQL_RESULT_STORE_MAX_FILES):
+        self.directory = os.path.abspath(directory)
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path_for(self, result_id: str) -> str:
+        return os.path.join(self.directory, f"{result_id}.csv")
+
+    def open_writer(self, columns: list) -> ResultWriter:
+        return ResultWriter(self, columns)
+
+    def path(self, result_id: str) -> Optional[str]:
+        """The CSV file of a saved result, or None if the id is unknown or the result was pruned."""
+        if not _RESULT_ID_PATTERN.match(result_id or ""):
+            return None
+        path = self.path_for(result_id)
+        return path if os.path.exists(path) else None
+
+    def prune(self):
+        with self._lock:
+            try:
+                entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".csv")]
+            except OSError as e:
+                logging.warning(f"Could not list saved query results in {self.directory}: {e}")
+                return
+            if len(entries) <= self.max_files:
+                return
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries[:len(entries) - self.max_files]:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_result_store() -> SQLResultStore:
+    """Returns the process-wide result store, creating it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SQLResultStore()
+    return _store
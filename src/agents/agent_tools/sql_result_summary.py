@@ -0,0 +1,197 @@
+import os
+import re
+from .sql_result_serializer import SQL_RESULT_FETCH_SIZE, iter_batches, serialize_rows_to_csv
+
+SQL_OBSERVATION_FULL_ROWS = int(os.environ.get("SQL_OBSERVATION_FULL_ROWS", "50"))  # larger results are summarized
+SQL_OBSERVATION_FULL_BYTES = int(os.environ.get("SQL_OBSERVATION_FULL_BYTES", str(4 * 1024)))
+SQL_OBSERVATION_PREVIEW_ROWS = int(os.environ.get("SQL_OBSERVATION_PREVIEW_ROWS", "10"))
+SQL_OBSERVATION_TOP_K = int(os.environ.get("SQL_OBSERVATION_TOP_K", "5"))
+# Distinct values counted per column for the top-k; past this a column is reported as high-cardinality
+SQL_OBSERVATION_MAX_DISTINCT = int(os.environ.get("SQL_OBSERVATION_MAX_DISTINCT", "1000"))
+
+SUMMARY_PREFIX = "Result summary:"
+MAX_VALUE_CHARS = 40 # Longer values are shortened in summaries
+
+_RESULT_ID_PATTERN = re.compile(r"result_id=([0-9a-f]{12})")
+
+
+def _short(value) -> str:
+    text = str(value)
+    return text if len(text) <= MAX_VALUE_CHARS else text[:MAX_VALUE_CHARS - 3] + "..."
+
+
+class ColumnSummary:
+    """
+    Running statistics of one result column, updated a batch at a time with NumPy.
+
+    Columns whose values are all ints/floats get min/max/mean; any other value turns the column
+    into text, with min/max compared as strings. Value counts for the top-k are kept until the
+    column has more than `max_distinct` distinct values.
+    """
+
+    def __init__(self, name: str, max_distinct: int = SQL_OBSERVATION_MAX_DISTINCT):
+        self.name = name
+        self.max_distinct = max_distinct
+        self.nulls = 0
+        self.count = 0
+        self.numeric = True
+        self.minimum = None
+        self.maximum = None
+        self.total = 0.0
+        self.counts = {}
+
+    def add(self, values):
+        """Adds one batch of the column (a 1-D NumPy object array, None for NULL)."""
+        import numpy as np
+        nulls = np.equal(values, None)
+        self.nulls += int(nulls.sum())
+        values = values[~nulls]
+        if values.size == 0:
+            return
+        self.count += values.size
+        kinds = set(map(type, values))
+        if self.numeric and not kinds <= {int, float}:
+            self._to_text()
+        if self.numeric:
+            values = values.astype(np.float64 if float in kinds else np.int64)
+            self.total += float(values.sum(dtype=np.float64))
+        else:
+            values = values.astype(str)
+        unique, counts = np.unique(values, return_counts=True)
+        low, high = unique[0].item(), unique[-1].item()
+        self.minimum = low if self.minimum is None else min(self.minimum, low)
+        self.maximum = high if self.maximum is None else max(self.maximum, high)
+        if self.counts is not None:
+            for value, count in zip(unique.tolist(), counts.tolist()):
+                self.counts[value] = self.counts.get(value, 0) + count
+            if len(self.counts) > self.max_distinct:
+                self.counts = None
+
+    def _to_text(self):
+        self.numeric = False
+        if self.minimum is not None:
+            self.minimum, self.maximum = str(self.minimum), str(self.maximum)
+        if self.counts is not None:
+            counts = {}
+            for value, count in self.counts.items():
+                counts[str(value)] = counts.get(str(value), 0) + count
+            self.counts = counts
+
+    def describe(self, top_k: int = SQL_OBSERVATION_TOP_K) -> str:
+        kind = "numeric" if self.numeric and self.count else "text"
+        parts = [f"{self.nulls} nulls"]
+        if self.count:
+            distinct = len(self.counts) if self.counts is not None else f"more than {self.max_distinct}"
+            parts.append(f"{distinct} distinct")
+            parts.append(f"min {_short(self.minimum)}, max {_short(self.maximum)}")
+            if self.numeric:
+                parts.append(f"mean {self.total / self.count:.6g}")
+        line = f"- {self.name} ({kind}): " + ", ".join(parts)
+        # Top values are only informative when values repeat
+        if self.counts and max(self.counts.values()) > 1:
+            top = sorted(self.counts.items(), key=lambda item: (-item[1], str(item[0])))[:top_k]
+            line += "; top: " + ", ".join(f"{_short(value)} ({count})" for value, count in top)
+        return line
+
+
+class Observation:
+    """What execute_sql_query returns for a result: its text, and whether (and where) the full result was saved."""
+
+    def __init__(self, text: str, total_rows: int, summarized: bool = False, result_id: str = None):
+        self.text = text
+        self.total_rows = total_rows
+        self.summarized = summarized
+        self.result_id = result_id
+
+
+def build_observation(cursor, store=None, on_rows=None, fetch_size: int = SQL_RESULT_FETCH_SIZE,
+                      columns: list = None) -> Observation:
+    """
+    Reads an executed cursor and returns the observation for the model.
+
+    Results of at most SQL_OBSERVATION_FULL_ROWS rows that fit in SQL_OBSERVATION_FULL_BYTES are
+    returned in full as CSV. Larger ones are summarized: row count, per-column null counts,
+    distinct counts, min/max, mean of numeric columns, the most frequent values, and the first
+    rows. The summary's size depends on the number of columns, not rows. Rows stream through in
+    `fetchmany` batches; the full result of a summarized query is written to `store` (when given)
+    as it is read, and the summary names its result id.
+
+    Args:
+        cursor: A DB-API cursor on which a SELECT has already been executed.
+        store: A SQLResultStore for the full results of summarized queries, or None.
+        on_rows (callable): Called with the size of every fetched batch; may raise to stop reading.
+        fetch_size (int): Number of rows to fetch per `fetchmany` call.
+        columns (list): Column names to report instead of the cursor's own.
+
+    Returns:
+        Observation: `text` is empty if no rows matched.
+    """
+    # NumPy is imported on first use, keeping it off the import path of the executor tool
+    import numpy as np
+
+    if columns is None:
+        columns = [description[0] for description in cursor.description or []]
+    summaries = [ColumnSummary(name) for name in columns]
+    head = []  # The first rows (all of them, until the result is known to be too large to show in full)
+    summarize = False
+    writer = None
+    total_rows = 0
+    try:
+        for batch in iter_batches(cursor, fetch_size):
+            total_rows += len(batch)
+            if on_rows is not None:
+                on_rows(len(batch))
+            table = np.empty((len(batch), len(columns)), dtype=object)
+            table[:] = batch
+            for index, summary in enumerate(summaries):
+                summary.add(table[:, index])
+            if summarize:
+                if writer is not None:
+                    writer.write_rows(batch)
+                continue
+            head.extend(batch)
+            if len(head) > SQL_OBSERVATION_FULL_ROWS:
+                summarize = True
+                if store is not None:
+                    writer = store.open_writer(columns)
+                    writer.write_rows(head)
+                del head[SQL_OBSERVATION_PREVIEW_ROWS:]
+
+        if total_rows == 0:
+            return Observation("", 0)
+        if not summarize:
+            full = serialize_rows_to_csv(columns, head, max_rows=SQL_OBSERVATION_FULL_ROWS,
+                                         max_bytes=SQL_OBSERVATION_FULL_BYTES)
+            if not full.truncated:
+                return Observation(full.text, total_rows)
+            if store is not None:
+                # Few rows, but too wide to show in full
+                writer = store.open_writer(columns)
+                writer.write_rows(head)
+        result_id = writer.commit() if writer is not None else None
+        writer = None
+    finally:
+        if writer is not None:
+            writer.discard()
+
+    preview = serialize_rows_to_csv(columns, head[:SQL_OBSERVATION_PREVIEW_ROWS], max_rows=SQL_OBSERVATION_PREVIEW_ROWS,
+                                    max_bytes=SQL_OBSERVATION_FULL_BYTES // 2)
+    saved = (f"The full result is saved for download (result_id={result_id})." if result_id is not None
+             else "The full result was not saved.")
+    lines = [
+        f"{SUMMARY_PREFIX} {total_rows:,} rows x {len(columns)} columns; too large to show in full, so it was "
+        f"summarized. {saved} Use aggregation, filters or LIMIT in SQL for exact figures.",
+        "Columns:",
+        *(summary.describe() for summary in summaries),
+        f"First {preview.rows_written} rows:",
+        preview.text.rstrip("\n"),
+    ]
+    return Observation("\n".join(lines) + "\n", total_rows, summarized=True, result_id=result_id)
+
+
+def result_id_of(observation_text: str):
+    """The result id named in a summary observation, or None."""
+    if not observation_text.startswith(SUMMARY_PREFIX):
+        return None
+    match = _RESULT_ID_PATTERN.search(observation_text)
+    return match.group(1) if match else None
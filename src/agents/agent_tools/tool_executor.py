@@ -0,0 +1,142 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+TOOL_EXECUTOR_WORKERS = int(os.environ.get("TOOL_EXECUTOR_WORKERS", "8")) # Blocking tool calls (SQL, retrieval) run at once
+TOOL_EXECUTOR_MAX_QUEUE = int(os.environ.get("TOOL_EXECUTOR_MAX_QUEUE", "64")) # Calls that may wait for a worker; 0 = unlimited
+TOOL_EXECUTOR_SLOW_WAIT_SECONDS = float(os.environ.get("TOOL_EXECUTOR_SLOW_WAIT_SECONDS", "1")) # Longer queue waits are logged
+
+
+class ToolExecutorBusyError(Exception):
+    """Raised when a tool call is submitted while the executor's queue is full."""
+
+
+class ToolExecutor:
+    """
+    A dedicated, bounded thread pool for the blocking work of async tools.
+
+    SQLite queries and schema retrieval block, so the async tool variants run them here instead
+    of on the event loop, and instead of asyncio's default executor, which is shared with
+    everything else in the process. At most `max_workers` calls run at once; up to `max_queue`
+    more wait for a worker, and calls beyond that fail fast with ToolExecutorBusyError. Each call
+    runs in a copy of the caller's context, so progress sinks, spans and cancel scopes reach the
+    worker thread. A call cancelled while still queued never runs.
+    """
+
+    def __init__(self, max_workers: int = TOOL_EXECUTOR_WORKERS, max_queue: int = TOOL_EXECUTOR_MAX_QUEUE,
+                 slow_wait_seconds: float = TOOL_EXECUTOR_SLOW_WAIT_SECONDS):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.slow_wait_seconds = slow_wait_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.max_queue_depth = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """Calls submitted but not yet started."""
+        return self._queued
+
+    def _run(self, context: contextvars.Context, submitted_at: float, fn, args):
+        started = time.perf_counter()
+        waited = started - submitted_at
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self.total_wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        if waited > self.slow_wait_seconds:
+            logging.info(f"Tool call {getattr(fn, '__name__', fn)} waited {waited:.1f}s for a worker "
+                         f"({self._queued} still queued).")
+        try:
+            result = context.run(fn, *args)
+        except BaseException:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+                self.total_run_seconds += time.perf_counter() - started
+        with self._lock:
+            self.completed += 1
+        return result
+
+    async def run(self, fn, *args):
+        """
+        Runs `fn(*args)` on a worker thread and awaits its result, without blocking the event loop.
+
+        Raises:
+            ToolExecutorBusyError: If `max_queue` calls are already waiting for a worker.
+        """
+        with self._lock:
+            if 0 < self.max_queue <= self._queued:
+                self.rejected += 1
+                raise ToolExecutorBusyError(
+                    f"{self._queued} tool calls are already waiting for one of {self.max_workers} workers."
+                )
+            self._queued += 1
+            self.submitted += 1
+            self.max_queue_depth = max(self.max_queue_depth, self._queued)
+        future = self._executor.submit(self._run, contextvars.copy_context(), time.perf_counter(), fn, args)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # A call that has not started yet is dropped; a running one finishes (or is interrupted by its caller)
+            if future.cancel():
+                with self._lock:
+                    self._queued -= 1
+                    self.cancelled += 1
+            raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            started = self.submitted - self._queued - self.cancelled
+            return {
+                "max_workers": self.max_workers,
+                "running": self._running,
+                "queue_depth": self._queued,
+                "max_queue_depth": self.max_queue_depth,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "cancelled": self.cancelled,
+                "avg_wait_ms": (self.total_wait_seconds / started * 1000) if started else 0.0,
+                "max_wait_ms": self.max_wait_seconds * 1000,
+                "avg_run_ms": (self.total_run_seconds / (self.completed + self.failed) * 1000)
+                              if self.completed + self.failed else 0.0,
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_tool_executor() -> ToolExecutor:
+    """Returns the process-wide tool executor, creating it on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ToolExecutor()
+    return _executor
@@ -0,0 +1,89 @@
+import csv
+import io
+import re
+
+from .agent_tools.sql_query_budget import BUDGET_EXCEEDED_PREFIX
+from .agent_tools.sql_result_summary import SUMMARY_PREFIX
+
+# The instruction the fine-tuned model was trained with (fine-tuning/nl_sql_finetune_dataset.jsonl)
+SQL_GENERATION_SYSTEM_PROMPT = (
+    "You are a helpful assistant that translates natural language queries into executable SQL queries. "
+    "Only respond with the SQL query."
+)
+ANSWER_SUMMARY_PROMPT = (
+    "Answer the question in one or two sentences using only the SQL result below. "
+    "State the numbers exactly as they appear.\n\n"
+    "Question: {question}\nSQL: {sql}\nResult (CSV):\n{result}\n\nAnswer:"
+)
+
+# Prefixes of the messages execute_sql_query returns instead of results
+EXECUTION_ERROR_PREFIXES = (
+    "Error:",
+    "Database Query Error",
+    "Database Connection Error",
+    "An unexpected error occurred",
+    BUDGET_EXCEEDED_PREFIX,
+)
+NO_RESULTS_MESSAGE = "Query executed successfully, but no results were found."
+TEMPLATE_MAX_ROWS = 20 # Rows shown in a template answer; the rest are summarized by count
+
+
+def build_generation_prompt(schema_context: str) -> str:
+    """The trained system instruction, followed by the retrieved schema context."""
+    return f"{SQL_GENERATION_SYSTEM_PROMPT}\n\nUse this database schema (SQLite):\n{schema_context}"
+
+
+def extract_sql(generated_text: str):
+    """
+    Pulls the SQL statement out of a model response.
+
+    Handles bare SQL, ```sql fenced blocks and trailing commentary; only the first statement is
+    kept. Returns None if the response contains no SELECT (or WITH ... SELECT) statement.
+    """
+    text = generated_text.strip()
+    fenced = re.search(r"```(?:sql)?\s*(.*?)```", text, re.DOTALL | re.IGNORECASE)
+    if fenced:
+        text = fenced.group(1).strip()
+    match = re.search(r"\b(SELECT|WITH)\b", text, re.IGNORECASE)
+    if not match:
+        return None
+    statement = text[match.start():].split(";", 1)[0].strip()
+    return statement or None
+
+
+def is_execution_error(result: str) -> bool:
+    return result.startswith(EXECUTION_ERROR_PREFIXES)
+
+
+def format_template_answer(result: str, sql_query: str, max_rows: int = TEMPLATE_MAX_ROWS) -> str:
+    """
+    Turns an execute_sql_query result (CSV, possibly with a truncation marker) into an answer
+    without calling a model: a sentence for a single value, a markdown table otherwise. Summaries
+    of large results are shown as they are.
+    """
+    if result == NO_RESULTS_MESSAGE:
+        return f"No matching records were found.\n\nSQL used: {sql_query}"
+    if result.startswith(SUMMARY_PREFIX):
+        return f"{result.rstrip()}\n\nSQL used: {sql_query}"
+
+    lines = result.rstrip("\n").split("\n")
+    note = ""
+    if lines and lines[-1].startswith("... [truncated"):
+        note = lines.pop()
+    rows = list(csv.reader(io.StringIO("\n".join(lines))))
+    if not rows:
+        return f"The query returned no rows.\n\nSQL used: {sql_query}"
+    header, data = rows[0], rows[1:]
+
+    if len(data) == 1 and len(header) == 1:
+        answer = f"The {header[0]} is {data[0][0]}."
+    else:
+        shown = data[:max_rows]
+        table = ["| " + " | ".join(header) + " |", "|" + "---|" * len(header)]
+        table += ["| " + " | ".join(row) + " |" for row in shown]
+        answer = f"Found {len(data)} row{'s' if len(data) != 1 else ''}:\n\n" + "\n".join(table)
+        if len(data) > len(shown):
+            answer += f"\n\n(Showing the first {len(shown)} of {len(data)} rows.)"
+    if note:
+        answer += f"\n\n{note}"
+    return f"{answer}\n\nSQL used: {sql_query}"
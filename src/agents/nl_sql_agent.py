@@ -1,26 +1,58 @@
 import os
+import time
+import asyncio
 import logging
 import sys
-from llama_index.llms.openai import OpenAI 
-from llama_index.core.agent import ReActAgent
-from .agent_tools.sql_executor_tool import get_sql_executor_tool
-from .agent_tools.schema_retriever_tool import get_schema_retriever_tool
+from .agent_tools.sql_executor_tool import get_sql_executor_tool, capture_executed_queries, aexecute_sql_query
+from .agent_tools.schema_retriever_tool import (
+    get_schema_retriever_tool, get_schema_retriever_engine, get_kpi_retriever_engine, format_schema_context,
+)
 from .agent_models.models import get_finetuned_model
+from .semantic_cache import SEMANTIC_CACHE_ENABLED, get_semantic_cache
+from .agent_progress import AgentEvent, capture_progress, report_progress
+from .tracing import activate, span, start_span
+from .settings import env_flag
+from .direct_sql_pipeline import (
+    ANSWER_SUMMARY_PROMPT, build_generation_prompt, extract_sql, format_template_answer, is_execution_error,
+)
+
+# "react": Thought/Action/Observation loop; "direct": retrieve schema, generate SQL once, execute, answer
+NL_SQL_PIPELINE_MODE = os.environ.get("NL_SQL_PIPELINE_MODE", "react")
+# How the direct pipeline phrases answers: "template" (no model call) or "llm" (one short summarization call)
+NL_SQL_ANSWER_FORMAT = os.environ.get("NL_SQL_ANSWER_FORMAT", "template")
+# Retrieve schema and KPI context while the question is checked against the cache, and put it in the first prompt
+CONTEXT_PREFETCH_ENABLED = env_flag("CONTEXT_PREFETCH_ENABLED", True)
+CONTEXT_PREFETCH_TIMEOUT = float(os.environ.get("CONTEXT_PREFETCH_TIMEOUT", "10")) # Seconds to wait before asking without it
 
 # Configure logging for better visibility into agent's thought process
 logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
 logging.getLogger().addHandler(logging.StreamHandler(stream=sys.stdout))
 
 class NLSQLAgent:
-    def __init__(self):
+    def __init__(self, pipeline_mode: str = NL_SQL_PIPELINE_MODE, answer_format: str = NL_SQL_ANSWER_FORMAT):
         """
         Initializes the NL-to-SQL Agent, which translates natural language to SQL, executes it, and provides answers.
 
         Args:
-            model_name (str): The name/ID of fine-tuned model deployed on Nebius AI.
-            api_key (str): Nebius AI API key.
-            base_url (str): The base URL for the Nebius AI API endpoint
+            pipeline_mode (str): "react" for the ReAct tool loop, or "direct" for a single SQL generation
+                                 call that falls back to the ReAct loop when the generated query fails.
+            answer_format (str): In direct mode, "template" or "llm" (see NL_SQL_ANSWER_FORMAT).
         """
+        if pipeline_mode not in ("react", "direct"):
+            raise ValueError(f"Unknown pipeline mode {pipeline_mode!r}; expected 'react' or 'direct'.")
+        if answer_format not in ("template", "llm"):
+            raise ValueError(f"Unknown answer format {answer_format!r}; expected 'template' or 'llm'.")
+        self.pipeline_mode = pipeline_mode
+        self.answer_format = answer_format
+        self.direct_answers = 0
+        self.direct_fallbacks = 0
+        self.prefetches = 0
+        self.prefetch_failures = 0
+        self.schema_tool_calls = 0
+        self.iterations_saved = 0 # ReAct runs that used the prefetched schema instead of calling retrieve_schema_context
+        self.answers = 0
+        self.total_first_token_seconds = 0.0
+        self.total_answer_seconds = 0.0
         self.llm = get_finetuned_model()
         self.system_prompt = (
             "<instructions>"
@@ -36,13 +68,14 @@ class NLSQLAgent:
             "\n- **execute_sql_query**: Use this to run a SQL SELECT query. Use SQLite date functions (e.g., `DATE('now', ...)`, `STRFTIME(...)`)."
             "\n\n**PROCESS:**"
             "\n1. Analyze the user's question."
-            "\n2. Use `retrieve_schema_context` if needed."
-            "\n3. Generate and execute the SQL query using `execute_sql_query`."
+            "\n2. Use `retrieve_schema_context` if needed. Skip it when the question already comes with the relevant schema."
+            "\n3. Generate and execute the SQL query using `execute_sql_query`. If it returns 'Query Budget Exceeded', the query was too expensive: rewrite it with join conditions, filters, aggregation or a LIMIT instead of retrying it."
             "\n4. Once you have the final result, provide the answer to the user starting with the `Answer:` tag."
             "\n</instructions>"
         )
         self.tools = [get_schema_retriever_tool(), get_sql_executor_tool()]
 
+        from llama_index.core.agent import ReActAgent
         self.agent = ReActAgent.from_tools(
             llm=self.llm,
             tools=self.tools, 
@@ -50,10 +83,27 @@ class NLSQLAgent:
             verbose=True,
         )
 
+    def new_memory(self):
+        """Creates an empty chat memory sized for this agent's LLM, for one conversation."""
+        from llama_index.core.memory import ChatMemoryBuffer
+        return ChatMemoryBuffer.from_defaults(llm=self.llm)
+
+    def use_memory(self, memory):
+        """
+        Points the agent at a conversation's chat memory.
+
+        Used by AgentPool so a pooled agent serves one session at a time without carrying
+        history from the previous one. Finished task state from earlier queries is dropped.
+        """
+        self.agent.memory = memory
+        self.agent.state.reset()
+
     async def process_query(self, user_query: str) -> str:
         """
         Processes a user's natural language query using the NL-to-SQL agent.
-        This method executes the agent's Thought-Action-Observation loop.
+        This method executes the agent's Thought-Action-Observation loop (or, in direct mode, the
+        single-shot pipeline), unless this is the first question of the conversation and a
+        sufficiently similar question was answered before against the same data (see semantic_cache.py).
 
         Args:
             user_query (str): The natural language question from the user.
@@ -61,12 +111,264 @@ class NLSQLAgent:
         Returns:
             str: The final natural language answer based on SQL execution, or an error/explanation.
         """
+        answer = ""
+        async for event in self.astream_query(user_query):
+            if event.kind == "answer":
+                answer = event.text
+        return answer
+
+    async def astream_query(self, user_query: str):
+        """
+        Answers like `process_query`, yielding AgentEvents as the work progresses.
+
+        Status events report finished steps (schema retrieved, SQL run, rows returned), token
+        events carry the answer text as the model streams it, and the last event is the complete
+        answer. Time to the first answer token and to the complete answer are logged and kept
+        in `stats()`.
+        """
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+
+        # Tools report from worker threads
+        def sink(event: AgentEvent):
+            loop.call_soon_threadsafe(events.put_nowait, event)
+
+        # Root of this question's trace; LLM, retrieval and SQL spans nest under it
+        request = start_span("request", pipeline_mode=self.pipeline_mode, question_chars=len(user_query))
+
+        async def answer():
+            with capture_progress(sink), activate(request):
+                try:
+                    text = await self._answer(user_query)
+                except Exception as e:
+                    request.fail(e)
+                    logging.error(f"Error in NLSQLAgent.process_query: {e}")
+                    text = f"I encountered an error while processing your request: {e}. Please try again or rephrase."
+                sink(AgentEvent("answer", text))
+
+        started = time.perf_counter()
+        first_token_seconds = None
+        event = None
+        worker = asyncio.create_task(answer())
+        try:
+            while True:
+                event = await events.get()
+                if event.kind == "token" and first_token_seconds is None:
+                    first_token_seconds = time.perf_counter() - started
+                if event.kind == "answer":
+                    break
+                yield event
+        finally:
+            worker.cancel()
+            if event is None or event.kind != "answer":
+                request.end(error="cancelled before the answer was complete")
+
+        total_seconds = time.perf_counter() - started
+        if first_token_seconds is None:
+            first_token_seconds = total_seconds
+        request.set(first_token_ms=round(first_token_seconds * 1000, 3), answer_chars=len(event.text))
+        request.end()
+        self.answers += 1
+        self.total_first_token_seconds += first_token_seconds
+        self.total_answer_seconds += total_seconds
+        logging.info(f"First answer token after {first_token_seconds * 1000:.0f} ms, answer complete after {total_seconds * 1000:.0f} ms.")
+        yield event
+
+    async def _answer(self, user_query: str) -> str:
+        # Retrieval runs concurrently with the cache lookup instead of costing the agent a turn
+        prefetch = asyncio.create_task(self._prefetch_context(user_query)) if CONTEXT_PREFETCH_ENABLED else None
+
+        # A follow-up ("and in the South?") means something else without the turns before it, so the
+        # shared cache is neither consulted nor filled once the conversation has history
+        cache = get_semantic_cache() if SEMANTIC_CACHE_ENABLED and not self.agent.memory.get_all() else None
+        if cache is not None:
+            cached = await self._cached_answer(cache, user_query)
+            if cached is not None:
+                if prefetch is not None:
+                    prefetch.cancel()
+                report_progress(cached, kind="token")
+                return cached
+
+        schema_nodes, kpi_nodes = await self._await_prefetch(prefetch)
+        if schema_nodes:
+            report_progress(f"Retrieved schema context ({len(schema_nodes)} section{'s' if len(schema_nodes) != 1 else ''}).")
+        with capture_executed_queries() as executed_queries:
+            if self.pipeline_mode == "direct":
+                response = await self._process_direct(user_query, schema_nodes, kpi_nodes)
+            else:
+                response = await self._process_react(user_query, schema_nodes, kpi_nodes)
+
+        # Only answers backed by a successful query are reused
+        if cache is not None and executed_queries:
+            try:
+                await cache.astore(user_query, response, executed_queries)
+            except Exception as e:
+                logging.warning(f"Could not cache answer: {e}")
+        return response
+
+    async def _prefetch_context(self, user_query: str):
+        """Retrieves schema and KPI nodes for `user_query` concurrently; a failed retrieval yields None."""
+        self.prefetches += 1
+        with span("prefetch_context"):
+            schema_nodes, kpi_nodes = await asyncio.gather(
+                get_schema_retriever_engine().aretrieve(user_query),
+                get_kpi_retriever_engine().aretrieve(user_query),
+                return_exceptions=True,
+            )
+        if isinstance(schema_nodes, Exception):
+            self.prefetch_failures += 1
+            logging.warning(f"Schema prefetch failed: {schema_nodes}")
+            schema_nodes = None
+        if isinstance(kpi_nodes, Exception):
+            logging.warning(f"KPI prefetch failed: {kpi_nodes}")
+            kpi_nodes = None
+        return schema_nodes, kpi_nodes
+
+    async def _await_prefetch(self, prefetch):
+        if prefetch is None:
+            return None, None
         try:
-            response_object = await self.agent.achat(user_query)
-            return str(response_object) 
-        except Exception as e:
-            logging.error(f"Error in NLSQLAgent.process_query: {e}")
-            return f"I encountered an error while processing your request: {e}. Please try again or rephrase."
+            return await asyncio.wait_for(prefetch, CONTEXT_PREFETCH_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.prefetch_failures += 1
+            logging.warning(f"Context prefetch took longer than {CONTEXT_PREFETCH_TIMEOUT:g}s; asking without it.")
+            return None, None
+
+    async def _process_react(self, user_query: str, schema_nodes=None, kpi_nodes=None) -> str:
+        """
+        Runs the ReAct loop, with prefetched schema and KPI context prepended to the question.
+
+        The context only goes into this run's prompt: the conversation memory keeps the question
+        as the user asked it, so later turns do not carry stale schema text.
+        """
+        sections = []
+        if schema_nodes:
+            sections.append(format_schema_context(schema_nodes))
+        if kpi_nodes:
+            sections.append("Relevant KPI definitions:\n" + "\n---\n".join(node.get_content() for node in kpi_nodes))
+        with span("react_agent", prefetched_schema=bool(schema_nodes)) as step:
+            if sections:
+                agent_input = "\n\n".join(sections) + f"\n\nQuestion: {user_query}"
+                try:
+                    response_object = await self._astream_agent(agent_input)
+                finally:
+                    self._restore_question(agent_input, user_query)
+            else:
+                response_object = await self._astream_agent(user_query)
+            step.set(tool_calls=len(response_object.sources))
+
+        schema_calls = sum(1 for source in response_object.sources if source.tool_name == "retrieve_schema_context")
+        self.schema_tool_calls += schema_calls
+        if schema_nodes and schema_calls == 0:
+            self.iterations_saved += 1
+        return str(response_object)
+
+    async def _astream_agent(self, agent_input: str):
+        """Runs the ReAct agent in streaming mode, reporting the answer tokens as they arrive."""
+        response_object = await self.agent.astream_chat(agent_input)
+        if not hasattr(response_object, "async_response_gen"):
+            report_progress(str(response_object), kind="token")
+            return response_object
+        streamed = ""
+        async for token in response_object.async_response_gen():
+            # The text after "Answer:" arrives with its leading whitespace
+            token = token if streamed else token.lstrip()
+            if token:
+                report_progress(token, kind="token")
+                streamed += token
+        # The conversation memory is updated by a background task once the stream ends
+        history_writer = getattr(response_object, "awrite_response_to_history_task", None)
+        if history_writer is not None:
+            await history_writer
+        return response_object
+
+    def _restore_question(self, agent_input: str, user_query: str):
+        """Replaces the context-augmented question in the chat memory with the original one."""
+        from llama_index.core.llms import ChatMessage, MessageRole
+        messages = self.agent.memory.get_all()
+        for position in range(len(messages) - 1, -1, -1):
+            if messages[position].role == MessageRole.USER and messages[position].content == agent_input:
+                messages[position] = ChatMessage(role=MessageRole.USER, content=user_query)
+                self.agent.memory.set(messages)
+                return
+
+    async def _process_direct(self, user_query: str, schema_nodes=None, kpi_nodes=None) -> str:
+        """
+        Answers with one SQL generation call instead of the ReAct loop.
+
+        The fine-tuned model was trained to output only SQL, so it is prompted exactly that way,
+        with the retrieved schema as context. If no query can be extracted or the query fails,
+        the question is handed to the ReAct agent, which can inspect the error and retry.
+        """
+        if schema_nodes is None:
+            schema_nodes = await get_schema_retriever_engine().aretrieve(user_query)
+        from llama_index.core.llms import ChatMessage, MessageRole
+        generation = await self.llm.achat([
+            ChatMessage(role=MessageRole.SYSTEM, content=build_generation_prompt(format_schema_context(schema_nodes))),
+            ChatMessage(role=MessageRole.USER, content=user_query),
+        ])
+        sql_query = extract_sql(generation.message.content or "")
+        result = await aexecute_sql_query(sql_query) if sql_query else None
+        if result is None or is_execution_error(result):
+            self.direct_fallbacks += 1
+            logging.info(f"Direct pipeline fell back to the ReAct agent for {user_query!r}: "
+                         f"{'no SQL in model output' if result is None else result}")
+            return await self._process_react(user_query, schema_nodes, kpi_nodes)
+
+        if self.answer_format == "llm":
+            summary = ""
+            stream = await self.llm.astream_complete(ANSWER_SUMMARY_PROMPT.format(question=user_query, sql=sql_query, result=result))
+            async for chunk in stream:
+                if chunk.delta:
+                    report_progress(chunk.delta if summary else chunk.delta.lstrip(), kind="token")
+                    summary += chunk.delta
+            sql_note = f"\n\nSQL used: {sql_query}"
+            report_progress(sql_note, kind="token")
+            answer = summary.strip() + sql_note
+        else:
+            answer = format_template_answer(result, sql_query)
+            report_progress(answer, kind="token")
+        self.direct_answers += 1
+        # Keep the conversation consistent for follow-up questions answered by the ReAct agent
+        self.agent.memory.put(ChatMessage(role=MessageRole.USER, content=user_query))
+        self.agent.memory.put(ChatMessage(role=MessageRole.ASSISTANT, content=answer))
+        return answer
+
+    def stats(self) -> dict:
+        return {
+            "direct_answers": self.direct_answers,
+            "direct_fallbacks": self.direct_fallbacks,
+            "prefetches": self.prefetches,
+            "prefetch_failures": self.prefetch_failures,
+            "schema_tool_calls": self.schema_tool_calls,
+            "iterations_saved": self.iterations_saved,
+            "answers": self.answers,
+            "first_token_seconds": self.total_first_token_seconds,
+            "answer_seconds": self.total_answer_seconds,
+            "avg_first_token_ms": (self.total_first_token_seconds / self.answers * 1000) if self.answers else 0.0,
+            "avg_answer_ms": (self.total_answer_seconds / self.answers * 1000) if self.answers else 0.0,
+        }
+
+    async def _cached_answer(self, cache, user_query: str):
+        """Returns a cached answer to a similar earlier question (with its SQL), or None."""
+        with span("semantic_cache_lookup") as step:
+            try:
+                match = await cache.alookup(user_query)
+            except Exception as e:
+                step.fail(e)
+                logging.warning(f"Semantic cache lookup failed: {e}")
+                return None
+            step.set(hit=match is not None, similarity=round(match[1], 4) if match else None)
+        if match is None:
+            return None
+        entry, similarity = match
+        logging.info(f"Semantic cache hit ({similarity:.3f}) for {user_query!r}: matched {entry.question!r}")
+        # Keep the conversation consistent for follow-up questions
+        from llama_index.core.llms import ChatMessage, MessageRole
+        self.agent.memory.put(ChatMessage(role=MessageRole.USER, content=user_query))
+        self.agent.memory.put(ChatMessage(role=MessageRole.ASSISTANT, content=entry.answer))
+        sql_used = "\n".join(entry.sql_queries)
+        return f"{entry.answer}\n\n(Answered from a previous question: \"{entry.question}\". SQL used: {sql_used})"
 
 # Example Usage (for testing the NLSQLAgent directly)
 if __name__ == "__main__":
@@ -0,0 +1,218 @@
+import os
+import re
+import time
+import logging
+import threading
+
+import numpy as np
+
+from .agent_tools.sql_connection_pool import DATABASE_PATH
+from .agent_tools.sql_result_cache import database_fingerprint
+from .settings import env_flag
+
+SEMANTIC_CACHE_ENABLED = env_flag("SEMANTIC_CACHE_ENABLED", True)
+# Minimum cosine similarity between question embeddings for a cached answer to be reused. Questions
+# that differ only in an entity score well above it, which is why their key terms must match too
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", "512"))
+# Answers to relative-date questions ("last month") go stale even when the data does not change
+SEMANTIC_CACHE_TTL_SECONDS = float(os.environ.get("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+
+
+def normalize_question(question: str) -> str:
+    """Lower-cases a question and collapses whitespace and trailing punctuation, for exact-match lookups."""
+    return re.sub(r"\s+", " ", question.strip().lower()).rstrip(" ?.!")
+
+
+_MONTHS = {
+    "january", "february", "march", "april", "may", "june", "july", "august", "september",
+    "october", "november", "december",
+}
+_KEY_TERM_PATTERN = re.compile(r"'[^']*'|\"[^\"]*\"|\d+(?:[.,]\d+)*%?|[A-Za-z][\w&'-]*")
+
+
+def question_key_terms(question: str) -> frozenset:
+    """
+    Returns the terms of a question that select what is being asked about: numbers, quoted text,
+    month names and capitalized words after the first one ("North", "Widget Pro"). Two questions
+    with different key terms are never answered from each other's cache entry, however close
+    their embeddings are.
+    """
+    terms = set()
+    for position, match in enumerate(_KEY_TERM_PATTERN.finditer(question.strip())):
+        term = match.group()
+        if term[0] in "'\"" or term[0].isdigit():
+            terms.add(term.lower())
+        elif term.lower() in _MONTHS or (position > 0 and term[0].isupper()):
+            terms.add(term.lower())
+    return frozenset(terms)
+
+
+class CachedAnswer:
+    def __init__(self, question: str, answer: str, sql_queries: list, embedding: np.ndarray):
+        self.question = question
+        self.key_terms = question_key_terms(question)
+        self.answer = answer
+        self.sql_queries = list(sql_queries)
+        self.embedding = embedding
+        self.stored_at = time.monotonic()
+        self.last_used = self.stored_at
+        self.hits = 0
+
+
+class SemanticAnswerCache:
+    """
+    Maps questions to previously computed answers (and the SQL behind them) by embedding similarity.
+
+    A lookup embeds the question and compares it with every cached question in one matrix-vector
+    product; the best match at or above `threshold` is returned, provided both questions have the
+    same key terms (see `question_key_terms`). Embeddings of "sales in the North region" and
+    "sales in the South region" are nearly identical, so similarity alone would hand one the
+    other's answer; entity names typed in lower case are not recognized as key terms and still
+    rely on the threshold. Answers depend only on the question, so callers must not look up or
+    store questions whose meaning depends on earlier conversation turns. Entries expire after
+    `ttl_seconds`, the least recently used entry is evicted beyond `max_entries`, and the whole
+    cache is dropped when the database fingerprint changes.
+    """
+
+    def __init__(self, embed_model=None, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES, ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS,
+                 database_path: str = DATABASE_PATH):
+        self._embed_model = embed_model
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.database_path = database_path
+
+        self._entries = {}  # normalized question -> CachedAnswer
+        self._matrix = None  # Row-aligned with _entries; rebuilt lazily after inserts and removals
+        self._fingerprint = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def embed_model(self):
+        if self._embed_model is None:
+            from .agent_tools.schema_retriever_tool import get_embed_model
+            self._embed_model = get_embed_model()
+        return self._embed_model
+
+    async def _aembed(self, question: str) -> np.ndarray:
+        vector = np.asarray(await self.embed_model.aget_query_embedding(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _check_fingerprint(self):
+        fingerprint = database_fingerprint(self.database_path)
+        if fingerprint != self._fingerprint:
+            if self._entries:
+                logging.info("Database changed on disk; invalidating semantic answer cache.")
+                self.invalidations += 1
+            self._entries.clear()
+            self._matrix = None
+            self._fingerprint = fingerprint
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [key for key, entry in self._entries.items() if now - entry.stored_at > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    def _best_match(self, query_embedding: np.ndarray, key_terms: frozenset):
+        if not self._entries:
+            return None, 0.0
+        if self._matrix is None:
+            self._matrix = np.stack([entry.embedding for entry in self._entries.values()])
+        scores = self._matrix @ query_embedding
+        keys = list(self._entries)
+        # Best-scoring entry asking about the same entities, numbers and periods
+        for best in np.argsort(scores)[::-1]:
+            if scores[best] < self.threshold:
+                break
+            if self._entries[keys[best]].key_terms == key_terms:
+                return keys[best], float(scores[best])
+        return None, 0.0
+
+    async def alookup(self, question: str):
+        """
+        Returns (CachedAnswer, similarity) for the closest cached question with the same key terms,
+        or None on a miss.
+
+        An identical question (after normalization) is answered without computing an embedding.
+        """
+        key = normalize_question(question)
+        with self._lock:
+            self._check_fingerprint()
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is not None:
+                return self._hit(entry, 1.0)
+            if not self._entries:
+                self.misses += 1
+                return None
+
+        query_embedding = await self._aembed(question)
+        with self._lock:
+            match_key, score = self._best_match(query_embedding, question_key_terms(question))
+            if match_key is None:
+                self.misses += 1
+                return None
+            return self._hit(self._entries[match_key], score)
+
+    def _hit(self, entry: CachedAnswer, score: float):
+        entry.last_used = time.monotonic()
+        entry.hits += 1
+        self.hits += 1
+        return entry, score
+
+    async def astore(self, question: str, answer: str, sql_queries: list):
+        """Caches `answer` for `question`, evicting the least recently used entry beyond `max_entries`."""
+        embedding = await self._aembed(question)
+        key = normalize_question(question)
+        with self._lock:
+            self._check_fingerprint()
+            self._entries.pop(key, None)
+            self._entries[key] = CachedAnswer(question, answer, sql_queries, embedding)
+            while len(self._entries) > self.max_entries:
+                least_recent = min(self._entries, key=lambda k: self._entries[k].last_used)
+                del self._entries[least_recent]
+                self.evictions += 1
+            self._matrix = None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_semantic_cache() -> SemanticAnswerCache:
+    """Returns the process-wide semantic answer cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticAnswerCache()
+    return _cache
@@ -0,0 +1,23 @@
+import os
+import logging
+
+_TRUE_VALUES = ("1", "true", "yes", "on")
+_FALSE_VALUES = ("0", "false", "no", "off")
+
+
+def env_flag(name: str, default: bool) -> bool:
+    """
+    Reads an on/off setting from the environment variable `name`.
+
+    "1", "true", "yes" and "on" turn it on and "0", "false", "no" and "off" turn it off, in any
+    letter case. An unset or empty variable gives `default`; any other value is logged and ignored.
+    """
+    value = os.environ.get(name, "").strip().lower()
+    if not value:
+        return default
+    if value in _TRUE_VALUES:
+        return True
+    if value in _FALSE_VALUES:
+        return False
+    logging.warning(f"Ignoring {name}={os.environ[name]!r}; expected one of {', '.join(_TRUE_VALUES + _FALSE_VALUES)}.")
+    return default
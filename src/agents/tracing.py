@@ -0,0 +1,218 @@
+import os
+import sys
+import json
+import time
+import uuid
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from .settings import env_flag
+
+AGENT_TRACING_ENABLED = env_flag("AGENT_TRACING_ENABLED", True)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+# One JSON object per finished span; a request's spans are appended together when it completes
+AGENT_TRACE_PATH = os.environ.get("AGENT_TRACE_PATH", os.path.join(PROJECT_ROOT, '.cache', 'agent_traces.jsonl'))
+
+_current_span = ContextVar("current_span", default=None)
+_export_lock = threading.Lock()
+
+
+class _Trace:
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.finished = []
+        self.exported = False
+        self.lock = threading.Lock()
+
+
+class Span:
+    """
+    A timed step of a request (an LLM call, a tool call, a SQL query, ...).
+
+    Spans nest through a context variable, so a span started while another is active becomes its
+    child, including in worker threads of the tool executor or asyncio.to_thread. When the
+    outermost span of a trace ends, the whole trace is appended to AGENT_TRACE_PATH.
+    """
+
+    def __init__(self, name: str, parent=None, **attributes):
+        self.name = name
+        self.trace = parent.trace if parent is not None else _Trace()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.span_id = uuid.uuid4().hex[:16]
+        self.attributes = dict(attributes)
+        self.error = None
+        self.start_time = time.time()
+        self._started = time.perf_counter()
+        self.duration_ms = None
+
+    @property
+    def is_root(self) -> bool:
+        return self.parent_id is None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, error):
+        """Marks the span as failed; `error` is an exception or a message."""
+        self.error = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+
+    def end(self, error=None):
+        if self.duration_ms is not None:
+            return
+        if error is not None:
+            self.fail(error)
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        if not AGENT_TRACING_ENABLED:
+            return
+        trace = self.trace
+        with trace.lock:
+            trace.finished.append(self)
+            # Spans that outlive their request (e.g. a cancelled prefetch) are written on their own
+            if not (self.is_root or trace.exported):
+                return
+            spans, trace.finished = trace.finished, []
+            trace.exported = True
+        _export(spans)
+        if self.is_root:
+            logging.info(f"Trace {trace.trace_id}: {describe_trace(spans)}")
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.start_time, 6),
+            "duration_ms": round(self.duration_ms, 3),
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+def current_span():
+    return _current_span.get()
+
+
+def start_span(name: str, **attributes) -> Span:
+    """Starts a child of the current span (or a new trace); the caller must call `end()`."""
+    return Span(name, parent=_current_span.get(), **attributes)
+
+
+@contextmanager
+def activate(span: Span):
+    """Makes `span` the parent of spans started inside the block."""
+    token = _current_span.set(span)
+    try:
+        yield span
+    finally:
+        _current_span.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Times the block as a span; an exception escaping the block is recorded and re-raised."""
+    active = start_span(name, **attributes)
+    token = _current_span.set(active)
+    try:
+        yield active
+    except BaseException as e:
+        active.end(error=e)
+        raise
+    finally:
+        _current_span.reset(token)
+        active.end()
+
+
+def _export(spans: list):
+    lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+    try:
+        with _export_lock:
+            os.makedirs(os.path.dirname(AGENT_TRACE_PATH), exist_ok=True)
+            with open(AGENT_TRACE_PATH, "a", encoding="utf-8") as trace_file:
+                trace_file.write(lines)
+    except OSError as e:
+        logging.warning(f"Could not write traces to {AGENT_TRACE_PATH}: {e}")
+
+
+def describe_trace(spans: list) -> str:
+    """One-line breakdown of a request: total time, then time per span name, slowest first."""
+    root = next((span for span in spans if span.is_root), None)
+    totals = {}
+    for span in spans:
+        if span.is_root:
+            continue
+        count, total = totals.get(span.name, (0, 0.0))
+        totals[span.name] = (count + 1, total + span.duration_ms)
+    parts = [f"{name} {count}x {total:.0f} ms" for name, (count, total) in sorted(totals.items(), key=lambda item: -item[1][1])]
+    head = f"{root.name} {root.duration_ms:.0f} ms" if root is not None else "partial trace"
+    return head + (f" ({', '.join(parts)})" if parts else "")
+
+
+def load_spans(path: str = AGENT_TRACE_PATH) -> list:
+    """Reads the span dicts written to a trace file; unreadable lines are skipped."""
+    spans = []
+    with open(path, encoding="utf-8") as trace_file:
+        for line in trace_file:
+            try:
+                spans.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return spans
+
+
+def _percentile(sorted_values: list, fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize_spans(spans: list) -> list:
+    """
+    Aggregates span dicts by name.
+
+    Returns:
+        list: One dict per span name (count, errors, total/p50/p95/max ms, mean LLM tokens),
+              ordered by total time, largest first.
+    """
+    groups = {}
+    for span in spans:
+        groups.setdefault(span["name"], []).append(span)
+    rows = []
+    for name, group in groups.items():
+        durations = sorted(span["duration_ms"] for span in group)
+        tokens = [span["attributes"].get("prompt_tokens", 0) + span["attributes"].get("completion_tokens", 0)
+                  for span in group if "prompt_tokens" in span["attributes"]]
+        rows.append({
+            "name": name,
+            "count": len(group),
+            "errors": sum(1 for span in group if span.get("error")),
+            "total_ms": sum(durations),
+            "p50_ms": _percentile(durations, 0.50),
+            "p95_ms": _percentile(durations, 0.95),
+            "max_ms": durations[-1],
+            "avg_tokens": sum(tokens) / len(tokens) if tokens else None,
+        })
+    rows.sort(key=lambda row: -row["total_ms"])
+    return rows
+
+
+def format_summary_table(rows: list) -> str:
+    header = f"{'span':<28} {'count':>6} {'errors':>6} {'total ms':>10} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'avg tok':>8}"
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        tokens = f"{row['avg_tokens']:.0f}" if row["avg_tokens"] is not None else "-"
+        lines.append(f"{row['name']:<28} {row['count']:>6} {row['errors']:>6} {row['total_ms']:>10.1f} "
+                     f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['max_ms']:>9.1f} {tokens:>8}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # Usage: python -m src.agents.tracing [trace_file]
+    trace_path = sys.argv[1] if len(sys.argv) > 1 else AGENT_TRACE_PATH
+    if not os.path.exists(trace_path):
+        print(f"No trace file at {trace_path}.")
+        sys.exit(1)
+    recorded = load_spans(trace_path)
+    print(f"{len(recorded)} spans from {len({span['trace_id'] for span in recorded})} traces in {trace_path}\n")
+    print(format_summary_table(summarize_spans(recorded)))
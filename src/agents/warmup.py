@@ -0,0 +1,85 @@
+import time
+import logging
+
+from .settings import env_flag
+
+# Embedding a probe string verifies the key and endpoint, at the cost of one remote call
+WARMUP_VALIDATE_EMBEDDINGS = env_flag("WARMUP_VALIDATE_EMBEDDINGS", False)
+WARMUP_COMPONENTS = ("database", "analytics_engine", "embeddings", "schema_index", "llm", "agent_runtime")
+
+
+def _warm_database():
+    from .agent_tools.sql_connection_pool import get_connection_pool
+    with get_connection_pool().connection() as conn:
+        conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+
+
+def _warm_analytics_engine():
+    # Opens DuckDB (starting its snapshot build in the background) when some queries would run on it
+    from .agent_tools.sql_connection_pool import get_connection_pool
+    from .agent_tools.sql_engine import DUCKDB_MIN_SCAN_ROWS, SQL_ENGINE, get_duckdb_engine, table_statistics
+    pool = get_connection_pool()
+    engine = get_duckdb_engine(pool.database_path) if SQL_ENGINE != "sqlite" else None
+    if engine is None:
+        return
+    with pool.connection() as conn:
+        row_counts, _ = table_statistics(conn)
+    if SQL_ENGINE == "duckdb" or max(row_counts.values(), default=0) >= DUCKDB_MIN_SCAN_ROWS:
+        engine.prepare()
+
+
+def _warm_embeddings(validate: bool):
+    from .agent_tools.schema_retriever_tool import get_embed_model
+    if get_embed_model(validate=validate) is None:
+        raise RuntimeError("embedding model could not be initialized")
+
+
+def _warm_schema_index():
+    from .agent_tools.schema_retriever_tool import get_schema_retriever_engine
+    get_schema_retriever_engine().warmup()
+
+
+def _warm_llm():
+    from .agent_models.models import get_finetuned_model
+    get_finetuned_model()
+
+
+def _warm_agent_runtime():
+    from llama_index.core.agent import ReActAgent  # noqa: F401
+
+
+def warmup(components=WARMUP_COMPONENTS, validate_embeddings: bool = WARMUP_VALIDATE_EMBEDDINGS) -> dict:
+    """
+    Does the deferred initialization ahead of the first question.
+
+    Clients, heavy imports and indexes are otherwise created on first use. Call this from a
+    background thread once the database and indexes exist. Failures are logged, not raised, so a
+    missing network or key shows up on the first question rather than stopping the app.
+
+    Args:
+        components: Which of WARMUP_COMPONENTS to initialize, in order.
+        validate_embeddings (bool): Also make one embedding call to verify the key and endpoint.
+
+    Returns:
+        dict: Seconds spent per component (None for components that failed).
+    """
+    steps = {
+        "database": _warm_database,
+        "analytics_engine": _warm_analytics_engine,
+        "embeddings": lambda: _warm_embeddings(validate_embeddings),
+        "schema_index": _warm_schema_index,
+        "llm": _warm_llm,
+        "agent_runtime": _warm_agent_runtime,
+    }
+    timings = {}
+    for component in components:
+        started = time.perf_counter()
+        try:
+            steps[component]()
+            timings[component] = time.perf_counter() - started
+        except Exception as e:
+            timings[component] = None
+            logging.warning(f"Warmup of '{component}' failed: {type(e).__name__}: {e}")
+    summary = ", ".join(f"{name} {'failed' if seconds is None else f'{seconds * 1000:.0f} ms'}" for name, seconds in timings.items())
+    logging.info(f"Warmup finished: {summary}.")
+    return timings
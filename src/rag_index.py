@@ -1,64 +1,98 @@
 from dotenv import load_dotenv
 load_dotenv() 
 import os
-import chromadb
+import sys
+import json
+import time
+import hashlib
+import random
+import asyncio
 import re
 import logging 
-from sqlalchemy import create_engine
-from uuid import uuid4 
-from llama_index.core import SimpleDirectoryReader, VectorStoreIndex, Settings
-from llama_index.vector_stores.chroma import ChromaVectorStore
-from llama_index.embeddings.nebius import NebiusEmbedding
-from llama_index.core import SQLDatabase
-from llama_index.core.schema import TextNode 
+from tqdm import tqdm
+
+# Make the project root importable when this file is run as a script (python src/rag_index.py)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+# Heavy dependencies (LlamaIndex, ChromaDB, SQLAlchemy, the Nebius client) are imported where they are used,
+# so importing this module for its configuration (as the startup manager does) stays cheap
+from src.agents.agent_tools.numpy_vector_store import VECTOR_STORE_BACKEND, NumpyVectorStore, EMBEDDINGS_FILE
 
 # Configure logging
 logging.basicConfig(level=logging.INFO) 
 
 # --- Configuration ---
-DATABASE_PATH = os.path.join('data', 'sales_database.db')
+# Paths are anchored at the project root so the build can also run in-process from app.py
+DATABASE_PATH = os.path.join(PROJECT_ROOT, 'data', 'sales_database.db')
 
 # CORRECTED PATHS based on your clarification:
 # schema is under knowledge_base
-SCHEMA_DIR = os.path.join('knowledge_base', 'schema') 
+SCHEMA_DIR = os.path.join(PROJECT_ROOT, 'knowledge_base', 'schema') 
 DATA_DICTIONARY_PATH = os.path.join(SCHEMA_DIR, 'data_dictionary.md') 
 SALES_SCHEMA_SQL_PATH = os.path.join(SCHEMA_DIR, 'sales_schema.sql') 
 
 # kpi_definitions.md is under business_glossary
-KPI_DEFINITIONS_PATH = os.path.join('knowledge_base', 'business_glossary', 'kpi_definitions.md') 
+KPI_DEFINITIONS_PATH = os.path.join(PROJECT_ROOT, 'knowledge_base', 'business_glossary', 'kpi_definitions.md') 
+
+# Tables maintained for query routing only; the model should write SQL against the base tables
+INTERNAL_TABLES = {'sales_daily_rollup'}
+
+CHROMA_DB_SCHEMA_PATH = os.path.join(PROJECT_ROOT, 'chroma_db_schema') 
+CHROMA_DB_KPI_PATH = os.path.join(PROJECT_ROOT, 'chroma_db_kpi') 
+
+# Used instead of ChromaDB when VECTOR_STORE_BACKEND=numpy
+NUMPY_INDEX_SCHEMA_PATH = os.path.join(PROJECT_ROOT, 'numpy_index_schema')
+NUMPY_INDEX_KPI_PATH = os.path.join(PROJECT_ROOT, 'numpy_index_kpi')
+
+# Records the node ids and content hashes of the last build, inside each index directory
+INDEX_MANIFEST_FILE = 'index_manifest.json'
+
+EMBED_MODEL_NAME = "BAAI/bge-en-icl" # Consistent with schema_retriever_tool for now
+EMBED_API_BASE = "https://api.studio.nebius.com/v1/" # Verify this base URL is correct for the model
 
-CHROMA_DB_SCHEMA_PATH = os.path.join('.', 'chroma_db_schema') 
-CHROMA_DB_KPI_PATH = os.path.join('.', 'chroma_db_kpi') 
+# Embedding throughput settings
+EMBED_BATCH_SIZE = int(os.environ.get("RAG_EMBED_BATCH_SIZE", "32")) # Texts per embedding request
+EMBED_MAX_CONCURRENCY = int(os.environ.get("RAG_EMBED_MAX_CONCURRENCY", "4")) # Requests in flight
+EMBED_MAX_RETRIES = int(os.environ.get("RAG_EMBED_MAX_RETRIES", "4")) # Retries per failed batch
+EMBED_RETRY_BASE_DELAY = float(os.environ.get("RAG_EMBED_RETRY_BASE_DELAY", "1.0")) # Seconds, doubled per retry
 
-# Ensure NEBIUS_API_KEY is set
-if "NEBIUS_API_KEY" not in os.environ:
-    logging.critical("NEBIUS_API_KEY environment variable not set. Please set it before running this script.")
-    raise ValueError("NEBIUS_API_KEY environment variable not set. Please set it before running this script.")
+embed_model = None
 
 # --- Initialize Nebius AI Embedding Model (Global for consistency) ---
-print("\n--- Initializing Nebius AI Embedding Model ---")
-try:
-    embed_model = NebiusEmbedding(
-        api_key=os.environ["NEBIUS_API_KEY"], 
-        model_name="BAAI/bge-en-icl", # Consistent with schema_retriever_tool for now
-        api_base="https://api.studio.nebius.com/v1/" # Verify this base URL is correct for the model
-    )
-    test_string = "This is a test string to generate an embedding for diagnostic purposes."
-    test_embedding = embed_model.get_text_embedding(test_string)
-    
-    if test_embedding is None or not isinstance(test_embedding, list) or not all(isinstance(x, (int, float)) for x in test_embedding):
-        logging.critical(f"FATAL ERROR: NebiusEmbedding returned invalid output for test string. Type: {type(test_embedding)}, Value: {test_embedding[:10] if isinstance(test_embedding, list) else test_embedding}")
-        raise ValueError("NebiusEmbedding test failed: returned invalid embedding. Cannot proceed with RAG index creation.")
-    
-    logging.info(f"Nebius AI Embedding Model initialized and tested successfully. Embedding length: {len(test_embedding)}")
-
-except Exception as e:
-    logging.critical(f"UNRECOVERABLE ERROR during Nebius AI Embedding Model initialization or testing: {e}")
-    print(f"\n!!!! UNRECOVERABLE ERROR: {e} !!!!") 
-    print("Please check your NEBIUS_API_KEY, model_name, and api_base configuration carefully.")
-    raise 
-
-print("--- Nebius AI Embedding Model setup complete. Proceeding to Knowledge Base setup. ---")
+def init_embed_model():
+    """Creates the shared embedding model on first use and returns it."""
+    global embed_model
+    if embed_model is not None:
+        return embed_model
+
+    # Ensure NEBIUS_API_KEY is set
+    if "NEBIUS_API_KEY" not in os.environ:
+        logging.critical("NEBIUS_API_KEY environment variable not set. Please set it before running this script.")
+        raise ValueError("NEBIUS_API_KEY environment variable not set. Please set it before running this script.")
+
+    print("\n--- Initializing Nebius AI Embedding Model ---")
+    try:
+        from llama_index.embeddings.nebius import NebiusEmbedding
+        from src.agents.agent_tools.embedding_cache import with_embedding_cache
+        # Cached wrapper: unchanged tables and KPI documents are not re-embedded on every indexing run
+        embed_model = with_embedding_cache(NebiusEmbedding(
+            api_key=os.environ["NEBIUS_API_KEY"], 
+            model_name=EMBED_MODEL_NAME,
+            api_base=EMBED_API_BASE,
+            embed_batch_size=EMBED_BATCH_SIZE
+        ))
+        # The model is validated on its first real batch (see embed_texts) rather than with an extra diagnostic call
+        logging.info("Nebius AI Embedding Model initialized.")
+
+    except Exception as e:
+        logging.critical(f"UNRECOVERABLE ERROR during Nebius AI Embedding Model initialization or testing: {e}")
+        print(f"\n!!!! UNRECOVERABLE ERROR: {e} !!!!") 
+        print("Please check your NEBIUS_API_KEY, model_name, and api_base configuration carefully.")
+        raise 
+
+    print("--- Nebius AI Embedding Model setup complete. Proceeding to Knowledge Base setup. ---")
+    return embed_model
 
 # --- Helper Function to parse Data Dictionary ---
 def parse_data_dictionary_md(md_path: str) -> dict:
@@ -80,101 +114,300 @@ def parse_data_dictionary_md(md_path: str) -> dict:
 
     return table_descriptions
 
-# --- Setup for Schema Retriever Agent's Knowledge Base ---
-print("\n--- Setting up Schema Retriever Agent's Knowledge Base (chroma_db_schema) ---")
-try:
-    data_dict_descriptions = parse_data_dictionary_md(DATA_DICTIONARY_PATH)
-    logging.info(f"Loaded descriptions for {len(data_dict_descriptions)} tables from data_dictionary.md")
-
-    engine = create_engine(f"sqlite:///{DATABASE_PATH}")
-    sql_database = SQLDatabase(engine)
-    logging.info(f"Connected to database: {DATABASE_PATH}")
-
-    all_table_names = sql_database.get_usable_table_names()
-    
-    schema_nodes = [] 
-    if not all_table_names:
-        logging.warning("WARNING: No tables found in the database. Schema KB will be empty.")
-    
-    for table_name in all_table_names:
-        ddl = sql_database.get_single_table_info(table_name)
-        human_description = data_dict_descriptions.get(table_name, "No specific description available for this table.")
-        
-        combined_context = f"Table Name: {table_name}\n" \
-                           f"Description: {human_description}\n" \
-                           f"Table Schema (DDL):\n{ddl if ddl else ''}"
-        
-        node_embedding = embed_model.get_text_embedding(combined_context)
-        if node_embedding is None:
-            raise ValueError(f"Failed to generate embedding for schema table: {table_name}")
-
-        # Adding a simple metadata dictionary
-        schema_nodes.append(TextNode(text=combined_context, embedding=node_embedding, id_=table_name, metadata={"table_name": table_name, "source": "data_dictionary"})) 
-        
-    chroma_client_schema = chromadb.PersistentClient(path=CHROMA_DB_SCHEMA_PATH)
-    chroma_collection_schema = chroma_client_schema.get_or_create_collection(name="schema_kb")
-
-    if chroma_collection_schema.count() > 0:
-        logging.info(f"Clearing {chroma_collection_schema.count()} existing items from schema_kb before re-indexing.")
-        chroma_collection_schema.delete(ids=[id_ for id_ in chroma_collection_schema.get()['ids']])
-
-
-    logging.info(f"Adding {len(schema_nodes)} schema nodes to ChromaDB directly...")
-    if schema_nodes:
-        chroma_collection_schema.add(
-            documents=[node.text for node in schema_nodes],
-            embeddings=[node.embedding for node in schema_nodes],
+# --- Helper Function to split the KPI glossary into one entry per definition ---
+def parse_kpi_definitions_md(md_path: str) -> list:
+    """
+    Returns (section, title, text) for every `### ` entry of the glossary, where `section` is the
+    enclosing `## ` heading and `text` is the entry with its heading. The KPI retriever returns a
+    single node per question, so each definition has to be a node of its own.
+    """
+    with open(md_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    entries = []
+    section = ""
+    for block in re.split(r'^(?=#{2,3} )', content, flags=re.MULTILINE):
+        if block.startswith('## '):
+            section = block.splitlines()[0][3:].strip()
+        elif block.startswith('### '):
+            title = block.splitlines()[0][4:].strip()
+            # Drop the horizontal rules that separate the sections
+            text = re.sub(r'^-{3,}\s*$', '', block, flags=re.MULTILINE).strip()
+            entries.append((section, title, text))
+            logging.info(f"Parsed KPI definition: {title} ({section})")
+    return entries
+
+# --- Helper Functions to embed texts in concurrent batches ---
+def _validate_embeddings(vectors: list, expected: int):
+    if vectors is None or len(vectors) != expected:
+        raise ValueError(f"NebiusEmbedding returned {0 if vectors is None else len(vectors)} embeddings for {expected} texts.")
+    for vector in vectors:
+        if not isinstance(vector, list) or not vector or not all(isinstance(x, (int, float)) for x in vector):
+            logging.critical(f"FATAL ERROR: NebiusEmbedding returned invalid output. Type: {type(vector)}, Value: {vector[:10] if isinstance(vector, list) else vector}")
+            raise ValueError("NebiusEmbedding returned an invalid embedding. Cannot proceed with RAG index creation.")
+
+async def _embed_texts_async(texts: list, batch_size: int, max_concurrency: int) -> list:
+    batches = [texts[start:start + batch_size] for start in range(0, len(texts), batch_size)]
+    model = init_embed_model()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    progress = tqdm(total=len(texts), desc="Embedding", unit="text")
+
+    async def embed_batch(batch_number: int, batch: list) -> list:
+        async with semaphore:
+            for attempt in range(EMBED_MAX_RETRIES + 1):
+                try:
+                    vectors = await model.aget_text_embedding_batch(batch)
+                    _validate_embeddings(vectors, len(batch))
+                    progress.update(len(batch))
+                    return vectors
+                except Exception as e:
+                    if attempt == EMBED_MAX_RETRIES:
+                        raise
+                    # Exponential backoff with jitter so concurrent batches don't retry in lockstep
+                    delay = EMBED_RETRY_BASE_DELAY * (2 ** attempt) * (1 + random.random() / 2)
+                    logging.warning(f"Embedding batch {batch_number} failed ({e}); retrying in {delay:.1f}s "
+                                    f"(attempt {attempt + 1}/{EMBED_MAX_RETRIES}).")
+                    await asyncio.sleep(delay)
+
+    try:
+        results = await asyncio.gather(*(embed_batch(i, batch) for i, batch in enumerate(batches)))
+    finally:
+        progress.close()
+    return [vector for batch_vectors in results for vector in batch_vectors]
+
+def embed_texts(texts: list, batch_size: int = EMBED_BATCH_SIZE, max_concurrency: int = EMBED_MAX_CONCURRENCY) -> list:
+    """Embeds `texts` in batches with bounded concurrency and retries, preserving order."""
+    if not texts:
+        return []
+    started = time.perf_counter()
+    vectors = asyncio.run(_embed_texts_async(texts, batch_size, max_concurrency))
+    elapsed = time.perf_counter() - started
+    num_batches = (len(texts) + batch_size - 1) // batch_size
+    logging.info(f"Embedded {len(texts)} texts in {num_batches} batches in {elapsed:.2f}s "
+                 f"({len(texts) / elapsed if elapsed > 0 else float('inf'):.1f} texts/s, "
+                 f"concurrency {max_concurrency}, dimension {len(vectors[0])}).")
+    return vectors
+
+# --- Helper Functions for incremental indexing ---
+def content_hash(node) -> str:
+    """Hash of everything that determines a node's stored vector and payload, including the embedding model."""
+    metadata = {key: value for key, value in node.metadata.items() if key != "content_hash"}
+    payload = f"{EMBED_MODEL_NAME}\0{node.text}\0{json.dumps(metadata, sort_keys=True)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def read_manifest(index_path: str) -> dict:
+    try:
+        with open(os.path.join(index_path, INDEX_MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_manifest(index_path: str, collection_name: str, hashes: dict, dimension: int):
+    manifest = {
+        "collection": collection_name,
+        "backend": VECTOR_STORE_BACKEND,
+        "model_name": EMBED_MODEL_NAME,
+        "dimension": dimension,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "nodes": hashes,
+    }
+    manifest_path = os.path.join(index_path, INDEX_MANIFEST_FILE)
+    with open(manifest_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+def _stored_shape(index_path: str, collection_name: str) -> tuple:
+    """(item count, embedding dimension) of the configured store; (0, None) if it is missing or unreadable."""
+    store_file = EMBEDDINGS_FILE if VECTOR_STORE_BACKEND == "numpy" else 'chroma.sqlite3'
+    if not os.path.exists(os.path.join(index_path, store_file)):
+        return 0, None
+    if VECTOR_STORE_BACKEND == "numpy":
+        try:
+            store = NumpyVectorStore.load(index_path)
+        except (OSError, ValueError, KeyError):
+            return 0, None
+        return len(store), int(store.embeddings.shape[1])
+    import chromadb
+    try:
+        collection = chromadb.PersistentClient(path=index_path).get_collection(collection_name)
+        sample = collection.get(limit=1, include=["embeddings"])["embeddings"]
+        return collection.count(), (len(sample[0]) if sample is not None and len(sample) else None)
+    except Exception as e:
+        logging.warning(f"Could not read ChromaDB collection {collection_name} in {index_path}: {e}")
+        return 0, None
+
+def store_matches_manifest(index_path: str, manifest: dict = None) -> bool:
+    """Whether the store in `index_path` holds as many vectors, of the same dimension, as its manifest records."""
+    manifest = read_manifest(index_path) if manifest is None else manifest
+    count, dimension = _stored_shape(index_path, manifest.get("collection"))
+    return dimension is not None and dimension == manifest.get("dimension") and count == len(manifest.get("nodes") or {})
+
+def _sync_numpy(nodes: list, numpy_path: str, reset: bool = False) -> tuple:
+    try:
+        if reset:
+            raise ValueError("stored vectors are not reusable")
+        existing = NumpyVectorStore.load(numpy_path, mmap=False)
+        stored = {id_: (row, (existing.metadatas[row] or {}).get("content_hash")) for row, id_ in enumerate(existing.ids)}
+    except (OSError, ValueError, KeyError):
+        existing, stored = None, {}
+
+    changed = [node for node in nodes if stored.get(node.id_, (None, None))[1] != node.metadata["content_hash"]]
+    stale = [id_ for id_ in stored if id_ not in {node.id_ for node in nodes}]
+    if not changed and not stale and existing is not None and existing.ids == [node.id_ for node in nodes]:
+        return changed, stale
+
+    new_embeddings = dict(zip((node.id_ for node in changed), embed_texts([node.text for node in changed])))
+    # Unchanged vectors are reused from the previous build (they are already normalized)
+    embeddings = [new_embeddings[node.id_] if node.id_ in new_embeddings else existing.embeddings[stored[node.id_][0]]
+                  for node in nodes]
+    NumpyVectorStore.from_embeddings(
+        ids=[node.id_ for node in nodes],
+        texts=[node.text for node in nodes],
+        embeddings=embeddings,
+        metadatas=[node.metadata for node in nodes],
+    ).persist(numpy_path)
+    return changed, stale
+
+def _sync_chroma(nodes: list, collection_name: str, chroma_path: str, reset: bool = False) -> tuple:
+    import chromadb
+    chroma_client = chromadb.PersistentClient(path=chroma_path)
+    if reset:
+        logging.info(f"Recreating ChromaDB collection {collection_name}; its stored vectors are not reusable.")
+        chroma_client.delete_collection(name=collection_name)
+    chroma_collection = chroma_client.get_or_create_collection(name=collection_name)
+
+    existing = chroma_collection.get(include=["metadatas"])
+    stored = {id_: (metadata or {}).get("content_hash") for id_, metadata in zip(existing['ids'], existing['metadatas'])}
+    changed = [node for node in nodes if stored.get(node.id_) != node.metadata["content_hash"]]
+    stale = [id_ for id_ in stored if id_ not in {node.id_ for node in nodes}]
+
+    if stale:
+        logging.info(f"Deleting {len(stale)} stale items from {collection_name}.")
+        chroma_collection.delete(ids=stale)
+    if changed:
+        logging.info(f"Upserting {len(changed)} new or changed nodes into ChromaDB collection {collection_name}...")
+        chroma_collection.upsert(
+            documents=[node.text for node in changed],
+            embeddings=embed_texts([node.text for node in changed]),
             # Pass non-empty metadata dict for each node
-            metadatas=[node.metadata for node in schema_nodes], 
-            ids=[node.id_ for node in schema_nodes]
+            metadatas=[node.metadata for node in changed],
+            ids=[node.id_ for node in changed]
         )
-    logging.info(f"Schema knowledge base indexed and persisted to {CHROMA_DB_SCHEMA_PATH}")
-except Exception as e:
-    logging.exception("Error setting up Schema KB:") 
-    print(f"Error setting up Schema KB: {e}") 
-    print("Please ensure your database is created and accessible and data_dictionary.md is correctly formatted.")
-    print("If the error persists, there might be a deeper compatibility issue. See above for more detailed embedding checks.")
-    raise 
+    return changed, stale
+
+# --- Helper Function to bring the configured vector store in line with the given nodes ---
+def sync_nodes(nodes: list, collection_name: str, chroma_path: str, numpy_path: str) -> str:
+    """
+    Incrementally indexes `nodes` (TextNodes without embeddings, with stable ids).
+
+    Each node gets a content hash in its metadata. Only nodes whose hash is not already in the store
+    are embedded and upserted, and stored nodes whose id is no longer present are deleted. Nothing is
+    embedded or written when the manifest of the last build lists exactly these hashes and the store
+    still holds that many vectors of the recorded dimension. A store whose dimension differs from the
+    manifest's was not written by that build, so it is rebuilt from scratch.
+    """
+    started = time.perf_counter()
+    index_path = numpy_path if VECTOR_STORE_BACKEND == "numpy" else chroma_path
+    for node in nodes:
+        node.metadata["content_hash"] = content_hash(node)
+    hashes = {node.id_: node.metadata["content_hash"] for node in nodes}
+
+    manifest = read_manifest(index_path)
+    if (manifest.get("nodes") == hashes and manifest.get("collection") == collection_name
+            and manifest.get("backend") == VECTOR_STORE_BACKEND and manifest.get("model_name") == EMBED_MODEL_NAME
+            and store_matches_manifest(index_path, manifest)):
+        logging.info(f"{collection_name} is up to date ({len(nodes)} nodes); "
+                     f"checked in {(time.perf_counter() - started) * 1000:.1f} ms.")
+        return index_path
+
+    dimension = _stored_shape(index_path, collection_name)[1]
+    reset = dimension is not None and manifest.get("dimension") not in (None, dimension)
+    if VECTOR_STORE_BACKEND == "numpy":
+        changed, stale = _sync_numpy(nodes, numpy_path, reset)
+    else:
+        changed, stale = _sync_chroma(nodes, collection_name, chroma_path, reset)
+    write_manifest(index_path, collection_name, hashes, _stored_shape(index_path, collection_name)[1])
+    logging.info(f"{collection_name}: {len(changed)} nodes embedded, {len(stale)} deleted, "
+                 f"{len(nodes) - len(changed)} unchanged in {time.perf_counter() - started:.2f}s.")
+    return index_path
+
+# --- Setup for Schema Retriever Agent's Knowledge Base ---
+def build_schema_kb() -> str:
+    from sqlalchemy import create_engine
+    from llama_index.core import SQLDatabase
+    from llama_index.core.schema import TextNode
+    print("\n--- Setting up Schema Retriever Agent's Knowledge Base (chroma_db_schema) ---")
+    try:
+        data_dict_descriptions = parse_data_dictionary_md(DATA_DICTIONARY_PATH)
+        logging.info(f"Loaded descriptions for {len(data_dict_descriptions)} tables from data_dictionary.md")
 
+        engine = create_engine(f"sqlite:///{DATABASE_PATH}")
+        sql_database = SQLDatabase(engine)
+        logging.info(f"Connected to database: {DATABASE_PATH}")
+
+        all_table_names = [name for name in sql_database.get_usable_table_names() if name not in INTERNAL_TABLES]
+
+        if not all_table_names:
+            logging.warning("WARNING: No tables found in the database. Schema KB will be empty.")
+
+        schema_nodes = []
+        for table_name in all_table_names:
+            ddl = sql_database.get_single_table_info(table_name)
+            human_description = data_dict_descriptions.get(table_name, "No specific description available for this table.")
+
+            combined_context = f"Table Name: {table_name}\n" \
+                               f"Description: {human_description}\n" \
+                               f"Table Schema (DDL):\n{ddl if ddl else ''}"
+            # Adding a simple metadata dictionary
+            schema_nodes.append(TextNode(text=combined_context, id_=table_name, metadata={"table_name": table_name, "source": "data_dictionary"}))
+
+        # Only new or changed tables are embedded, in one batched, concurrent pass
+        schema_index_path = sync_nodes(schema_nodes, "schema_kb", CHROMA_DB_SCHEMA_PATH, NUMPY_INDEX_SCHEMA_PATH)
+        logging.info(f"Schema knowledge base indexed and persisted to {schema_index_path}")
+    except Exception as e:
+        logging.exception("Error setting up Schema KB:") 
+        print(f"Error setting up Schema KB: {e}") 
+        print("Please ensure your database is created and accessible and data_dictionary.md is correctly formatted.")
+        print("If the error persists, there might be a deeper compatibility issue. See above for more detailed embedding checks.")
+        raise 
+
+    return schema_index_path
 
 # --- Setup for KPI Answering Agent's Knowledge Base (kpi_definitions.md) ---
-print("\n--- Setting up KPI Answering Agent's Knowledge Base (chroma_db_kpi) ---")
-try:
-    kpi_docs = SimpleDirectoryReader(input_files=[KPI_DEFINITIONS_PATH]).load_data()
-    logging.info(f"Loaded {len(kpi_docs)} documents for KPI Agent.")
-
-    kpi_nodes = []
-    for doc in kpi_docs:
-        node_embedding = embed_model.get_text_embedding(doc.get_content())
-        if node_embedding is None:
-            raise ValueError(f"Failed to generate embedding for KPI document: {doc.id_}")
-        # Adding a simple metadata dictionary
-        kpi_nodes.append(TextNode(text=doc.get_content(), embedding=node_embedding, id_=str(uuid4()), metadata={"source_file": os.path.basename(KPI_DEFINITIONS_PATH), "doc_type": "kpi_definition"}))
-    
-    chroma_client_kpi = chromadb.PersistentClient(path=CHROMA_DB_KPI_PATH)
-    chroma_collection_kpi = chroma_client_kpi.get_or_create_collection(name="kpi_kb")
-
-    if chroma_collection_kpi.count() > 0:
-        logging.info(f"Clearing {chroma_collection_kpi.count()} existing items from kpi_kb before re-indexing.")
-        chroma_collection_kpi.delete(ids=[id_ for id_ in chroma_collection_kpi.get()['ids']])
-
-    logging.info(f"Adding {len(kpi_nodes)} KPI nodes to ChromaDB directly...")
-    if kpi_nodes:
-        chroma_collection_kpi.add(
-            documents=[node.text for node in kpi_nodes],
-            embeddings=[node.embedding for node in kpi_nodes],
-            # Pass non-empty metadata dict for each node
-            metadatas=[node.metadata for node in kpi_nodes], 
-            ids=[node.id_ for node in kpi_nodes]
-        )
-    logging.info(f"KPI knowledge base indexed and persisted to {CHROMA_DB_KPI_PATH}")
-except Exception as e:
-    logging.exception("Error setting up KPI KB:") 
-    print(f"Error setting up KPI KB: {e}") 
-    print("Please ensure your 'kpi_definitions.md' file exists and contains valid text content.")
-    print("If the error persists, there might be a deeper compatibility issue. See above for more detailed embedding checks.")
-    raise 
+def build_kpi_kb() -> str:
+    from llama_index.core.schema import TextNode
+    print("\n--- Setting up KPI Answering Agent's Knowledge Base (chroma_db_kpi) ---")
+    try:
+        kpi_entries = parse_kpi_definitions_md(KPI_DEFINITIONS_PATH)
+        if not kpi_entries:
+            raise ValueError(f"No '### ' definitions found in {KPI_DEFINITIONS_PATH}.")
+        logging.info(f"Loaded {len(kpi_entries)} definitions for KPI Agent.")
+
+        # Ids are stable across runs (file name and heading) so unchanged definitions are recognized
+        kpi_source_file = os.path.basename(KPI_DEFINITIONS_PATH)
+        kpi_nodes = [
+            TextNode(text=text, id_=f"{kpi_source_file}#{title}",
+                     metadata={"source_file": kpi_source_file, "doc_type": "kpi_definition", "section": section, "term": title})
+            for section, title, text in kpi_entries
+        ]
+
+        kpi_index_path = sync_nodes(kpi_nodes, "kpi_kb", CHROMA_DB_KPI_PATH, NUMPY_INDEX_KPI_PATH)
+        logging.info(f"KPI knowledge base indexed and persisted to {kpi_index_path}")
+    except Exception as e:
+        logging.exception("Error setting up KPI KB:") 
+        print(f"Error setting up KPI KB: {e}") 
+        print("Please ensure your 'kpi_definitions.md' file exists and contains valid text content.")
+        print("If the error persists, there might be a deeper compatibility issue. See above for more detailed embedding checks.")
+        raise 
+
+    return kpi_index_path
 
+def main():
+    schema_index_path = build_schema_kb()
+    kpi_index_path = build_kpi_kb()
+    print("\nKnowledge base setup complete for RAG agents!")
+    print(f"Indices are saved in '{schema_index_path}' and '{kpi_index_path}' directories.")
+    return schema_index_path, kpi_index_path
 
-print("\nKnowledge base setup complete for RAG agents!")
-print(f"Indices are saved in '{CHROMA_DB_SCHEMA_PATH}' and '{CHROMA_DB_KPI_PATH}' directories.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
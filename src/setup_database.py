@@ -1,13 +1,88 @@
 import sqlite3
 import os
-import pandas as pd
-from datetime import datetime, timedelta
-import random
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+import numpy as np
 from tqdm import tqdm
 
 DATABASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
 DATABASE_PATH = os.path.join(DATABASE_DIR, 'sales_database.db')
 
+# --- Sales Data Generation Configuration ---
+BASE_SALES_RECORDS = 15000 # Number of sales rows at scale factor 1
+DEFAULT_SEED = 42
+PARTITION_SIZE = 250000 # Rows generated per worker task (and committed per transaction)
+INSERT_CHUNK_SIZE = 50000 # Rows per executemany call
+
+# Ensure a good chunk of sales are recent
+RECENT_SALES_PERIOD_DAYS = 60 # Sales within last 2 months
+LONG_TERM_SALES_PERIOD_DAYS = 730 # Sales within last 2 years
+RECENT_SALES_PROPORTION = 0.3 # 30% of sales in the last 2 months
+
+REGIONS_DATA = [
+    (1, 'North'),
+    (2, 'South'),
+    (3, 'East'),
+    (4, 'West'),
+    (5, 'Central') # Added a new region
+]
+
+# More variety, including sub-categories implicitly via name
+PRODUCTS_DATA = [
+    (101, 'Laptop Basic', 'Electronics', 800.00),
+    (102, 'Laptop Pro', 'Electronics', 1500.00),
+    (103, 'Smartphone X', 'Electronics', 700.00),
+    (104, 'Smartwatch', 'Electronics', 250.00),
+    (105, 'Headphones Noise-Cancelling', 'Electronics', 180.00),
+    (201, 'Office Desk Standard', 'Furniture', 200.00),
+    (202, 'Ergonomic Chair', 'Furniture', 350.00),
+    (203, 'Bookshelf Small', 'Furniture', 80.00),
+    (301, 'Notebook A4', 'Stationery', 12.00),
+    (302, 'Premium Pen Set', 'Stationery', 30.00),
+    (303, 'Art Supplies Kit', 'Stationery', 45.00),
+    (401, 'Running Shoes', 'Apparel', 110.00), # New Category
+    (402, 'T-Shirt Cotton', 'Apparel', 25.00),
+]
+
+CUSTOMER_NAMES = [
+    'Alice Smith', 'Bob Johnson', 'Charlie Brown', 'Diana Prince', 'Eve Adams', 
+    'Frank White', 'Grace Lee', 'Henry Green', 'Ivy Chen', 'Jack Taylor',
+    'Karen Black', 'Liam Davis', 'Mia Wilson', 'Noah Martinez', 'Olivia Garcia',
+    'Peter Rodriguez', 'Quinn Miller', 'Rachel Jones', 'Sam Hernandez', 'Tina Clark'
+] # 20 customers
+
+# North region (ID 1) slightly more customers
+CUSTOMER_REGION_CHOICES = [1, 1, 2, 3, 4, 5]
+
+# Define some regional biases (e.g., North sells more)
+REGION_WEIGHTS = {1: 0.30, 2: 0.25, 3: 0.20, 4: 0.15, 5: 0.10}
+
+# Define some category biases (e.g., Electronics sells more)
+CATEGORY_WEIGHTS = {'Electronics': 0.40, 'Furniture': 0.30, 'Stationery': 0.20, 'Apparel': 0.10}
+
+# Secondary indexes on the sales fact table. The composite ones cover the date-filtered
+# aggregations in the example questions, so those queries never touch the table itself.
+SALES_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_sales_sale_date_region ON sales (sale_date, region_id, customer_id, amount)",
+    "CREATE INDEX IF NOT EXISTS idx_sales_sale_date_product ON sales (sale_date, product_id, quantity, amount)",
+    "CREATE INDEX IF NOT EXISTS idx_sales_product ON sales (product_id, quantity, amount)",
+    "CREATE INDEX IF NOT EXISTS idx_sales_customer ON sales (customer_id, sale_date, amount)",
+    "CREATE INDEX IF NOT EXISTS idx_sales_region ON sales (region_id, customer_id, amount)",
+    "CREATE INDEX IF NOT EXISTS idx_customers_region ON customers (region_id)",
+]
+
+# Daily x product x region rollup of the sales fact table. It is rebuilt after bulk loads and
+# kept current by triggers for any sales inserted, updated or deleted afterwards.
+ROLLUP_TABLE = "sales_daily_rollup"
+ROLLUP_TRIGGERS = ["trg_sales_rollup_insert", "trg_sales_rollup_delete", "trg_sales_rollup_update"]
+
+# Simulate some seasonality (e.g., more sales towards end of year): month -> (low, high) factor range
+SEASONAL_FACTOR_RANGES = {11: (1.1, 1.3), 12: (1.1, 1.3), 1: (0.8, 1.0), 2: (0.8, 1.0)}
+DEFAULT_SEASONAL_FACTOR_RANGE = (0.9, 1.1)
+
 def create_database():
     """Creates the SQLite database file if it doesn't exist."""
     os.makedirs(DATABASE_DIR, exist_ok=True)
@@ -72,165 +147,303 @@ def create_tables(conn):
     conn.commit()
     print("Tables created successfully.")
 
-def insert_dummy_data(conn):
-    """Inserts sample data into the tables."""
+def create_indexes(conn):
+    """Creates the secondary indexes and refreshes the planner statistics with ANALYZE."""
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    for statement in tqdm(SALES_INDEXES, desc="Creating Indexes"):
+        cursor.execute(statement)
+    cursor.execute("ANALYZE")
+    conn.commit()
+    print(f"Created {len(SALES_INDEXES)} indexes and analyzed tables in {time.perf_counter() - started:.1f}s.")
+
+def create_rollup_tables(conn):
+    """Creates the sales rollup table and the triggers that maintain it incrementally."""
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+            sale_date TEXT NOT NULL, -- Stored as YYYY-MM-DD
+            product_id INTEGER NOT NULL,
+            region_id INTEGER NOT NULL,
+            total_quantity INTEGER NOT NULL,
+            total_amount REAL NOT NULL,
+            sale_count INTEGER NOT NULL,
+            PRIMARY KEY (sale_date, product_id, region_id)
+        ) WITHOUT ROWID;
+    ''')
+
+    add_sale = f'''
+        INSERT INTO {ROLLUP_TABLE} (sale_date, product_id, region_id, total_quantity, total_amount, sale_count)
+        VALUES (NEW.sale_date, NEW.product_id, NEW.region_id, NEW.quantity, NEW.amount, 1)
+        ON CONFLICT (sale_date, product_id, region_id) DO UPDATE SET
+            total_quantity = total_quantity + excluded.total_quantity,
+            total_amount = total_amount + excluded.total_amount,
+            sale_count = sale_count + 1;
+    '''
+    remove_sale = f'''
+        UPDATE {ROLLUP_TABLE} SET
+            total_quantity = total_quantity - OLD.quantity,
+            total_amount = total_amount - OLD.amount,
+            sale_count = sale_count - 1
+        WHERE sale_date = OLD.sale_date AND product_id = OLD.product_id AND region_id = OLD.region_id;
+        DELETE FROM {ROLLUP_TABLE}
+        WHERE sale_date = OLD.sale_date AND product_id = OLD.product_id AND region_id = OLD.region_id
+          AND sale_count <= 0;
+    '''
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {ROLLUP_TRIGGERS[0]} AFTER INSERT ON sales BEGIN {add_sale} END;")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {ROLLUP_TRIGGERS[1]} AFTER DELETE ON sales BEGIN {remove_sale} END;")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {ROLLUP_TRIGGERS[2]} AFTER UPDATE ON sales BEGIN {remove_sale} {add_sale} END;")
+    conn.commit()
+
+def drop_rollup_triggers(conn):
+    """Drops the rollup maintenance triggers (before bulk loads, which rebuild the rollup instead)."""
+    cursor = conn.cursor()
+    for trigger_name in ROLLUP_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger_name}")
+    conn.commit()
+
+def rebuild_sales_rollup(conn):
+    """Recomputes the whole rollup from the sales table and re-enables incremental maintenance."""
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    drop_rollup_triggers(conn)
+    create_rollup_tables(conn)
+    cursor.execute(f"DELETE FROM {ROLLUP_TABLE}")
+    cursor.execute(f'''
+        INSERT INTO {ROLLUP_TABLE} (sale_date, product_id, region_id, total_quantity, total_amount, sale_count)
+        SELECT sale_date, product_id, region_id, SUM(quantity), SUM(amount), COUNT(*)
+        FROM sales
+        GROUP BY sale_date, product_id, region_id
+    ''')
+    cursor.execute(f"ANALYZE {ROLLUP_TABLE}")
+    conn.commit()
+    row_count = cursor.execute(f"SELECT COUNT(*) FROM {ROLLUP_TABLE}").fetchone()[0]
+    print(f"Built {ROLLUP_TABLE} with {row_count} rows in {time.perf_counter() - started:.1f}s.")
+
+def generate_customers(seed: int) -> list:
+    """Assigns each customer a region, reproducibly for a given seed."""
+    rng = np.random.default_rng(seed)
+    region_ids = rng.choice(CUSTOMER_REGION_CHOICES, size=len(CUSTOMER_NAMES))
+    return [
+        (i + 1, name, f"{name.replace(' ', '').lower()}@example.com", int(region_id))
+        for i, (name, region_id) in enumerate(zip(CUSTOMER_NAMES, region_ids))
+    ]
+
+def _product_weights() -> tuple:
+    """Per-product sampling probabilities that reproduce the category biases."""
+    product_ids = np.array([p[0] for p in PRODUCTS_DATA])
+    categories = [p[2] for p in PRODUCTS_DATA]
+    weights = np.zeros(len(PRODUCTS_DATA))
+    for cat, weight in CATEGORY_WEIGHTS.items():
+        cat_mask = np.array([c == cat for c in categories])
+        if cat_mask.any():
+            # Same integer replication the weighted product list has always used
+            weights[cat_mask] = int(weight * 100 / cat_mask.sum())
+    return product_ids, weights / weights.sum()
+
+def generate_sales_partition(task: tuple) -> tuple:
+    """
+    Generates one partition of sales rows with NumPy.
+
+    `task` is (seed, partition_index, first_row, num_rows, num_recent_sales, end_date_ordinal,
+    customers_data). Each partition draws from its own child seed, so the dataset is identical
+    no matter how many worker processes generate it.
+
+    Returns:
+        tuple: Column arrays (product_id, customer_id, region_id, sale_date, quantity, amount).
+    """
+    seed, partition_index, first_row, num_rows, num_recent_sales, end_date_ordinal, customers_data = task
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(partition_index,)))
+
+    # Dates: the first `num_recent_sales` rows of the whole dataset fall in the recent window
+    row_numbers = np.arange(first_row, first_row + num_rows)
+    recent = row_numbers < num_recent_sales
+    days_back = np.where(
+        recent,
+        rng.integers(0, RECENT_SALES_PERIOD_DAYS, size=num_rows),
+        rng.integers(RECENT_SALES_PERIOD_DAYS, LONG_TERM_SALES_PERIOD_DAYS, size=num_rows),
+    )
+    end_date = np.datetime64(date.fromordinal(end_date_ordinal), 'D')
+    sale_dates = end_date - days_back.astype('timedelta64[D]')
+
+    # Regions by weight, then a uniformly chosen customer from that region
+    region_ids = np.array(list(REGION_WEIGHTS.keys()))
+    region_probs = np.array(list(REGION_WEIGHTS.values()))
+    chosen_regions = rng.choice(region_ids, size=num_rows, p=region_probs / region_probs.sum())
+
+    customer_ids_all = np.array([c[0] for c in customers_data])
+    customer_regions_all = np.array([c[3] for c in customers_data])
+    customer_ids = np.empty(num_rows, dtype=np.int64)
+    sale_regions = chosen_regions.copy()
+    for region_id in region_ids:
+        mask = chosen_regions == region_id
+        count = int(mask.sum())
+        if count == 0:
+            continue
+        candidates = customer_ids_all[customer_regions_all == region_id]
+        if len(candidates) > 0:
+            customer_ids[mask] = candidates[rng.integers(0, len(candidates), size=count)]
+        else:
+            # No customers in this region: fall back to any customer (and their region)
+            picks = rng.integers(0, len(customer_ids_all), size=count)
+            customer_ids[mask] = customer_ids_all[picks]
+            sale_regions[mask] = customer_regions_all[picks]
+
+    # Products by category bias
+    product_ids, product_probs = _product_weights()
+    product_index = rng.choice(len(product_ids), size=num_rows, p=product_probs)
+    prices = np.array([p[3] for p in PRODUCTS_DATA])[product_index]
+
+    # Seasonality by month of the sale date
+    months = sale_dates.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    low = np.full(num_rows, DEFAULT_SEASONAL_FACTOR_RANGE[0])
+    high = np.full(num_rows, DEFAULT_SEASONAL_FACTOR_RANGE[1])
+    for month, (month_low, month_high) in SEASONAL_FACTOR_RANGES.items():
+        low[months == month] = month_low
+        high[months == month] = month_high
+    seasonal_factors = rng.uniform(low, high)
+
+    quantities = rng.integers(1, 6, size=num_rows)
+    amounts = np.round(quantities * prices * (1 + rng.uniform(-0.1, 0.1, size=num_rows)) * seasonal_factors, 2)
+
+    return (
+        product_ids[product_index],
+        customer_ids,
+        sale_regions,
+        np.datetime_as_string(sale_dates, unit='D'),
+        quantities,
+        amounts,
+    )
+
+def _bulk_insert_sales(conn, columns: tuple):
+    """Inserts one generated partition inside a single transaction, in executemany chunks."""
+    product_ids, customer_ids, region_ids, sale_dates, quantities, amounts = columns
+    cursor = conn.cursor()
+    cursor.execute("BEGIN")
+    for start in range(0, len(product_ids), INSERT_CHUNK_SIZE):
+        end = start + INSERT_CHUNK_SIZE
+        cursor.executemany(
+            "INSERT INTO sales (product_id, customer_id, region_id, sale_date, quantity, amount) VALUES (?, ?, ?, ?, ?, ?)",
+            zip(product_ids[start:end].tolist(), customer_ids[start:end].tolist(), region_ids[start:end].tolist(),
+                sale_dates[start:end].tolist(), quantities[start:end].tolist(), amounts[start:end].tolist())
+        )
+    cursor.execute("COMMIT")
+
+def insert_dummy_data(conn, scale_factor: float = 1.0, seed: int = DEFAULT_SEED, workers: int = None,
+                      end_date: date = None):
+    """
+    Inserts sample data into the tables.
+
+    Args:
+        conn: Open connection to the sales database.
+        scale_factor (float): Multiplier on the base 15,000 sales rows.
+        seed (int): Seed for all random draws; the same seed produces the same dataset.
+        workers (int): Number of generator processes (defaults to the CPU count).
+        end_date (date): Most recent possible sale date (defaults to today).
+    """
     cursor = conn.cursor()
 
-    # Clear existing data before inserting new, to ensure fresh start
+    # Clear existing data before inserting new, to ensure fresh start.
+    # Rollup triggers are dropped first so neither the delete nor the bulk load fires them per row.
     print("Clearing existing data...")
+    drop_rollup_triggers(conn)
     cursor.execute("DELETE FROM sales")
     cursor.execute("DELETE FROM customers")
     cursor.execute("DELETE FROM products")
     cursor.execute("DELETE FROM regions")
+    # Restart sale_id numbering so a given seed always yields the same rows
+    cursor.execute("DELETE FROM sqlite_sequence WHERE name = 'sales'")
+    # Indexes are rebuilt after the bulk load, which is much faster than maintaining them per row
+    for (index_name,) in cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'").fetchall():
+        cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
     conn.commit()
     print("Existing data cleared.")
 
+    cursor.executemany("INSERT OR IGNORE INTO regions (region_id, region_name) VALUES (?, ?)", REGIONS_DATA)
+    print(f"Inserted {len(REGIONS_DATA)} regions.")
 
-    # Insert Regions
-    regions_data = [
-        (1, 'North'),
-        (2, 'South'),
-        (3, 'East'),
-        (4, 'West'),
-        (5, 'Central') # Added a new region
-    ]
-    cursor.executemany("INSERT OR IGNORE INTO regions (region_id, region_name) VALUES (?, ?)", regions_data)
-    print(f"Inserted {len(regions_data)} regions.")
-
-    # Insert Products (More variety, including sub-categories implicitly via name)
-    products_data = [
-        (101, 'Laptop Basic', 'Electronics', 800.00),
-        (102, 'Laptop Pro', 'Electronics', 1500.00),
-        (103, 'Smartphone X', 'Electronics', 700.00),
-        (104, 'Smartwatch', 'Electronics', 250.00),
-        (105, 'Headphones Noise-Cancelling', 'Electronics', 180.00),
-        (201, 'Office Desk Standard', 'Furniture', 200.00),
-        (202, 'Ergonomic Chair', 'Furniture', 350.00),
-        (203, 'Bookshelf Small', 'Furniture', 80.00),
-        (301, 'Notebook A4', 'Stationery', 12.00),
-        (302, 'Premium Pen Set', 'Stationery', 30.00),
-        (303, 'Art Supplies Kit', 'Stationery', 45.00),
-        (401, 'Running Shoes', 'Apparel', 110.00), # New Category
-        (402, 'T-Shirt Cotton', 'Apparel', 25.00),
-    ]
-    cursor.executemany("INSERT OR IGNORE INTO products (product_id, product_name, category, price) VALUES (?, ?, ?, ?)", products_data)
-    print(f"Inserted {len(products_data)} products.")
-
-    # Insert Customers (More customers)
-    customer_names = [
-        'Alice Smith', 'Bob Johnson', 'Charlie Brown', 'Diana Prince', 'Eve Adams', 
-        'Frank White', 'Grace Lee', 'Henry Green', 'Ivy Chen', 'Jack Taylor',
-        'Karen Black', 'Liam Davis', 'Mia Wilson', 'Noah Martinez', 'Olivia Garcia',
-        'Peter Rodriguez', 'Quinn Miller', 'Rachel Jones', 'Sam Hernandez', 'Tina Clark'
-    ] # 20 customers
-    customers_data = []
-    for i, name in enumerate(customer_names):
-        # Assign customers to regions, trying to balance or bias
-        region_id = random.choice([1, 1, 2, 3, 4, 5]) # North region (ID 1) slightly more customers
-        customers_data.append((i + 1, name, f"{name.replace(' ', '').lower()}@example.com", region_id))
+    cursor.executemany("INSERT OR IGNORE INTO products (product_id, product_name, category, price) VALUES (?, ?, ?, ?)", PRODUCTS_DATA)
+    print(f"Inserted {len(PRODUCTS_DATA)} products.")
+
+    customers_data = generate_customers(seed)
     cursor.executemany("INSERT OR IGNORE INTO customers (customer_id, customer_name, email, region_id) VALUES (?, ?, ?, ?)", customers_data)
+    conn.commit()
     print(f"Inserted {len(customers_data)} customers.")
 
+    num_sales_records = max(1, int(round(BASE_SALES_RECORDS * scale_factor)))
+    num_recent_sales = int(num_sales_records * RECENT_SALES_PROPORTION)
+    end_date_ordinal = (end_date or datetime.now().date()).toordinal()
+    tasks = [
+        (seed, index, first_row, min(PARTITION_SIZE, num_sales_records - first_row),
+         num_recent_sales, end_date_ordinal, customers_data)
+        for index, first_row in enumerate(range(0, num_sales_records, PARTITION_SIZE))
+    ]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks)))
 
-    # --- Sales Data Generation Configuration (MOVED TO HERE) ---
-    NUM_SALES_RECORDS = 15000 
-    
-    end_date = datetime.now()
-    
-    # Ensure a good chunk of sales are recent
-    recent_sales_period_days = 60 # Sales within last 2 months
-    long_term_sales_period_days = 730 # Sales within last 2 years
-
-    # Define how many sales should be recent vs. long-term
-    recent_sales_proportion = 0.3 # 30% of sales in the last 2 months
-    num_recent_sales = int(NUM_SALES_RECORDS * recent_sales_proportion)
-    num_long_term_sales = NUM_SALES_RECORDS - num_recent_sales
-
-    products_df = pd.DataFrame(products_data, columns=['product_id', 'product_name', 'category', 'price'])
-    customers_df = pd.DataFrame(customers_data, columns=['customer_id', 'customer_name', 'email', 'region_id'])
-    regions_df = pd.DataFrame(regions_data, columns=['region_id', 'region_name'])
-
-    sales_records = []
-
-    # Define some regional biases (e.g., North sells more)
-    region_weights = {1: 0.30, 2: 0.25, 3: 0.20, 4: 0.15, 5: 0.10}
-    weighted_regions = [r for r, weight in region_weights.items() for _ in range(int(weight * 100))]
-
-    # Define some category biases (e.g., Electronics sells more)
-    category_weights = {'Electronics': 0.40, 'Furniture': 0.30, 'Stationery': 0.20, 'Apparel': 0.10}
-    all_weighted_products = []
-    for cat, weight in category_weights.items():
-        cat_products = products_df[products_df['category'] == cat]['product_id'].tolist()
-        all_weighted_products.extend(cat_products * int(weight * 100 / (len(cat_products) if cat_products else 1)))
-    
-    # Simulate some seasonality (e.g., more sales towards end of year)
-    def get_seasonal_factor(date):
-        month = date.month
-        if month in [11, 12]: return random.uniform(1.1, 1.3) 
-        elif month in [1, 2]: return random.uniform(0.8, 1.0) 
-        else: return random.uniform(0.9, 1.1) 
-
-    # --- End Sales Data Generation Configuration ---
-
-
-    # Generate recent sales
-    for _ in tqdm(range(num_recent_sales), desc="Generating Recent Sales Data"):
-        current_date = end_date - timedelta(days=random.randint(0, recent_sales_period_days - 1))
-        
-        chosen_region_id = random.choice(weighted_regions)
-        region_customers = customers_df[customers_df['region_id'] == chosen_region_id]
-        customer = region_customers.sample(1).iloc[0] if not region_customers.empty else customers_df.sample(1).iloc[0]
-
-        product = products_df[products_df['product_id'] == random.choice(all_weighted_products)].iloc[0]
-
-        quantity = random.randint(1, 5)
-        seasonal_factor = get_seasonal_factor(current_date)
-        amount = round(quantity * product['price'] * (1 + random.uniform(-0.1, 0.1)) * seasonal_factor, 2)
-
-        sales_records.append((
-            int(product['product_id']),    # Explicitly cast to int
-            int(customer['customer_id']),   # Explicitly cast to int
-            int(customer['region_id']),    # Explicitly cast to int
-            current_date.strftime('%Y-%m-%d'),
-            quantity,
-            amount
-        ))
-    
-    # Generate long-term sales (apply the same fix here)
-    for _ in tqdm(range(num_long_term_sales), desc="Generating Long-Term Sales Data"):
-        current_date = end_date - timedelta(days=random.randint(recent_sales_period_days, long_term_sales_period_days - 1))
-        
-        chosen_region_id = random.choice(weighted_regions)
-        region_customers = customers_df[customers_df['region_id'] == chosen_region_id]
-        customer = region_customers.sample(1).iloc[0] if not region_customers.empty else customers_df.sample(1).iloc[0]
-
-        product = products_df[products_df['product_id'] == random.choice(all_weighted_products)].iloc[0]
-
-        quantity = random.randint(1, 5)
-        seasonal_factor = get_seasonal_factor(current_date)
-        amount = round(quantity * product['price'] * (1 + random.uniform(-0.1, 0.1)) * seasonal_factor, 2)
-
-        sales_records.append((
-            int(product['product_id']),    # Explicitly cast to int
-            int(customer['customer_id']),   # Explicitly cast to int
-            int(customer['region_id']),    # Explicitly cast to int
-            current_date.strftime('%Y-%m-%d'),
-            quantity,
-            amount
-        ))
-
-    cursor.executemany("INSERT INTO sales (product_id, customer_id, region_id, sale_date, quantity, amount) VALUES (?, ?, ?, ?, ?, ?)", sales_records)
-    conn.commit()
-    print(f"Inserted {len(sales_records)} dummy sales records.")
+    # Load-time pragmas: no rollback journal and no fsyncs while bulk loading
+    cursor.execute("PRAGMA journal_mode = OFF")
+    cursor.execute("PRAGMA synchronous = OFF")
+    cursor.execute("PRAGMA cache_size = -262144")
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None  # Transactions are managed explicitly per partition
+
+    started = time.perf_counter()
+    progress = tqdm(total=num_sales_records, desc="Generating Sales Data", unit="rows")
+    try:
+        if workers == 1:
+            for task in tasks:
+                _bulk_insert_sales(conn, generate_sales_partition(task))
+                progress.update(task[3])
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # Keep a bounded window of partitions in flight and insert them in order,
+                # so sale_ids are reproducible and memory use does not grow with the scale factor
+                pending = deque()
+                task_iter = iter(tasks)
+                for task in task_iter:
+                    pending.append((task, executor.submit(generate_sales_partition, task)))
+                    if len(pending) >= workers * 2:
+                        break
+                while pending:
+                    task, future = pending.popleft()
+                    _bulk_insert_sales(conn, future.result())
+                    progress.update(task[3])
+                    next_task = next(task_iter, None)
+                    if next_task is not None:
+                        pending.append((next_task, executor.submit(generate_sales_partition, next_task)))
+    finally:
+        progress.close()
+        conn.isolation_level = isolation_level
+        cursor.execute("PRAGMA synchronous = FULL")
+        cursor.execute("PRAGMA journal_mode = DELETE")
+
+    elapsed = time.perf_counter() - started
+    print(f"Inserted {num_sales_records} dummy sales records in {elapsed:.1f}s "
+          f"({num_sales_records / elapsed:,.0f} rows/s, {workers} worker(s)).")
     print("Dummy data inserted successfully.")
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Create and populate the sales database with synthetic data.")
+    parser.add_argument("--scale-factor", type=float, default=1.0,
+                        help=f"Multiplier on the base {BASE_SALES_RECORDS} sales rows (e.g. 1000 for 15M rows).")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Random seed for a reproducible dataset.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of generator processes (default: CPU count).")
+    parser.add_argument("--end-date", type=date.fromisoformat, default=None,
+                        help="Most recent sale date as YYYY-MM-DD (default: today).")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
     create_database()
     conn = None
     try:
         conn = sqlite3.connect(DATABASE_PATH)
         create_tables(conn)
-        insert_dummy_data(conn)
+        insert_dummy_data(conn, scale_factor=args.scale_factor, seed=args.seed, workers=args.workers,
+                          end_date=args.end_date)
+        create_indexes(conn)
+        rebuild_sales_rollup(conn)
     except sqlite3.Error as e:
         print(f"An error occurred: {e}")
     finally:
@@ -239,4 +452,4 @@ def main():
             print("Database connection closed.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
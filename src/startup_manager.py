@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import shlex
+import sqlite3
+import hashlib
+import logging
+import threading
+
+from src import setup_database
+from src import rag_index
+from src.agents.agent_tools.sql_result_cache import database_fingerprint
+from src.agents.settings import env_flag
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+KNOWLEDGE_BASE_DIR = os.path.join(PROJECT_ROOT, 'knowledge_base')
+
+# "background": serve the UI immediately and build stale artifacts in a thread; "blocking": build first
+STARTUP_MODE = os.environ.get("STARTUP_MODE", "background").lower()
+# Extra arguments for setup_database.py (e.g. "--scale-factor 10"); a database built with other arguments is regenerated
+STARTUP_DATABASE_ARGS = shlex.split(os.environ.get("STARTUP_DATABASE_ARGS", ""))
+# Regenerate the sales database even though it is usable, e.g. to move the demo dates up to today
+STARTUP_REFRESH_DATABASE = env_flag("STARTUP_REFRESH_DATABASE", False)
+STARTUP_STATE_PATH = os.environ.get(
+    "STARTUP_STATE_PATH", os.path.join(PROJECT_ROOT, '.cache', 'startup_state.json')
+)
+
+REQUIRED_TABLES = ("regions", "products", "customers", "sales", setup_database.ROLLUP_TABLE)
+
+
+def _hash_file(hasher, path: str):
+    hasher.update(os.path.relpath(path, PROJECT_ROOT).encode("utf-8") + b"\0")
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(block)
+    hasher.update(b"\0")
+
+
+def hash_sources(paths: list, extra: dict = None) -> str:
+    """Content hash of the given files and directory trees, plus any extra configuration values."""
+    hasher = hashlib.sha256()
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    _hash_file(hasher, os.path.join(root, name))
+        elif os.path.exists(path):
+            _hash_file(hasher, path)
+    hasher.update(json.dumps(extra or {}, sort_keys=True).encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def database_schema_hash(database_path: str = setup_database.DATABASE_PATH) -> str:
+    """Hash of the database's DDL; data-only changes do not alter the schema knowledge base."""
+    conn = sqlite3.connect(f"file:{database_path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute(
+            "SELECT type, name, COALESCE(sql, '') FROM sqlite_master WHERE name NOT LIKE 'sqlite_%' ORDER BY type, name"
+        ).fetchall()
+    finally:
+        conn.close()
+    return hashlib.sha256(json.dumps(rows).encode("utf-8")).hexdigest()
+
+
+def database_artifact(database_path: str = setup_database.DATABASE_PATH) -> list:
+    """The database file fingerprint in a JSON-friendly form."""
+    return [list(entry) if entry else None for entry in database_fingerprint(database_path)]
+
+
+def database_is_valid(database_path: str = setup_database.DATABASE_PATH) -> bool:
+    """Checks that the database has every table the app needs and that sales is populated."""
+    if not os.path.exists(database_path):
+        return False
+    try:
+        conn = sqlite3.connect(f"file:{database_path}?mode=ro", uri=True)
+        try:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            if not set(REQUIRED_TABLES) <= tables:
+                return False
+            return conn.execute("SELECT 1 FROM sales LIMIT 1").fetchone() is not None
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+
+
+class StartupManager:
+    """
+    Brings the sales database and the knowledge base indexes up to date, doing only what is needed.
+
+    The database step is skipped while a usable database exists (see `database_is_current`). The
+    knowledge base step has an input fingerprint (its source files and configuration) recorded in a
+    state file after it succeeds, and is skipped while that fingerprint is unchanged and its indexes
+    are still present. A warm start does no work. Steps run in-process, either
+    before the app starts serving (`run_pending`) or in a background thread (`start_background`);
+    `wait` lets request handlers hold off until the artifacts are ready.
+    """
+
+    def __init__(self, state_path: str = STARTUP_STATE_PATH, database_args: list = None,
+                 refresh_database: bool = STARTUP_REFRESH_DATABASE):
+        self.state_path = state_path
+        self.database_args = list(STARTUP_DATABASE_ARGS if database_args is None else database_args)
+        self.refresh_database = refresh_database
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.current_step = None
+        self.error = None
+        self.timings = {}
+
+    # --- State file ---
+    def _load_state(self) -> dict:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state: dict):
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        with open(self.state_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.replace(self.state_path + ".tmp", self.state_path)
+
+    # --- Fingerprints ---
+    def knowledge_base_inputs(self) -> str:
+        return hash_sources(
+            [KNOWLEDGE_BASE_DIR, rag_index.__file__],
+            {
+                "embed_model": rag_index.EMBED_MODEL_NAME,
+                "embed_api_base": rag_index.EMBED_API_BASE,
+                "backend": rag_index.VECTOR_STORE_BACKEND,
+                "database_schema": database_schema_hash(),
+            },
+        )
+
+    def _knowledge_base_paths(self) -> list:
+        if rag_index.VECTOR_STORE_BACKEND == "numpy":
+            return [rag_index.NUMPY_INDEX_SCHEMA_PATH, rag_index.NUMPY_INDEX_KPI_PATH]
+        return [rag_index.CHROMA_DB_SCHEMA_PATH, rag_index.CHROMA_DB_KPI_PATH]
+
+    # --- Staleness checks ---
+    def database_is_current(self, state: dict) -> bool:
+        """
+        A usable database is kept: generating one takes minutes, so neither its age nor edits to
+        setup_database.py trigger a rebuild. It is regenerated when it is missing or unusable, when
+        it was built with different STARTUP_DATABASE_ARGS, or when a refresh is requested.
+        """
+        if self.refresh_database:
+            return False
+        recorded = state.get("database", {})
+        # A database built outside the app (no record) is adopted as it is
+        if recorded.get("args", self.database_args) != self.database_args:
+            return False
+        # An unchanged file was valid when it was recorded; anything else is checked again
+        if recorded and recorded.get("artifact") == database_artifact():
+            return True
+        return database_is_valid()
+
+    def knowledge_base_is_current(self, state: dict) -> bool:
+        if not database_is_valid():
+            return False
+        if state.get("knowledge_base", {}).get("inputs") != self.knowledge_base_inputs():
+            return False
+        return all(rag_index.store_matches_manifest(path) for path in self._knowledge_base_paths())
+
+    def pending_steps(self) -> list:
+        """Names of the steps whose artifacts are missing or out of date, in run order."""
+        state = self._load_state()
+        if not self.database_is_current(state):
+            # The knowledge base fingerprint depends on the database schema, so decide after rebuilding
+            return ["database", "knowledge_base"]
+        return [] if self.knowledge_base_is_current(state) else ["knowledge_base"]
+
+    # --- Steps ---
+    def _build_database(self) -> dict:
+        setup_database.main(self.database_args)
+        if not database_is_valid():
+            raise RuntimeError(f"Database setup did not produce a usable database at {setup_database.DATABASE_PATH}.")
+        self.refresh_database = False
+        return {"args": self.database_args, "artifact": database_artifact(), "built_at": time.time()}
+
+    def _build_knowledge_base(self) -> dict:
+        state = self._load_state()
+        if self.knowledge_base_is_current(state):
+            return state["knowledge_base"]
+        rag_index.main()
+        return {"inputs": self.knowledge_base_inputs(), "built_at": time.time()}
+
+    def run_pending(self) -> list:
+        """Runs the out-of-date steps in this thread. Returns the names of the steps that ran."""
+        with self._lock:
+            started = time.perf_counter()
+            ran = []
+            try:
+                for step in self.pending_steps():
+                    self.current_step = step
+                    logging.info(f"Startup: running step '{step}'...")
+                    step_started = time.perf_counter()
+                    record = self._build_database() if step == "database" else self._build_knowledge_base()
+                    state = self._load_state()
+                    state[step] = record
+                    self._save_state(state)
+                    self.timings[step] = time.perf_counter() - step_started
+                    logging.info(f"Startup: step '{step}' finished in {self.timings[step]:.1f}s.")
+                    ran.append(step)
+                self.error = None
+            except Exception as e:
+                self.error = e
+                logging.exception(f"Startup: step '{self.current_step}' failed.")
+                raise
+            finally:
+                self.current_step = None
+                self.timings["total"] = time.perf_counter() - started
+                self._ready.set()
+            if not ran:
+                logging.info(f"Startup: database and knowledge base are current (checked in {self.timings['total'] * 1000:.0f} ms).")
+            return ran
+
+    def start_background(self) -> threading.Thread:
+        """Runs the out-of-date steps in a daemon thread; returns immediately."""
+        def run():
+            try:
+                self.run_pending()
+            except Exception:
+                pass # Recorded in self.error and reported to callers of wait()
+
+        self._ready.clear()
+        self._thread = threading.Thread(target=run, name="startup-manager", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set() and self.error is None
+
+    def wait(self, timeout: float = None) -> bool:
+        """Blocks until startup finished (successfully or not) or `timeout` passed; True if it finished."""
+        return self._ready.wait(timeout)
+
+    def describe(self) -> str:
+        if self.error is not None:
+            return f"setup failed: {type(self.error).__name__}: {self.error}"
+        if self._ready.is_set():
+            return "ready"
+        step = self.current_step or "checking"
+        return {"database": "generating the sales database", "knowledge_base": "indexing the knowledge base"}.get(step, step)
@@ -0,0 +1,59 @@
+import os
+import sys
+
+# Tests import the application as `src.agents...`, like app.py does from the project root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# Keep test queries out of the local trace files
+os.environ.setdefault("AGENT_TRACING_ENABLED", "0")
+
+import random
+import sqlite3
+import contextlib
+
+import pytest
+
+REGIONS = [(1, 'North'), (2, 'South'), (3, 'East'), (4, 'West'), (5, 'Central')]
+PRODUCTS = [
+    (101, 'Laptop Basic', 'Electronics', 800.00),
+    (102, 'Laptop Pro', 'Electronics', 1500.00),
+    (201, 'Office Desk Standard', 'Furniture', 200.00),
+    (301, 'Notebook A4', 'Stationery', 12.00),
+    (401, 'Running Shoes', 'Apparel', 110.00),
+    (402, 'T-Shirt Cotton', 'Apparel', 25.00),
+]
+
+
+def build_sales_database(path: str, sales_rows: int = 2000, seed: int = 7):
+    """
+    A small sales database with the real schema, indexes and rollup triggers.
+
+    Amounts are whole numbers, so sums are exact however they are added up. Product 402 has
+    no sales, for outer-join cases.
+    """
+    from src import setup_database
+    conn = sqlite3.connect(path)
+    with contextlib.redirect_stdout(None):
+        setup_database.create_tables(conn)
+        setup_database.create_indexes(conn)
+        setup_database.create_rollup_tables(conn)
+    conn.executemany("INSERT INTO regions VALUES (?, ?)", REGIONS)
+    conn.executemany("INSERT INTO products VALUES (?, ?, ?, ?)", PRODUCTS)
+    conn.executemany("INSERT INTO customers VALUES (?, ?, ?, ?)",
+                     [(n, f"Customer {n}", f"c{n}@example.com", n % 5 + 1) for n in range(1, 21)])
+    rng = random.Random(seed)
+    product_ids = [product[0] for product in PRODUCTS if product[0] != 402]
+    conn.executemany(
+        "INSERT INTO sales (product_id, customer_id, region_id, sale_date, quantity, amount) VALUES (?, ?, ?, ?, ?, ?)",
+        [(rng.choice(product_ids), rng.randint(1, 20), rng.randint(1, 5),
+          f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", rng.randint(1, 5), float(rng.randint(5, 500)))
+         for _ in range(sales_rows)],
+    )
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture(scope="session")
+def sales_database(tmp_path_factory):
+    return build_sales_database(str(tmp_path_factory.mktemp("sales") / "sales_database.db"))
@@ -0,0 +1,35 @@
+import pytest
+
+from src.agents.direct_sql_pipeline import NO_RESULTS_MESSAGE, extract_sql, format_template_answer
+
+
+@pytest.mark.parametrize("generated", [
+    "SELECT COUNT(*) FROM sales",
+    "  SELECT COUNT(*) FROM sales;  ",
+    "```sql\nSELECT COUNT(*) FROM sales;\n```",
+    "```\nSELECT COUNT(*) FROM sales\n```\nThis counts every sale.",
+    "Here is the query: SELECT COUNT(*) FROM sales; It counts every sale.",
+    "SELECT COUNT(*) FROM sales; SELECT * FROM regions;",
+])
+def test_extract_sql_keeps_only_the_first_statement(generated):
+    assert extract_sql(generated) == "SELECT COUNT(*) FROM sales"
+
+
+def test_extract_sql_accepts_common_table_expressions():
+    sql = "WITH totals AS (SELECT region_id, SUM(amount) AS total FROM sales GROUP BY region_id) SELECT * FROM totals"
+    assert extract_sql(f"```SQL\n{sql};\n```") == sql
+
+
+@pytest.mark.parametrize("generated", ["", "I cannot answer that.", "```sql\nDELETE FROM sales\n```"])
+def test_extract_sql_without_a_select_returns_none(generated):
+    assert extract_sql(generated) is None
+
+
+def test_format_template_answer():
+    assert format_template_answer("total\n42\n", "Q").startswith("The total is 42.")
+    table = format_template_answer("region,total\nNorth,1\nSouth,2\n", "Q", max_rows=1)
+    assert table.startswith("Found 2 rows:\n\n| region | total |\n|---|---|\n| North | 1 |\n\n(Showing the first 1 of 2 rows.)")
+    assert table.endswith("SQL used: Q")
+    truncated = format_template_answer("total\n42\n... [truncated after 1 rows]", "Q")
+    assert "\n\n... [truncated after 1 rows]\n\n" in truncated
+    assert format_template_answer(NO_RESULTS_MESSAGE, "Q") == "No matching records were found.\n\nSQL used: Q"
@@ -0,0 +1,164 @@
+import shutil
+import sqlite3
+
+import pytest
+
+from src.agents.agent_tools.duckdb_compat import UnsupportedQuery, normalize_statement, translate_sqlite_to_duckdb
+
+
+def test_normalize_statement_drops_trailing_semicolons_and_comments():
+    assert normalize_statement("SELECT 1;") == "SELECT 1"
+    assert normalize_statement("SELECT 1 ; ; \n") == "SELECT 1"
+    assert normalize_statement("SELECT 1; -- the answer") == "SELECT 1"
+    assert normalize_statement("SELECT 1 -- it's one\n") == "SELECT 1"
+    assert normalize_statement("SELECT 1; /* done */") == "SELECT 1"
+    assert normalize_statement("SELECT ';--' AS x;") == "SELECT ';--' AS x"
+
+
+@pytest.mark.parametrize("ending", [";", " ;\n", " -- per region", "; -- per region", ";\n/* per region */"])
+def test_order_by_all_is_appended_to_the_statement_not_after_its_ending(ending):
+    sql = "SELECT region_id, COUNT(*) FROM sales GROUP BY region_id" + ending
+    assert translate_sqlite_to_duckdb(sql) == "SELECT region_id, COUNT(*) FROM sales GROUP BY region_id ORDER BY ALL"
+
+
+def test_ordered_or_windowed_groups_are_left_alone():
+    sql = "SELECT region_id, COUNT(*) FROM sales GROUP BY region_id ORDER BY 2 DESC;"
+    assert translate_sqlite_to_duckdb(sql) == sql.rstrip(";")
+    sql = "SELECT region_id, RANK() OVER (ORDER BY COUNT(*)) FROM sales GROUP BY region_id"
+    assert translate_sqlite_to_duckdb(sql) == sql
+
+
+def test_translation_follows_sqlite_semantics():
+    assert translate_sqlite_to_duckdb("SELECT region_id, COUNT(*) FROM sales GROUP BY region_id") == \
+        "SELECT region_id, COUNT(*) FROM sales GROUP BY region_id ORDER BY ALL"
+    assert translate_sqlite_to_duckdb("SELECT * FROM regions WHERE region_name LIKE 'n%'") == \
+        "SELECT * FROM regions WHERE region_name ILIKE 'n%'"
+    assert translate_sqlite_to_duckdb("SELECT DATE('2025-03-31', '-1 month')") == "SELECT '2025-03-03'"
+    assert translate_sqlite_to_duckdb("SELECT CAST(amount AS REAL) FROM sales") == \
+        "SELECT CAST(amount AS DOUBLE) FROM sales"
+    assert translate_sqlite_to_duckdb("SELECT STRFTIME('%Y-%m', sale_date) FROM sales") == \
+        "SELECT strftime(CAST(sale_date AS TIMESTAMP), '%Y-%m') FROM sales"
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM regions WHERE region_name GLOB 'N*'",
+    "SELECT DATE(sale_date, '+1 day') FROM sales",
+    "SELECT [region_name] FROM regions",
+])
+def test_untranslatable_queries_raise(sql):
+    with pytest.raises(UnsupportedQuery):
+        translate_sqlite_to_duckdb(sql)
+
+
+@pytest.fixture
+def duckdb_database(sales_database, monkeypatch, tmp_path):
+    """Routes execute_sql_query to `sales_database` with every query sent to DuckDB."""
+    pytest.importorskip("duckdb")
+    from src.agents.agent_tools import sql_connection_pool, sql_engine, sql_executor_tool
+    monkeypatch.setattr(sql_engine, "DUCKDB_SNAPSHOT_DIR", str(tmp_path))
+    pool = sql_connection_pool.SQLiteConnectionPool(database_path=sales_database, max_size=1)
+    monkeypatch.setattr(sql_connection_pool, "_pool", pool)
+    monkeypatch.setattr(sql_engine, "SQL_ENGINE", "duckdb")
+    monkeypatch.setattr(sql_executor_tool, "SQL_CACHE_ENABLED", False)
+    engine = sql_engine.get_duckdb_engine(sales_database)
+    while not engine.prepare():
+        engine._building.join()
+    yield engine
+    pool.close_all()
+
+
+def _sqlite_rows(database_path, sql):
+    conn = sqlite3.connect(database_path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("ending", ["", ";", "; -- per region", " -- it's per region"])
+def test_execute_sql_query_runs_terminated_statements_on_duckdb(duckdb_database, sales_database, ending):
+    from src.agents.agent_tools.sql_executor_tool import execute_sql_query
+    sql = "SELECT region_id, COUNT(*) AS sales_count, SUM(amount) AS revenue FROM sales GROUP BY region_id"
+    queries = duckdb_database.queries
+    result = execute_sql_query(sql + ending)
+    assert duckdb_database.queries == queries + 1
+    lines = result.strip().splitlines()
+    assert lines[0] == "region_id,sales_count,revenue"
+    expected = _sqlite_rows(sales_database, sql + " ORDER BY region_id")
+    assert [line.split(",") for line in lines[1:]] == [[str(value) for value in row] for row in expected]
+
+
+def test_run_on_duckdb_falls_back_when_sqlite_cannot_describe_the_query(duckdb_database, sales_database):
+    from src.agents.agent_tools.sql_executor_tool import _run_on_duckdb
+    conn = sqlite3.connect(sales_database)
+    try:
+        fallbacks = duckdb_database.fallbacks
+        assert _run_on_duckdb(conn, "SELECT no_such_column FROM sales", "SELECT 1", 1) is None
+        assert duckdb_database.fallbacks == fallbacks + 1
+    finally:
+        conn.close()
+
+
+def test_run_on_duckdb_falls_back_when_duckdb_fails(duckdb_database, sales_database):
+    from src.agents.agent_tools.sql_executor_tool import _run_on_duckdb
+    conn = sqlite3.connect(sales_database)
+    try:
+        fallbacks = duckdb_database.fallbacks
+        assert _run_on_duckdb(conn, "SELECT 1", "SELECT no_such_function(1)", 1) is None
+        assert duckdb_database.fallbacks == fallbacks + 1
+    finally:
+        conn.close()
+
+
+def test_choose_engine_falls_back_on_translation_errors(duckdb_database, sales_database):
+    from src.agents.agent_tools.sql_engine import choose_engine
+    conn = sqlite3.connect(sales_database)
+    try:
+        assert choose_engine(conn, "SELECT region_name FROM regions WHERE region_name GLOB 'N*'")[0] == "sqlite"
+        engine, duckdb_sql, _ = choose_engine(conn, "SELECT COUNT(*) FROM sales; -- total")
+        assert (engine, duckdb_sql) == ("duckdb", "SELECT COUNT(*) FROM sales")
+    finally:
+        conn.close()
+
+
+def _wait_until_ready(engine):
+    while not engine.prepare():
+        engine._building.join()
+
+
+def _add_region(database_path, region_id):
+    conn = sqlite3.connect(database_path)
+    conn.execute("INSERT INTO regions VALUES (?, ?)", (region_id, f"Region {region_id}"))
+    conn.commit()
+    conn.close()
+
+
+def test_replaced_connections_close_when_their_last_cursor_closes(sales_database, tmp_path):
+    duckdb = pytest.importorskip("duckdb")
+    from src.agents.agent_tools.sql_engine import DuckDBEngine
+    database_path = str(tmp_path / "sales.db")
+    shutil.copy(sales_database, database_path)
+    engine = DuckDBEngine(database_path, snapshot_dir=str(tmp_path / "snapshots"))
+    _wait_until_ready(engine)
+
+    with engine.cursor() as cursor:
+        first = engine._connection
+        _add_region(database_path, 6)
+        _wait_until_ready(engine)
+        assert engine._connection is not first
+        # The running query keeps reading the snapshot it started on
+        assert cursor.execute("SELECT COUNT(*) FROM regions").fetchone() == (5,)
+    with pytest.raises(duckdb.ConnectionException):
+        first.execute("SELECT 1")
+    assert engine.stats()["connections_in_use"] == 0
+
+    # Without open cursors, a replaced connection is closed right away
+    second = engine._connection
+    _add_region(database_path, 7)
+    _wait_until_ready(engine)
+    with pytest.raises(duckdb.ConnectionException):
+        second.execute("SELECT 1")
+    with engine.cursor() as cursor:
+        assert cursor.execute("SELECT COUNT(*) FROM regions").fetchone() == (7,)
+    # Only the snapshot of the current database is kept
+    assert len(list((tmp_path / "snapshots").glob("*.duckdb"))) == 1
@@ -0,0 +1,89 @@
+import asyncio
+from typing import List
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+
+from src.agents.agent_tools.embedding_cache import CachedEmbedding, EmbeddingDiskCache
+
+
+class _CountingEmbedding(BaseEmbedding):
+    """Deterministic stand-in for the remote model that records every text it is asked to embed."""
+
+    calls: list = []
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CountingEmbedding"
+
+    def _vector(self, text: str) -> List[float]:
+        self.calls.append(text)
+        return [float(len(text)), float(sum(map(ord, text)) % 97), 0.5]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._vector(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._vector(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._vector(text)
+
+
+def _inner():
+    return _CountingEmbedding(model_name="test-model", calls=[])
+
+
+def test_repeated_queries_hit_the_memory_tier():
+    inner = _inner()
+    cached = CachedEmbedding(inner)
+    first = cached.get_query_embedding("total sales")
+    assert cached.get_query_embedding("total sales") == first
+    assert asyncio.run(cached.aget_query_embedding("total sales")) == first
+    assert inner.calls == ["total sales"]
+    assert cached.cache_stats()["memory_hits"] == 2
+
+
+def test_batches_only_embed_missing_texts_once(tmp_path):
+    inner = _inner()
+    cached = CachedEmbedding(inner, disk_cache=EmbeddingDiskCache(str(tmp_path / "cache.sqlite3")))
+    cached.get_text_embedding("a")
+    vectors = cached.get_text_embedding_batch(["a", "b", "b", "c"])
+    assert inner.calls == ["a", "b", "c"]
+    assert vectors[1] == vectors[2]
+
+
+def test_disk_tier_survives_a_new_wrapper(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    vector = CachedEmbedding(_inner(), disk_cache=EmbeddingDiskCache(path)).get_text_embedding("regions table")
+    inner = _inner()
+    cached = CachedEmbedding(inner, disk_cache=EmbeddingDiskCache(path))
+    assert cached.get_text_embedding("regions table") == vector
+    assert inner.calls == []
+    assert cached.cache_stats()["disk_hits"] == 1
+
+
+def test_query_and_text_embeddings_are_cached_separately():
+    inner = _inner()
+    cached = CachedEmbedding(inner)
+    cached.get_query_embedding("sales")
+    cached.get_text_embedding("sales")
+    assert inner.calls == ["sales", "sales"]
+
+
+def test_memory_tier_is_bounded():
+    inner = _inner()
+    cached = CachedEmbedding(inner, memory_entries=2)
+    for text in ("a", "b", "c", "a"):
+        cached.get_query_embedding(text)
+    assert inner.calls == ["a", "b", "c", "a"]
+    assert cached.cache_stats()["memory_entries"] == 2
+
+
+def test_disk_store_evicts_least_recently_used_entries(tmp_path):
+    disk = EmbeddingDiskCache(str(tmp_path / "cache.sqlite3"), max_entries=10)
+    disk.put_many("m", {f"k{n}": [float(n)] for n in range(10)})
+    disk.get_many(["k0"])
+    disk.put_many("m", {"k10": [10.0]})
+    assert "k0" in disk.get_many(["k0"])
+    assert disk.get_many(["k1", "k2"]) == {}
+    assert disk.get_many(["k10"]) == {"k10": [10.0]}
@@ -0,0 +1,54 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from src.agents.agent_tools.numpy_vector_store import NumpyVectorRetriever, NumpyVectorStore
+
+
+def _store():
+    return NumpyVectorStore.from_embeddings(
+        ids=["regions", "products", "sales"],
+        texts=["regions table", "products table", "sales table"],
+        embeddings=[[1.0, 0.0, 0.0], [0.0, 2.0, 0.0], [0.0, 1.0, 1.0]],
+        metadatas=[{"table": "regions"}, {"table": "products"}, {"table": "sales"}],
+    )
+
+
+def test_query_returns_nearest_rows_best_first():
+    store = _store()
+    assert np.allclose(np.linalg.norm(store.embeddings, axis=1), 1.0)
+    matches = store.query([0.0, 1.0, 0.2], top_k=2)
+    assert [i for i, _ in matches] == [1, 2]
+    assert matches[0][1] == pytest.approx(1 / np.sqrt(1.04))
+    assert len(store.query([1.0, 0.0, 0.0], top_k=10)) == 3
+
+
+def test_persisted_store_loads_memory_mapped(tmp_path):
+    store = _store()
+    store.persist(str(tmp_path / "index"))
+    loaded = NumpyVectorStore.load(str(tmp_path / "index"))
+    assert isinstance(loaded.embeddings, np.memmap)
+    assert (loaded.ids, loaded.texts, loaded.metadatas) == (store.ids, store.texts, store.metadatas)
+    assert loaded.query([0.0, 0.0, 1.0], top_k=1) == store.query([0.0, 0.0, 1.0], top_k=1)
+
+
+def test_mismatched_lengths_are_rejected():
+    with pytest.raises(ValueError):
+        NumpyVectorStore(np.zeros((2, 3), dtype=np.float32), ["a"], ["a"], [{}])
+
+
+class _FixedEmbedding:
+    def get_query_embedding(self, query):
+        return [1.0, 0.1, 0.0]
+
+    async def aget_query_embedding(self, query):
+        return [1.0, 0.1, 0.0]
+
+
+def test_retriever_returns_nodes_with_scores():
+    retriever = NumpyVectorRetriever(_store(), _FixedEmbedding(), similarity_top_k=1)
+    nodes = retriever.retrieve("which regions are there")
+    assert [(node.node.id_, node.node.get_content(), node.node.metadata) for node in nodes] == \
+        [("regions", "regions table", {"table": "regions"})]
+    assert asyncio.run(retriever.aretrieve("regions"))[0].score == pytest.approx(nodes[0].score)
@@ -0,0 +1,51 @@
+import sqlite3
+import logging
+
+import pytest
+
+from src.agents.agent_tools.query_plan_inspector import (
+    explain_query_plan, find_full_scans, inspect_query_plan, table_aliases,
+)
+
+
+@pytest.fixture
+def conn(sales_database):
+    conn = sqlite3.connect(sales_database)
+    yield conn
+    conn.close()
+
+
+def test_table_aliases():
+    assert table_aliases("SELECT s.amount FROM sales AS s JOIN regions r ON s.region_id = r.region_id", "sales") == \
+        {"sales", "s"}
+    assert table_aliases("SELECT amount FROM sales WHERE amount > 1", "sales") == {"sales"}
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT SUM(amount) FROM sales WHERE sale_date >= '2025-06-01'",
+    "SELECT region_id, SUM(amount) FROM sales WHERE sale_date BETWEEN '2025-01-01' AND '2025-01-31' GROUP BY region_id",
+    "SELECT SUM(quantity) FROM sales WHERE product_id = 101",
+    "SELECT r.region_name, SUM(s.amount) FROM sales s JOIN regions r ON s.region_id = r.region_id GROUP BY r.region_name",
+])
+def test_indexed_questions_do_not_scan_sales(conn, sql):
+    assert find_full_scans(explain_query_plan(conn, sql), sql) == []
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM sales",
+    "SELECT COUNT(*) FROM sales s WHERE s.quantity > 3",
+])
+def test_full_scans_are_reported(conn, sql):
+    assert find_full_scans(explain_query_plan(conn, sql), sql) == ["sales"]
+
+
+def test_skip_scans_count_as_full_scans():
+    assert find_full_scans(["SEARCH sales USING INDEX idx_sales_region (ANY(region_id) AND customer_id=?)"],
+                           "SELECT * FROM sales WHERE customer_id = 1") == ["sales"]
+
+
+def test_inspect_query_plan_warns_once_per_full_scan(conn, caplog):
+    with caplog.at_level(logging.WARNING):
+        plan = inspect_query_plan(conn, "SELECT * FROM sales")
+    assert plan and "full scan of 'sales'" in caplog.text
+    assert inspect_query_plan(conn, "SELECT * FROM no_such_table") == []
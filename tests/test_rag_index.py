@@ -0,0 +1,157 @@
+import asyncio
+
+import pytest
+from llama_index.core.schema import TextNode
+
+from src import rag_index
+
+
+class _BatchEmbedding:
+    """Stand-in for the embedding model: one vector per text, with optional failures and latency."""
+
+    def __init__(self, failures=0, delay=0.0):
+        self.failures = failures
+        self.delay = delay
+        self.batches = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @property
+    def embedded(self) -> list:
+        return [text for batch in self.batches for text in batch]
+
+    async def aget_text_embedding_batch(self, texts):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("temporarily unavailable")
+            self.batches.append(list(texts))
+            return [[float(len(text)), 1.0, 0.5] for text in texts]
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = _BatchEmbedding(delay=0.01)
+    monkeypatch.setattr(rag_index, "embed_model", model)
+    monkeypatch.setattr(rag_index, "EMBED_RETRY_BASE_DELAY", 0.0)
+    return model
+
+
+def test_embed_texts_batches_and_keeps_order(model):
+    texts = ["a" * n for n in range(1, 11)]
+    vectors = rag_index.embed_texts(texts, batch_size=3, max_concurrency=2)
+    assert vectors == [[float(n), 1.0, 0.5] for n in range(1, 11)]
+    assert sorted(len(batch) for batch in model.batches) == [1, 3, 3, 3]
+    assert model.max_in_flight == 2
+
+
+def test_failed_batches_are_retried(model):
+    model.failures = 2
+    assert rag_index.embed_texts(["x", "yy"], batch_size=2) == [[1.0, 1.0, 0.5], [2.0, 1.0, 0.5]]
+
+
+def test_persistent_failures_are_raised(model, monkeypatch):
+    monkeypatch.setattr(rag_index, "EMBED_MAX_RETRIES", 1)
+    model.failures = 5
+    with pytest.raises(ConnectionError):
+        rag_index.embed_texts(["x"])
+
+
+def test_invalid_embeddings_are_rejected():
+    with pytest.raises(ValueError):
+        rag_index._validate_embeddings([[1.0], []], 2)
+    with pytest.raises(ValueError):
+        rag_index._validate_embeddings([[1.0]], 2)
+
+
+def test_empty_input_makes_no_request(model):
+    assert rag_index.embed_texts([]) == []
+    assert model.batches == []
+
+
+def _nodes(**texts):
+    return [TextNode(text=text, id_=id_, metadata={"table_name": id_}) for id_, text in texts.items()]
+
+
+@pytest.mark.parametrize("backend", ["numpy", "chroma"])
+def test_sync_nodes_embeds_only_new_and_changed_nodes(model, monkeypatch, tmp_path, backend):
+    monkeypatch.setattr(rag_index, "VECTOR_STORE_BACKEND", backend)
+    paths = ("test_kb", str(tmp_path / "chroma"), str(tmp_path / "numpy"))
+
+    rag_index.sync_nodes(_nodes(regions="regions v1", sales="sales v1"), *paths)
+    assert sorted(model.embedded) == ["regions v1", "sales v1"]
+
+    model.batches.clear()
+    rag_index.sync_nodes(_nodes(regions="regions v1", sales="sales v1"), *paths)
+    assert model.embedded == []
+
+    rag_index.sync_nodes(_nodes(regions="regions v1", sales="sales v2", products="products v1"), *paths)
+    assert sorted(model.embedded) == ["products v1", "sales v2"]
+
+    model.batches.clear()
+    index_path = rag_index.sync_nodes(_nodes(regions="regions v1", products="products v1"), *paths)
+    assert model.embedded == []
+    assert set(rag_index.read_manifest(index_path)["nodes"]) == {"regions", "products"}
+    assert sorted(_stored_ids(backend, paths)) == ["products", "regions"]
+
+
+def _stored_ids(backend, paths):
+    if backend == "numpy":
+        return rag_index.NumpyVectorStore.load(paths[2]).ids
+    import chromadb
+    return chromadb.PersistentClient(path=paths[1]).get_collection(paths[0]).get()["ids"]
+
+
+def _remove_stored(backend, paths, id_):
+    if backend == "numpy":
+        store = rag_index.NumpyVectorStore.load(paths[2], mmap=False)
+        keep = [row for row, stored_id in enumerate(store.ids) if stored_id != id_]
+        rag_index.NumpyVectorStore(store.embeddings[keep], [store.ids[row] for row in keep],
+                                   [store.texts[row] for row in keep], [store.metadatas[row] for row in keep]).persist(paths[2])
+    else:
+        import chromadb
+        chromadb.PersistentClient(path=paths[1]).get_collection(paths[0]).delete(ids=[id_])
+
+
+@pytest.mark.parametrize("backend", ["numpy", "chroma"])
+def test_sync_nodes_checks_the_store_before_skipping(model, monkeypatch, tmp_path, backend):
+    monkeypatch.setattr(rag_index, "VECTOR_STORE_BACKEND", backend)
+    paths = ("test_kb", str(tmp_path / "chroma"), str(tmp_path / "numpy"))
+    nodes = lambda: _nodes(regions="regions v1", sales="sales v1")
+
+    index_path = rag_index.sync_nodes(nodes(), *paths)
+    assert rag_index.read_manifest(index_path)["dimension"] == 3
+    assert rag_index.store_matches_manifest(index_path)
+
+    # A vector lost from the store is embedded again although the manifest is unchanged
+    _remove_stored(backend, paths, "sales")
+    assert not rag_index.store_matches_manifest(index_path)
+    model.batches.clear()
+    rag_index.sync_nodes(nodes(), *paths)
+    assert model.embedded == ["sales v1"]
+    assert sorted(_stored_ids(backend, paths)) == ["regions", "sales"]
+
+    # Vectors of another dimension than the last build recorded are not reused
+    manifest = rag_index.read_manifest(index_path)
+    rag_index.write_manifest(index_path, manifest["collection"], manifest["nodes"], dimension=5)
+    model.batches.clear()
+    rag_index.sync_nodes(nodes(), *paths)
+    assert sorted(model.embedded) == ["regions v1", "sales v1"]
+    assert rag_index.read_manifest(index_path)["dimension"] == 3
+
+
+def test_kpi_definitions_are_split_per_heading(tmp_path):
+    path = tmp_path / "kpi_definitions.md"
+    path.write_text("# Glossary\n\nIntro.\n\n---\n\n## KPIs\n\n### Average Sales\n**Definition:** Mean amount.\n\n"
+                    "### Sales Volume\n**Definition:** Units sold.\n\n---\n\n## Business Terms\n\n### Last Quarter\n"
+                    "**Definition:** The last completed quarter.\n")
+    assert rag_index.parse_kpi_definitions_md(str(path)) == [
+        ("KPIs", "Average Sales", "### Average Sales\n**Definition:** Mean amount."),
+        ("KPIs", "Sales Volume", "### Sales Volume\n**Definition:** Units sold."),
+        ("Business Terms", "Last Quarter", "### Last Quarter\n**Definition:** The last completed quarter."),
+    ]
@@ -0,0 +1,77 @@
+import sqlite3
+
+import pytest
+
+from src.agents.agent_tools.rollup_query_rewriter import rewrite_for_rollup
+
+
+@pytest.fixture
+def conn(sales_database):
+    conn = sqlite3.connect(sales_database)
+    yield conn
+    conn.close()
+
+
+def _rows(conn, sql):
+    cursor = conn.execute(sql)
+    return [description[0] for description in cursor.description], cursor.fetchall()
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT region_id, SUM(amount) FROM sales GROUP BY region_id",
+    "SELECT product_id, COUNT(*), AVG(quantity) FROM sales GROUP BY product_id ORDER BY product_id",
+    "SELECT strftime('%Y-%m', sale_date) AS month, TOTAL(s.amount) FROM sales s GROUP BY month",
+    "SELECT p.category, SUM(s.quantity) FROM sales s JOIN products p ON s.product_id = p.product_id GROUP BY p.category",
+    "SELECT COUNT(*) FROM sales WHERE sale_date >= '2025-06-01';",
+    "SELECT MAX(sale_date), COUNT(DISTINCT product_id) FROM sales WHERE region_id = 2",
+])
+def test_rewritten_queries_return_the_same_rows(conn, sql):
+    rewritten = rewrite_for_rollup(sql)
+    assert rewritten is not None and "sales_daily_rollup" in rewritten
+    assert _rows(conn, rewritten) == _rows(conn, sql)
+
+
+@pytest.mark.parametrize("sql", [
+    # COUNT(*) on the nullable side: an unmatched product counts 1, SUM(sale_count) would give 0
+    "SELECT p.product_id, COUNT(*) FROM products p LEFT JOIN sales s ON s.product_id = p.product_id GROUP BY p.product_id",
+    "SELECT p.product_id, COUNT(*) FROM products p LEFT OUTER JOIN sales s ON s.product_id = p.product_id GROUP BY p.product_id",
+    "SELECT COUNT(*) FROM sales s RIGHT JOIN products p ON s.product_id = p.product_id",
+    "SELECT COUNT(*) FROM sales s FULL OUTER JOIN products p ON s.product_id = p.product_id",
+    # Columns the rollup does not keep, row-level results and window functions stay on sales
+    "SELECT customer_id, SUM(amount) FROM sales GROUP BY customer_id",
+    "SELECT sale_date, amount FROM sales",
+    "SELECT * FROM sales",
+    "SELECT region_id, SUM(amount) OVER (PARTITION BY region_id) FROM sales",
+    "SELECT AVG(amount * quantity) FROM sales",
+    "SELECT COUNT(*) FROM sales a JOIN sales b ON a.sale_id = b.sale_id",
+])
+def test_ineligible_queries_are_not_rewritten(sql):
+    assert rewrite_for_rollup(sql) is None
+
+
+def test_left_join_count_would_differ_on_the_rollup(conn):
+    # The case the outer-join rule guards against
+    sql = ("SELECT p.product_id, COUNT(*) FROM products p LEFT JOIN sales s ON s.product_id = p.product_id "
+           "WHERE p.product_id = 402 GROUP BY p.product_id")
+    assert _rows(conn, sql)[1] == [(402, 1)]
+    assert rewrite_for_rollup(sql) is None
+
+
+def test_unaliased_aggregates_keep_their_column_names(conn):
+    rewritten = rewrite_for_rollup("SELECT region_id, SUM(amount), COUNT(*) FROM sales GROUP BY region_id")
+    assert _rows(conn, rewritten)[0] == ["region_id", "SUM(amount)", "COUNT(*)"]
+
+
+def test_triggers_keep_the_rollup_current(sales_database, tmp_path):
+    import shutil
+    path = str(tmp_path / "copy.db")
+    shutil.copy(sales_database, path)
+    conn = sqlite3.connect(path)
+    sql = "SELECT product_id, region_id, SUM(amount), COUNT(*) FROM sales GROUP BY product_id, region_id"
+    conn.execute("INSERT INTO sales (product_id, customer_id, region_id, sale_date, quantity, amount) "
+                 "VALUES (101, 1, 1, '2025-03-03', 2, 40.0)")
+    conn.execute("UPDATE sales SET region_id = 3, amount = amount + 1 WHERE sale_id % 7 = 0")
+    conn.execute("DELETE FROM sales WHERE sale_id % 11 = 0")
+    conn.commit()
+    assert _rows(conn, rewrite_for_rollup(sql) + " ORDER BY 1, 2") == _rows(conn, sql + " ORDER BY 1, 2")
+    conn.close()
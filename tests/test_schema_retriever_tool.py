@@ -0,0 +1,30 @@
+import asyncio
+import threading
+
+from src.agents.agent_tools.schema_retriever_tool import SchemaRetrieverEngine
+
+
+class _Retriever:
+    async def aretrieve(self, query):
+        return [query]
+
+
+def test_aretrieve_loads_the_index_off_the_event_loop(tmp_path, monkeypatch):
+    engine = SchemaRetrieverEngine(backend="numpy", numpy_path=str(tmp_path), reload_check_seconds=60)
+    loaded_on = []
+
+    def build():
+        loaded_on.append(threading.current_thread())
+        return _Retriever()
+
+    monkeypatch.setattr(engine, "_build", build)
+
+    async def main():
+        first = await engine.aretrieve("total sales")
+        second = await engine.aretrieve("top products")
+        return first, second, threading.current_thread()
+
+    first, second, loop_thread = asyncio.run(main())
+    assert (first, second) == (["total sales"], ["top products"])
+    assert len(loaded_on) == 1 and loaded_on[0] is not loop_thread
+    assert engine.stats()["calls"] == 2
@@ -0,0 +1,83 @@
+import asyncio
+import sqlite3
+
+import numpy as np
+
+from src.agents.semantic_cache import SemanticAnswerCache, question_key_terms
+
+
+class _WordEmbedding:
+    """Bag-of-words embedding over a fixed vocabulary, so nearly identical questions score close to 1."""
+
+    def __init__(self, vocabulary):
+        self.vocabulary = vocabulary
+        self.calls = 0
+
+    async def aget_query_embedding(self, question):
+        self.calls += 1
+        words = question.lower().replace("?", "").split()
+        return [float(words.count(word)) + 0.01 for word in self.vocabulary]
+
+
+_VOCABULARY = ["total", "sales", "in", "the", "north", "south", "region", "for", "2023", "2024", "march", "april"]
+
+
+def _cache(tmp_path, **kwargs):
+    path = str(tmp_path / "sales.db")
+    sqlite3.connect(path).close()
+    return SemanticAnswerCache(embed_model=_WordEmbedding(_VOCABULARY), database_path=path, **kwargs)
+
+
+def test_question_key_terms_pick_out_entities_numbers_and_months():
+    assert question_key_terms("What were total sales in the North region for march 2023?") == \
+        {"north", "march", "2023"}
+    assert question_key_terms("Total sales of 'Widget Pro'") == {"'widget pro'"}
+    assert question_key_terms("How many customers are there") == frozenset()
+
+
+def test_similar_question_hits_and_a_different_one_misses(tmp_path):
+    cache = _cache(tmp_path, threshold=0.9)
+    asyncio.run(cache.astore("Total sales in the North region", "42", ["SELECT 42"]))
+    match = asyncio.run(cache.alookup("Total sales in the North region?"))
+    assert match is not None and match[0].answer == "42"
+    match = asyncio.run(cache.alookup("total sales in the North region for the region"))
+    assert match is not None and match[1] >= 0.9
+    assert asyncio.run(cache.alookup("Total sales for 2024")) is None
+
+
+def test_question_about_another_entity_misses_despite_high_similarity(tmp_path):
+    cache = _cache(tmp_path, threshold=0.5)
+    asyncio.run(cache.astore("Total sales in the North region", "42", ["SELECT 42"]))
+    asyncio.run(cache.astore("Total sales in the region for 2023", "7", ["SELECT 7"]))
+    assert asyncio.run(cache.alookup("Total sales in the South region")) is None
+    assert asyncio.run(cache.alookup("Total sales in the region for 2024")) is None
+    assert asyncio.run(cache.alookup("Total sales in the region for April")) is None
+    assert cache.misses == 3
+
+
+def test_lookup_prefers_a_lower_scoring_entry_with_matching_key_terms(tmp_path):
+    cache = _cache(tmp_path, threshold=0.5)
+    asyncio.run(cache.astore("Total sales in the North region", "north", ["SELECT 1"]))
+    asyncio.run(cache.astore("Sales in the South", "south", ["SELECT 2"]))
+    match = asyncio.run(cache.alookup("Total sales in the South region"))
+    assert match is not None and match[0].answer == "south"
+
+
+def test_identical_question_skips_the_embedding(tmp_path):
+    cache = _cache(tmp_path)
+    asyncio.run(cache.astore("Total sales in 2023", "42", ["SELECT 42"]))
+    calls = cache.embed_model.calls
+    assert asyncio.run(cache.alookup("  total SALES in 2023? ")) is not None
+    assert cache.embed_model.calls == calls
+
+
+def test_expired_entries_are_not_returned(tmp_path):
+    cache = _cache(tmp_path, ttl_seconds=0)
+    asyncio.run(cache.astore("Total sales in 2023", "42", ["SELECT 42"]))
+    assert asyncio.run(cache.alookup("Total sales in 2023")) is None
+
+
+def test_embeddings_are_normalized(tmp_path):
+    cache = _cache(tmp_path)
+    vector = asyncio.run(cache._aembed("total sales total sales"))
+    assert np.isclose(np.linalg.norm(vector), 1.0)
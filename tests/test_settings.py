@@ -0,0 +1,22 @@
+import pytest
+
+from src.agents.settings import env_flag
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1", True), ("true", True), ("Yes", True), (" ON ", True),
+    ("0", False), ("false", False), ("No", False), ("off", False),
+])
+def test_env_flag_reads_on_and_off_values(monkeypatch, value, expected):
+    monkeypatch.setenv("TEST_FLAG", value)
+    assert env_flag("TEST_FLAG", not expected) is expected
+
+
+@pytest.mark.parametrize("value", [None, "", "maybe"])
+def test_env_flag_falls_back_to_the_default(monkeypatch, value):
+    if value is None:
+        monkeypatch.delenv("TEST_FLAG", raising=False)
+    else:
+        monkeypatch.setenv("TEST_FLAG", value)
+    assert env_flag("TEST_FLAG", True) is True
+    assert env_flag("TEST_FLAG", False) is False
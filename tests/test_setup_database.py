@@ -0,0 +1,73 @@
+import sqlite3
+import contextlib
+from datetime import date, timedelta
+
+import pytest
+
+from src import setup_database
+
+END_DATE = date(2025, 6, 30)
+
+
+def _generate(path, monkeypatch, scale_factor=0.2, seed=1, workers=1):
+    # Small partitions so several of them (and several worker processes) are involved
+    monkeypatch.setattr(setup_database, "PARTITION_SIZE", 1000)
+    conn = sqlite3.connect(str(path))
+    with contextlib.redirect_stdout(None):
+        setup_database.create_tables(conn)
+        setup_database.insert_dummy_data(conn, scale_factor=scale_factor, seed=seed, workers=workers, end_date=END_DATE)
+    return conn
+
+
+def _sales(conn):
+    return conn.execute("SELECT * FROM sales ORDER BY sale_id").fetchall()
+
+
+def test_row_counts_follow_the_scale_factor(tmp_path, monkeypatch):
+    conn = _generate(tmp_path / "sales.db", monkeypatch, scale_factor=0.2)
+    try:
+        counts = [conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                  for table in ("regions", "products", "customers", "sales")]
+        assert counts == [len(setup_database.REGIONS_DATA), len(setup_database.PRODUCTS_DATA),
+                          len(setup_database.CUSTOMER_NAMES), 3000]
+        first, last = conn.execute("SELECT MIN(sale_date), MAX(sale_date) FROM sales").fetchone()
+        assert last <= END_DATE.isoformat()
+        assert first >= (END_DATE - timedelta(days=setup_database.LONG_TERM_SALES_PERIOD_DAYS)).isoformat()
+        recent = conn.execute("SELECT COUNT(*) FROM sales WHERE sale_date > ?",
+                              ((END_DATE - timedelta(days=setup_database.RECENT_SALES_PERIOD_DAYS)).isoformat(),)).fetchone()[0]
+        assert recent >= 3000 * setup_database.RECENT_SALES_PROPORTION
+        orphans = conn.execute(
+            "SELECT COUNT(*) FROM sales s LEFT JOIN customers c ON s.customer_id = c.customer_id "
+            "LEFT JOIN products p ON s.product_id = p.product_id WHERE c.customer_id IS NULL OR p.product_id IS NULL"
+        ).fetchone()[0]
+        assert orphans == 0
+    finally:
+        conn.close()
+
+
+def test_same_seed_gives_the_same_dataset_with_any_number_of_workers(tmp_path, monkeypatch):
+    serial = _generate(tmp_path / "serial.db", monkeypatch, workers=1)
+    parallel = _generate(tmp_path / "parallel.db", monkeypatch, workers=2)
+    other_seed = _generate(tmp_path / "other.db", monkeypatch, seed=2)
+    try:
+        assert _sales(serial) == _sales(parallel)
+        assert _sales(serial) != _sales(other_seed)
+    finally:
+        for conn in (serial, parallel, other_seed):
+            conn.close()
+
+
+def test_regeneration_replaces_the_previous_data(tmp_path, monkeypatch):
+    conn = _generate(tmp_path / "sales.db", monkeypatch)
+    first = _sales(conn)
+    conn.close()
+    conn = _generate(tmp_path / "sales.db", monkeypatch)
+    try:
+        assert _sales(conn) == first
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("argv, expected", [([], 1.0), (["--scale-factor", "10"], 10.0)])
+def test_scale_factor_argument(argv, expected):
+    assert setup_database.parse_args(argv).scale_factor == expected
@@ -0,0 +1,90 @@
+import sqlite3
+import threading
+
+import pytest
+
+from src.agents.agent_tools.sql_connection_pool import PoolExhaustedError, SQLiteConnectionPool
+
+
+@pytest.fixture
+def pool(sales_database):
+    pool = SQLiteConnectionPool(database_path=sales_database, max_size=2, timeout=0.2)
+    yield pool
+    pool.close_all()
+
+
+def test_connections_are_read_only(pool):
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM regions").fetchone()[0] > 0
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM regions")
+
+
+def test_connections_are_reused(pool):
+    with pool.connection() as first:
+        with pool.connection() as nested:
+            assert nested is first
+    with pool.connection() as again:
+        assert again is first
+    assert pool.health_check()["open_connections"] == 1
+
+
+def _checkout_in_thread(pool, results):
+    """Checks out a connection from another thread, recording it or the error."""
+    def checkout():
+        try:
+            with pool.connection() as conn:
+                results.append(conn)
+        except PoolExhaustedError as e:
+            results.append(e)
+
+    worker = threading.Thread(target=checkout)
+    worker.start()
+    return worker
+
+
+def test_exhausted_pool_times_out(sales_database):
+    pool = SQLiteConnectionPool(database_path=sales_database, max_size=1, timeout=0.1)
+    results = []
+    with pool.connection():
+        _checkout_in_thread(pool, results).join()
+    pool.close_all()
+    assert len(results) == 1 and isinstance(results[0], PoolExhaustedError)
+
+
+def test_waiting_thread_gets_a_released_connection(sales_database):
+    pool = SQLiteConnectionPool(database_path=sales_database, max_size=1, timeout=5)
+    results = []
+    with pool.connection() as conn:
+        worker = _checkout_in_thread(pool, results)
+        worker.join(0.1)
+        assert worker.is_alive()
+    worker.join()
+    pool.close_all()
+    assert results == [conn]
+
+
+def test_broken_connections_are_discarded(pool):
+    with pytest.raises(sqlite3.DatabaseError):
+        with pool.connection() as conn:
+            conn.close()
+            raise sqlite3.DatabaseError("database disk image is malformed")
+    assert pool.health_check()["open_connections"] == 0
+    with pool.connection() as replacement:
+        assert replacement is not conn
+        assert replacement.execute("SELECT 1").fetchone() == (1,)
+
+
+def test_query_errors_keep_the_connection(pool):
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.connection() as conn:
+            conn.execute("SELECT * FROM no_such_table")
+    with pool.connection() as again:
+        assert again is conn
+
+
+def test_closed_pool_refuses_checkouts(pool):
+    pool.close_all()
+    with pytest.raises(PoolExhaustedError):
+        with pool.connection():
+            pass
@@ -0,0 +1,99 @@
+import sqlite3
+import threading
+
+import pytest
+
+from src.agents.agent_tools.sql_query_budget import (
+    BUDGET_EXCEEDED_PREFIX, QueryBudget, QueryBudgetExceeded, cancel_scope, enforce_query_budget,
+    format_budget_exceeded,
+)
+
+# Counts to a billion; far longer than any budget below
+ENDLESS_QUERY = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 1000000000) SELECT COUNT(*) FROM n"
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    yield conn
+    conn.close()
+
+
+def test_vm_step_budget_stops_the_query(conn):
+    with pytest.raises(QueryBudgetExceeded) as error:
+        with enforce_query_budget(conn, QueryBudget(timeout_seconds=0, max_vm_steps=10_000, check_interval=100)):
+            conn.execute(ENDLESS_QUERY).fetchall()
+    assert error.value.reason == "vm_steps"
+    assert error.value.limit == 10_000
+    assert error.value.vm_steps > 10_000
+
+
+def test_timeout_stops_the_query(conn):
+    with pytest.raises(QueryBudgetExceeded) as error:
+        with enforce_query_budget(conn, QueryBudget(timeout_seconds=0.05, max_vm_steps=0)):
+            conn.execute(ENDLESS_QUERY).fetchall()
+    assert error.value.reason == "timeout"
+    assert 0.05 <= error.value.elapsed_seconds < 5
+
+
+def test_row_limit_is_enforced_through_count_rows(conn):
+    with pytest.raises(QueryBudgetExceeded) as error:
+        with enforce_query_budget(conn, QueryBudget(max_rows=10)) as guard:
+            guard.count_rows(8)
+            guard.count_rows(8)
+    assert (error.value.reason, error.value.limit, error.value.rows) == ("row_limit", 10, 16)
+
+
+def test_progress_handler_is_removed_after_the_block(conn):
+    with enforce_query_budget(conn, QueryBudget(timeout_seconds=0, max_vm_steps=10_000, check_interval=100)):
+        conn.execute("SELECT 1").fetchall()
+    query = ENDLESS_QUERY.replace("1000000000", "20000")
+    assert conn.execute(query).fetchone() == (20000,)
+
+
+def test_other_errors_pass_through(conn):
+    with pytest.raises(sqlite3.OperationalError):
+        with enforce_query_budget(conn, QueryBudget()):
+            conn.execute("SELECT * FROM no_such_table")
+
+
+def test_cancelled_scope_fails_later_queries_immediately(conn):
+    with cancel_scope() as scope:
+        scope.cancel()
+        with pytest.raises(QueryBudgetExceeded) as error:
+            with enforce_query_budget(conn, QueryBudget()):
+                pytest.fail("the block must not run in a cancelled scope")
+    assert error.value.reason == "cancelled"
+
+
+def test_cancel_interrupts_a_running_query(conn):
+    with cancel_scope() as scope:
+        timer = threading.Timer(0.05, scope.cancel)
+        timer.start()
+        with pytest.raises(QueryBudgetExceeded) as error:
+            with enforce_query_budget(conn, QueryBudget(timeout_seconds=10, max_vm_steps=0)):
+                conn.execute(ENDLESS_QUERY).fetchall()
+        timer.join()
+    assert error.value.reason == "cancelled"
+    assert error.value.elapsed_seconds < 5
+    assert not scope._connections
+
+
+def test_timer_interrupts_connections_without_a_progress_handler():
+    duckdb = pytest.importorskip("duckdb")
+    conn = duckdb.connect()
+    try:
+        with pytest.raises(QueryBudgetExceeded) as error:
+            with enforce_query_budget(conn, QueryBudget(timeout_seconds=0.1)):
+                conn.execute("SELECT SUM(a.range * b.range) FROM range(100000000) a, range(100000) b").fetchall()
+        assert error.value.reason == "timeout"
+        assert error.value.elapsed_seconds < 10
+    finally:
+        conn.close()
+
+
+def test_format_budget_exceeded_starts_with_the_prefix():
+    text = format_budget_exceeded(QueryBudgetExceeded("vm_steps", limit=1000, vm_steps=1100))
+    assert text.startswith(f"{BUDGET_EXCEEDED_PREFIX}: reason=vm_steps; limit=1000;")
+    assert "1,000 execution steps" in text
+    assert format_budget_exceeded(QueryBudgetExceeded("cancelled")).startswith(f"{BUDGET_EXCEEDED_PREFIX}: reason=cancelled")
@@ -0,0 +1,136 @@
+import os
+import sqlite3
+
+import pytest
+
+from src.agents.agent_progress import capture_progress
+from src.agents.agent_tools.sql_result_cache import SQLResultCache, is_deterministic_sql, normalize_sql, strip_sql_comments
+
+
+def test_normalize_sql_ignores_case_whitespace_and_trailing_semicolons():
+    assert normalize_sql("SELECT  COUNT( * )\nFROM sales ;;") == normalize_sql("select count(*) from sales")
+
+
+def test_normalize_sql_keeps_literals_verbatim():
+    assert normalize_sql("SELECT * FROM regions WHERE region_name = 'North'") != \
+        normalize_sql("SELECT * FROM regions WHERE region_name = 'north'")
+    assert "'a  b'" in normalize_sql("SELECT 'a  b'")
+
+
+def test_normalize_sql_does_not_confuse_double_minus_with_a_comment():
+    assert normalize_sql("SELECT 1 - -1") != normalize_sql("SELECT 1--1")
+    assert normalize_sql("SELECT 1 - -1") == normalize_sql("SELECT 1- -1")
+    assert normalize_sql("SELECT 1 - - -1") != normalize_sql("SELECT 1 - -1")
+
+
+def test_normalize_sql_drops_comments():
+    assert normalize_sql("SELECT 1 -- the answer\n") == normalize_sql("SELECT 1")
+    assert normalize_sql("SELECT /* it's */ 1;") == normalize_sql("SELECT 1")
+
+
+def test_strip_sql_comments_leaves_comment_markers_inside_literals():
+    sql = "SELECT '--not a comment', \"a/*b\" FROM t -- trailing"
+    assert strip_sql_comments(sql).rstrip() == "SELECT '--not a comment', \"a/*b\" FROM t"
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM sales WHERE sale_date >= DATE('now', '-30 days')",
+    "SELECT * FROM sales WHERE sale_date >= date( 'NOW' )",
+    "SELECT CURRENT_DATE",
+    "SELECT * FROM sales WHERE sale_date < current_timestamp",
+    "SELECT * FROM sales ORDER BY RANDOM() LIMIT 5",
+    "SELECT unixepoch()",
+])
+def test_queries_that_read_the_clock_or_random_numbers_are_not_deterministic(sql):
+    assert not is_deterministic_sql(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM sales WHERE sale_date >= DATE('2025-01-01', '-30 days')",
+    "SELECT 'current_date', 'random()' FROM sales -- as of now",
+    "SELECT unixepoch(sale_date) FROM sales",
+    "SELECT current_date_sales FROM report",
+])
+def test_fixed_queries_are_deterministic(sql):
+    assert is_deterministic_sql(sql)
+
+
+def _database(tmp_path):
+    path = str(tmp_path / "sales.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_cache_hits_on_equivalent_sql(tmp_path):
+    cache = SQLResultCache(database_path=_database(tmp_path))
+    cache.put("SELECT x FROM t;", "x\n1\n")
+    assert cache.get("select x\nfrom t") == "x\n1\n"
+    assert cache.get("SELECT x FROM t WHERE x = 2") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_is_dropped_when_the_database_changes(tmp_path):
+    path = _database(tmp_path)
+    cache = SQLResultCache(database_path=path)
+    cache.put("SELECT x FROM t", "x\n")
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO t VALUES (1)")
+    conn.commit()
+    conn.close()
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+    assert cache.get("SELECT x FROM t") is None
+    assert cache.invalidations == 1
+
+
+def test_cache_evicts_least_recently_used_entries_to_stay_within_budget(tmp_path):
+    cache = SQLResultCache(max_bytes=10, database_path=_database(tmp_path))
+    cache.put("SELECT 1", "aaaa")
+    cache.put("SELECT 2", "bbbb")
+    cache.get("SELECT 1")
+    cache.put("SELECT 3", "cccc")
+    assert cache.get("SELECT 2") is None
+    assert cache.get("SELECT 1") == "aaaa"
+    assert cache.evictions == 1
+
+
+@pytest.fixture
+def executor(sales_database, monkeypatch, tmp_path):
+    """execute_sql_query on `sales_database` with a fresh result cache and result store."""
+    from src.agents.agent_tools import sql_connection_pool, sql_engine, sql_executor_tool, sql_result_cache, sql_result_store
+    pool = sql_connection_pool.SQLiteConnectionPool(database_path=sales_database, max_size=1)
+    monkeypatch.setattr(sql_connection_pool, "_pool", pool)
+    monkeypatch.setattr(sql_engine, "SQL_ENGINE", "sqlite")
+    monkeypatch.setattr(sql_executor_tool, "SQL_CACHE_ENABLED", True)
+    monkeypatch.setattr(sql_result_cache, "_cache", SQLResultCache(database_path=sales_database))
+    monkeypatch.setattr(sql_result_store, "_store", sql_result_store.SQLResultStore(directory=str(tmp_path / "results")))
+    yield sql_executor_tool.execute_sql_query
+    pool.close_all()
+
+
+def test_time_dependent_queries_bypass_the_cache(executor):
+    from src.agents.agent_tools.sql_result_cache import get_result_cache
+    executor("SELECT COUNT(*) FROM sales WHERE sale_date <= DATE('now')")
+    executor("SELECT COUNT(*) FROM sales WHERE sale_date <= DATE('now')")
+    assert get_result_cache().stats()["entries"] == 0
+    executor("SELECT COUNT(*) FROM sales")
+    executor("SELECT COUNT(*) FROM sales")
+    assert (get_result_cache().stats()["entries"], get_result_cache().hits) == (1, 1)
+
+
+def test_cached_summaries_are_rerun_when_their_saved_result_was_pruned(executor):
+    from src.agents.agent_tools.sql_result_store import get_result_store
+    from src.agents.agent_tools.sql_result_summary import result_id_of
+    sql = "SELECT sale_id, amount FROM sales"
+    events = []
+    with capture_progress(events.append):
+        first_id = result_id_of(executor(sql))
+        assert result_id_of(executor(sql)) == first_id
+        os.remove(get_result_store().path(first_id))
+        second_id = result_id_of(executor(sql))
+    assert second_id not in (None, first_id)
+    assert get_result_store().path(second_id) is not None
+    assert [event.text for event in events if event.kind == "result"] == [first_id, first_id, second_id]
+    assert sum(event.text == "Result served from the query cache." for event in events) == 1
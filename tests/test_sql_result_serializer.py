@@ -0,0 +1,49 @@
+import sqlite3
+
+import pytest
+
+from src.agents.agent_tools.sql_result_serializer import iter_batches, serialize_rows_to_csv
+
+ROWS = [(n, f"name, {n}") for n in range(1, 101)]
+
+
+def test_small_results_are_written_in_full():
+    result = serialize_rows_to_csv(["id", "name"], ROWS[:2], max_rows=50, max_bytes=4096)
+    assert result.text == 'id,name\n1,"name, 1"\n2,"name, 2"\n'
+    assert (result.columns, result.rows_written, result.total_rows, result.truncated) == (["id", "name"], 2, 2, False)
+
+
+def test_row_limit_truncates_and_reports_the_total():
+    result = serialize_rows_to_csv(["id"], [(n,) for n, _ in ROWS], max_rows=5, max_bytes=4096)
+    assert result.text.splitlines()[:6] == ["id", "1", "2", "3", "4", "5"]
+    assert "[truncated: showing 5 of 100 rows." in result.text
+    assert (result.rows_written, result.total_rows, result.truncated) == (5, 100, True)
+
+
+def test_byte_limit_truncates_but_keeps_at_least_one_row():
+    rows = [(name,) for _, name in ROWS]
+    result = serialize_rows_to_csv(["name"], rows, max_rows=1000, max_bytes=40)
+    assert result.rows_written == 3
+    assert result.truncated and result.total_rows == 100
+    assert serialize_rows_to_csv(["name"], rows, max_rows=1000, max_bytes=1).rows_written == 1
+
+
+def test_empty_results_have_no_text():
+    result = serialize_rows_to_csv(["id"], [], max_rows=50, max_bytes=4096)
+    assert (result.text, result.columns, result.total_rows) == ("", ["id"], 0)
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (id INTEGER, name TEXT)")
+    conn.executemany("INSERT INTO t VALUES (?, ?)", ROWS)
+    yield conn
+    conn.close()
+
+
+def test_iter_batches_fetches_every_row_in_order(conn):
+    batches = list(iter_batches(conn.execute("SELECT id, name FROM t"), fetch_size=7))
+    assert [len(batch) for batch in batches] == [7] * 14 + [2]
+    assert [row for batch in batches for row in batch] == ROWS
+    assert list(iter_batches(conn.execute("SELECT id FROM t WHERE id > 1000"))) == []
@@ -0,0 +1,76 @@
+import csv
+import sqlite3
+
+import pytest
+
+from src.agents.agent_tools import sql_result_summary
+from src.agents.agent_tools.sql_result_store import SQLResultStore
+from src.agents.agent_tools.sql_result_summary import SUMMARY_PREFIX, ColumnSummary, build_observation, result_id_of
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (id INTEGER, region TEXT, amount REAL)")
+    conn.executemany("INSERT INTO t VALUES (?, ?, ?)",
+                     [(n, ["North", "South", "East"][n % 3], None if n % 10 == 0 else n / 2) for n in range(1, 1001)])
+    yield conn
+    conn.close()
+
+
+def test_small_results_are_returned_in_full(conn):
+    observation = build_observation(conn.execute("SELECT id, region FROM t WHERE id <= 3"))
+    assert observation.text == "id,region\n1,South\n2,East\n3,North\n"
+    assert (observation.total_rows, observation.summarized, observation.result_id) == (3, False, None)
+
+
+def test_empty_results_have_no_text(conn):
+    observation = build_observation(conn.execute("SELECT * FROM t WHERE id < 0"))
+    assert (observation.text, observation.total_rows) == ("", 0)
+
+
+def test_large_results_are_summarized_and_saved(conn, tmp_path):
+    store = SQLResultStore(directory=str(tmp_path))
+    observation = build_observation(conn.execute("SELECT * FROM t ORDER BY id"), store=store, fetch_size=64)
+    assert observation.summarized and observation.total_rows == 1000
+    assert observation.text.startswith(f"{SUMMARY_PREFIX} 1,000 rows x 3 columns")
+    assert "- id (numeric): 0 nulls, 1000 distinct, min 1, max 1000, mean 500.5" in observation.text
+    assert "- region (text): 0 nulls, 3 distinct, min East, max South; top: South (334), East (333), North (333)" in observation.text
+    assert "- amount (numeric): 100 nulls, 900 distinct" in observation.text
+    assert f"First {sql_result_summary.SQL_OBSERVATION_PREVIEW_ROWS} rows:\nid,region,amount\n1,South,0.5\n" in observation.text
+    assert len(observation.text) < 2000
+
+    assert result_id_of(observation.text) == observation.result_id
+    with open(store.path(observation.result_id), newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["id", "region", "amount"] and len(rows) == 1001
+    assert rows[-1] == ["1000", "South", ""]
+
+
+def test_summaries_without_a_store_say_the_result_was_not_saved(conn):
+    observation = build_observation(conn.execute("SELECT * FROM t"))
+    assert observation.summarized and observation.result_id is None
+    assert "The full result was not saved." in observation.text
+    assert result_id_of(observation.text) is None
+
+
+def test_high_cardinality_columns_stop_counting_values():
+    np = pytest.importorskip("numpy")
+    summary = ColumnSummary("id", max_distinct=50)
+    summary.add(np.array(list(range(100)), dtype=object))
+    assert summary.counts is None
+    assert "more than 50 distinct" in summary.describe()
+
+
+def test_stopping_midway_discards_the_partial_file(conn, tmp_path):
+    store = SQLResultStore(directory=str(tmp_path))
+    seen = []
+
+    def stop_after_three_batches(rows):
+        seen.append(rows)
+        if len(seen) == 3:
+            raise RuntimeError("budget")
+
+    with pytest.raises(RuntimeError):
+        build_observation(conn.execute("SELECT * FROM t"), store=store, on_rows=stop_after_three_batches, fetch_size=40)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,66 @@
+import shutil
+import sqlite3
+
+from src import startup_manager
+from src.startup_manager import StartupManager, database_is_valid, database_schema_hash, hash_sources
+
+
+def test_hash_sources_changes_with_file_contents_and_configuration(tmp_path):
+    (tmp_path / "kb").mkdir()
+    (tmp_path / "kb" / "schema.md").write_text("sales(amount)")
+    paths = [str(tmp_path / "kb"), str(tmp_path / "missing.py")]
+    before = hash_sources(paths, {"model": "a"})
+    assert hash_sources(paths, {"model": "a"}) == before
+    assert hash_sources(paths, {"model": "b"}) != before
+    (tmp_path / "kb" / "schema.md").write_text("sales(amount, quantity)")
+    assert hash_sources(paths, {"model": "a"}) != before
+
+
+def test_schema_hash_ignores_data_changes(sales_database, tmp_path):
+    copy = str(tmp_path / "copy.db")
+    shutil.copy(sales_database, copy)
+    before = database_schema_hash(copy)
+    conn = sqlite3.connect(copy)
+    conn.execute("DELETE FROM sales WHERE sale_id % 2 = 0")
+    conn.commit()
+    assert database_schema_hash(copy) == before
+    conn.execute("CREATE INDEX idx_test ON sales (quantity)")
+    conn.commit()
+    conn.close()
+    assert database_schema_hash(copy) != before
+
+
+def test_database_is_valid_needs_every_table_and_some_sales(sales_database, tmp_path):
+    assert database_is_valid(sales_database)
+    assert not database_is_valid(str(tmp_path / "missing.db"))
+    copy = str(tmp_path / "copy.db")
+    shutil.copy(sales_database, copy)
+    conn = sqlite3.connect(copy)
+    conn.execute("DELETE FROM sales")
+    conn.commit()
+    conn.close()
+    assert not database_is_valid(copy)
+    (tmp_path / "garbage.db").write_bytes(b"not a database")
+    assert not database_is_valid(str(tmp_path / "garbage.db"))
+
+
+def test_state_file_round_trip(tmp_path):
+    manager = StartupManager(state_path=str(tmp_path / "state" / "startup_state.json"))
+    assert manager._load_state() == {}
+    manager._save_state({"database": {"inputs": "abc"}})
+    assert manager._load_state() == {"database": {"inputs": "abc"}}
+
+
+def test_a_usable_database_is_kept_until_a_refresh_is_requested(monkeypatch):
+    valid = [True]
+    monkeypatch.setattr(startup_manager, "database_is_valid", lambda: valid[0])
+    monkeypatch.setattr(startup_manager, "database_artifact", lambda: ["sales_database.db", 1, 2])
+    manager = StartupManager(database_args=[], refresh_database=False)
+    built_long_ago = {"args": [], "artifact": ["sales_database.db", 0, 0], "built_at": 0}
+    assert manager.database_is_current({"database": built_long_ago})
+    assert manager.database_is_current({})
+    assert not manager.database_is_current({"database": dict(built_long_ago, args=["--scale-factor", "2"])})
+    assert not StartupManager(database_args=[], refresh_database=True).database_is_current({"database": built_long_ago})
+    valid[0] = False
+    assert not manager.database_is_current({"database": built_long_ago})
+    assert manager.database_is_current({"database": dict(built_long_ago, artifact=["sales_database.db", 1, 2])})
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import contextvars
+
+import pytest
+
+from src.agents.agent_tools.tool_executor import ToolExecutor, ToolExecutorBusyError
+
+_request = contextvars.ContextVar("request", default=None)
+
+
+@pytest.fixture
+def executor():
+    executor = ToolExecutor(max_workers=1, max_queue=1, slow_wait_seconds=60)
+    yield executor
+    executor.shutdown()
+
+
+def test_runs_calls_on_a_worker_thread_in_the_callers_context(executor):
+    async def main():
+        _request.set("request-1")
+        return await executor.run(lambda x: (threading.current_thread().name, _request.get(), x * 2), 21)
+
+    thread_name, request, result = asyncio.run(main())
+    assert thread_name.startswith("tool")
+    assert (request, result) == ("request-1", 42)
+    assert executor.stats()["completed"] == 1
+
+
+def test_exceptions_reach_the_caller(executor):
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        asyncio.run(executor.run(fail))
+    assert executor.stats()["failed"] == 1
+
+
+def test_full_queue_rejects_calls_and_cancelled_queued_calls_never_run(executor):
+    release = threading.Event()
+    started = threading.Event()
+    ran = []
+
+    def blocking():
+        started.set()
+        release.wait(5)
+        return "done"
+
+    async def main():
+        running = asyncio.ensure_future(executor.run(blocking))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        queued = asyncio.ensure_future(executor.run(ran.append, "queued"))
+        await asyncio.sleep(0)
+        assert executor.queue_depth == 1
+        with pytest.raises(ToolExecutorBusyError):
+            await executor.run(ran.append, "rejected")
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        release.set()
+        return await running
+
+    assert asyncio.run(main()) == "done"
+    stats = executor.stats()
+    assert ran == []
+    assert (stats["rejected"], stats["cancelled"], stats["completed"], stats["queue_depth"]) == (1, 1, 1, 0)
+    assert stats["max_queue_depth"] == 1
+
+
+def test_at_least_one_worker_is_required():
+    with pytest.raises(ValueError):
+        ToolExecutor(max_workers=0)